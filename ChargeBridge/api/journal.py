@@ -0,0 +1,335 @@
+"""Append-only write-ahead log with periodic snapshots.
+
+Components (the :mod:`api.store` module, :class:`VIDManager`,
+:class:`WalletService`) are attached under a name and report every state
+change as an ``(op, args)`` record.  Records are encoded by the caller, so
+later changes to the objects passed in cannot leak into the log, then queued
+in memory; a single writer thread drains the queue, writes the whole batch
+and fsyncs once (group commit), so callers on the event loop never touch the
+disk.  A commit that fails is rolled back and retried with backoff; until one
+succeeds :attr:`Journal.failed` is set and snapshots are skipped.
+
+The log is split into numbered segment files.  A snapshot captures the
+state of every component, rotates to a fresh segment and, once written,
+removes the segments it covers.  Recovery loads the newest snapshot and
+replays the segments after it; a torn final line from a crash is ignored.
+
+A component implements ``bind_journal(append)``, ``dump_state()``,
+``load_state(state)`` and ``apply_journal(op, args)``; an optional
+``journal_replayed()`` hook runs once recovery has finished.  ``dump_state``
+runs on the event loop and should mostly take references: any part of the
+state may be a zero-argument callable instead, which is called when the
+snapshot is encoded on a worker thread.  Such a callable must only read data
+the event loop no longer changes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT = "snapshot.json"
+_ROTATE = object()
+_RETRY_MIN = 0.1
+_RETRY_MAX = 30.0
+
+
+def _segment_name(number: int) -> str:
+    return f"wal-{number:08d}.log"
+
+
+def _resolve(value: Any) -> Any:
+    # ``json`` hands over what it cannot encode: deferred parts of a snapshot.
+    if callable(value):
+        return value()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class Journal:
+    """Durable, group-committed record log for in-memory components."""
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        commit_interval: float = 0.005,
+        snapshot_bytes: int = 256 * 1024 * 1024,
+        fsync: bool = True,
+        error_counter: Any = None,
+    ) -> None:
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.snapshot_bytes = snapshot_bytes
+        self.fsync = fsync
+        self._components: Dict[str, Any] = {}
+        self._pending: List[Any] = []
+        self._cond = threading.Condition()
+        self._segment = 0
+        self._written_segment = 0
+        self._segment_bytes = 0
+        self._thread: Optional[threading.Thread] = None
+        self._file: Any = None
+        self._closed = False
+        self.records_written = 0
+        self.commits = 0
+        self.error_counter = error_counter
+        # The error of the last commit while it keeps failing, else ``None``.
+        self.error: Optional[BaseException] = None
+
+    # -- wiring ---------------------------------------------------------
+
+    def attach(self, name: str, component: Any) -> None:
+        """Register ``component`` under ``name`` and give it an append hook."""
+
+        self._components[name] = component
+        component.bind_journal(partial(self.append, name))
+
+    def append(self, name: str, op: str, args: List[Any]) -> None:
+        """Queue one record; it becomes durable with the next group commit."""
+
+        line = json.dumps([name, op, args], separators=(",", ":")).encode() + b"\n"
+        with self._cond:
+            self._pending.append(line)
+            self._cond.notify()
+
+    @property
+    def snapshot_due(self) -> bool:
+        return self._segment_bytes >= self.snapshot_bytes
+
+    @property
+    def failed(self) -> bool:
+        """Whether records are piling up because commits keep failing."""
+        return self.error is not None
+
+    # -- recovery -------------------------------------------------------
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        found = []
+        for entry in os.listdir(self.directory):
+            if entry.startswith("wal-") and entry.endswith(".log"):
+                try:
+                    found.append((int(entry[4:-4]), os.path.join(self.directory, entry)))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    def recover(self) -> int:
+        """Restore attached components from disk and return replayed records."""
+
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+        first_segment = 0
+        snapshot_path = os.path.join(self.directory, _SNAPSHOT)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            first_segment = snapshot.get("segment", 0)
+            for name, state in snapshot.get("components", {}).items():
+                component = self._components.get(name)
+                if component is not None:
+                    component.load_state(state)
+
+        replayed = 0
+        segments = self._segments()
+        for number, path in segments:
+            if number < first_segment:
+                continue
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        logger.warning("Ignoring torn journal record at end of %s", path)
+                        break
+                    name, op, args = json.loads(line)
+                    component = self._components.get(name)
+                    if component is not None:
+                        component.apply_journal(op, args)
+                        replayed += 1
+
+        for component in self._components.values():
+            hook = getattr(component, "journal_replayed", None)
+            if hook is not None:
+                hook()
+
+        last = segments[-1][0] if segments else first_segment
+        self._segment = self._written_segment = max(last, first_segment) + 1
+        logger.info(
+            "Journal recovered %d records from %s in %.2fs",
+            replayed,
+            self.directory,
+            time.perf_counter() - started,
+        )
+        return replayed
+
+    # -- writer ---------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the background group-commit writer."""
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def _open_segment(self, number: int):
+        # Unbuffered, so a failed write leaves nothing behind to be repeated.
+        return open(os.path.join(self.directory, _segment_name(number)), "ab", buffering=0)
+
+    def _commit(self, lines: List[bytes]) -> None:
+        if self._file is None:
+            self._file = self._open_segment(self._written_segment)
+        fd = self._file.fileno()
+        start = os.fstat(fd).st_size
+        data = b"".join(lines)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+            if self.fsync:
+                os.fsync(fd)
+        except BaseException:
+            # Cut off a partial batch so the retry does not tear the log.
+            try:
+                os.ftruncate(fd, start)
+            except OSError:
+                pass
+            raise
+        self._segment_bytes += len(data)
+        self.records_written += len(lines)
+        self.commits += 1
+
+    def _rotate(self) -> None:
+        segment = self._written_segment + 1
+        f = self._open_segment(segment)
+        if self._file is not None:
+            self._file.close()
+        self._file = f
+        self._segment_bytes = 0
+        with self._cond:
+            self._written_segment = segment
+            self._cond.notify_all()
+
+    def _write(self, batch: List[Any]) -> None:
+        # Drops items from ``batch`` once they are durable.
+        while batch:
+            try:
+                end = batch.index(_ROTATE)
+            except ValueError:
+                end = len(batch)
+            if end:
+                self._commit(batch[:end])
+                del batch[:end]
+            if batch:
+                self._rotate()
+                del batch[0]
+
+    def _run(self) -> None:
+        batch: List[Any] = []
+        retry = _RETRY_MIN
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not batch and not self._closed:
+                        self._cond.wait()
+                    if not self._pending and not batch and self._closed:
+                        return
+                    batch.extend(self._pending)
+                    self._pending = []
+
+                try:
+                    self._write(batch)
+                except Exception as exc:
+                    if self.error_counter is not None:
+                        self.error_counter.inc()
+                    if self.error is None:
+                        logger.exception("Journal commit failed; retrying")
+                    self.error = exc
+                    with self._cond:
+                        if self._closed:
+                            logger.error(
+                                "Journal closed with %d records not written", len(batch)
+                            )
+                            return
+                        self._cond.wait(retry)
+                    retry = min(retry * 2, _RETRY_MAX)
+                    continue
+                if self.error is not None:
+                    logger.info("Journal commits succeed again")
+                    self.error = None
+                    retry = _RETRY_MIN
+                if self.commit_interval:
+                    time.sleep(self.commit_interval)
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def close(self) -> None:
+        """Flush outstanding records and stop the writer."""
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    # -- snapshots ------------------------------------------------------
+
+    def capture(self) -> Dict[str, Any]:
+        """Capture component state and rotate the log.
+
+        Must run on the thread that mutates the components (the event loop)
+        so the snapshot and the segment boundary agree.  Deferred parts of
+        the state are only resolved by :meth:`write_snapshot`.
+        """
+
+        state = {name: c.dump_state() for name, c in self._components.items()}
+        with self._cond:
+            self._segment += 1
+            self._pending.append(_ROTATE)
+            self._cond.notify()
+            segment = self._segment
+        return {"segment": segment, "components": state}
+
+    def write_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Persist a captured snapshot and drop the segments it covers."""
+
+        segment = snapshot["segment"]
+        with self._cond:
+            while self._written_segment < segment and self._thread is not None:
+                self._cond.wait()
+        path = os.path.join(self.directory, _SNAPSHOT)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"), default=_resolve)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        for number, seg_path in self._segments():
+            if number < segment:
+                os.remove(seg_path)
+
+    async def run_snapshots(self, interval: float = 30.0) -> None:
+        """Periodically snapshot once enough log has accumulated."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            if not self.snapshot_due:
+                continue
+            if self.failed:
+                logger.warning("Journal snapshot skipped: commits are failing (%s)", self.error)
+                continue
+            try:
+                snapshot = self.capture()
+                await loop.run_in_executor(None, self.write_snapshot, snapshot)
+            except Exception:
+                logger.exception("Journal snapshot failed")
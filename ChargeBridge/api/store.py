@@ -1,6 +1,10 @@
-from datetime import datetime
+import base64
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timezone
+from functools import partial
 from itertools import count
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from .models import ChargingSession, Connector, PendingSession, Station
 
@@ -14,9 +18,124 @@ _station_seq = count(1)
 _connector_seq = count(1)
 _session_seq = count(1)
 
+# Set by :meth:`api.journal.Journal.attach`; ``None`` keeps the store purely
+# in memory.
+_journal_append: Optional[Callable[[str, List[Any]], None]] = None
+
+
+def _log(op: str, *args: Any) -> None:
+    if _journal_append is not None:
+        _journal_append(op, list(args))
+
+
+def _dump_station(station: Station) -> Dict[str, Any]:
+    return station.model_dump(mode="json", exclude={"connectors"})
+
+
+def _dump_connector(connector: Connector) -> Dict[str, Any]:
+    return connector.model_dump(mode="json", exclude={"charging_sessions"})
+
+
+def _dump_session(session: Any) -> List[Any]:
+    if isinstance(session, ChargingSession):
+        return ["model", session.model_dump(mode="json")]
+    return ["dict", dict(session)]
+
+
+def _dump_sessions(records: List[Any]) -> List[List[Any]]:
+    return [_dump_session(s) for s in records]
+
+
+def _load_session(data: List[Any]) -> Any:
+    kind, body = data
+    return ChargingSession.model_validate(body) if kind == "model" else body
+
+
+def _session_id(session: Any) -> Any:
+    return session.get("id") if isinstance(session, dict) else getattr(session, "id", None)
+
+
+def _session_connector(session: Any) -> Any:
+    if isinstance(session, dict):
+        return session.get("connector_id")
+    return getattr(session, "connector_id", None)
+
+
+def _session_vehicle(session: Any) -> Any:
+    if isinstance(session, dict):
+        return session.get("vehicleId") or session.get("vehicle_id")
+    return getattr(session, "vehicleId", getattr(session, "vehicle_id", None))
+
+
+def _session_status(session: Any) -> Any:
+    if isinstance(session, dict):
+        return session.get("status")
+    return getattr(session, "status", None)
+
+
+# Secondary indexes over ``sessions`` (id sets kept as insertion-ordered
+# dicts) and over ``sessions_history`` by vehicle.  ``_session_keys``
+# remembers what a session was indexed under, so callers may mutate a
+# session record before it is re-indexed or removed.
+_sessions_by_vehicle: Dict[Any, Dict[int, None]] = {}
+_sessions_by_connector: Dict[Any, Dict[int, None]] = {}
+_sessions_by_status: Dict[Any, Dict[int, None]] = {}
+_active_by_connector: Dict[Any, int] = {}
+_session_keys: Dict[int, Tuple[Any, Any, Any]] = {}
+_history_by_vehicle: Dict[Any, List[int]] = {}
+
+
+def _unindex_session(session_id: int) -> None:
+    keys = _session_keys.pop(session_id, None)
+    if keys is None:
+        return
+    vehicle, connector, status = keys
+    for index, key in (
+        (_sessions_by_vehicle, vehicle),
+        (_sessions_by_connector, connector),
+        (_sessions_by_status, status),
+    ):
+        ids = index.get(key)
+        if ids is not None:
+            ids.pop(session_id, None)
+            if not ids:
+                del index[key]
+    if status == "active" and _active_by_connector.get(connector) == session_id:
+        del _active_by_connector[connector]
+
+
+def _put_session(session: Any) -> None:
+    session_id = _session_id(session)
+    _unindex_session(session_id)
+    sessions[session_id] = session
+    vehicle = _session_vehicle(session)
+    connector = _session_connector(session)
+    status = _session_status(session)
+    _session_keys[session_id] = (vehicle, connector, status)
+    if vehicle is not None:
+        _sessions_by_vehicle.setdefault(vehicle, {})[session_id] = None
+    _sessions_by_connector.setdefault(connector, {})[session_id] = None
+    _sessions_by_status.setdefault(status, {})[session_id] = None
+    if status == "active":
+        _active_by_connector[connector] = session_id
+
+
+def _remove_session(session_id: int) -> Any:
+    _unindex_session(session_id)
+    return sessions.pop(session_id, None)
+
+
+def _append_history(session: Any) -> None:
+    vehicle = _session_vehicle(session)
+    if vehicle is not None:
+        _history_by_vehicle.setdefault(vehicle, []).append(len(sessions_history))
+    sessions_history.append(session)
+
+
 def create_station(name: str, location: Optional[str] = None) -> Station:
     station = Station(id=next(_station_seq), name=name, location=location)
     stations[station.id] = station
+    _log("station.put", _dump_station(station))
     return station
 
 def list_stations() -> List[Station]:
@@ -26,25 +145,45 @@ def get_station(station_id: int) -> Optional[Station]:
     return stations.get(station_id)
 
 def delete_station(station_id: int) -> bool:
-    return stations.pop(station_id, None) is not None
+    if stations.pop(station_id, None) is None:
+        return False
+    _log("station.delete", station_id)
+    return True
 
 def add_connector(station_id: int, type: str, status: str = "available") -> Connector:
     connector = Connector(id=next(_connector_seq), station_id=station_id, type=type, status=status)
     _connectors[connector.id] = connector
     stations[station_id].connectors.append(connector)
+    _log("connector.put", _dump_connector(connector))
     return connector
 
 def get_connector(connector_id: int) -> Optional[Connector]:
     return _connectors.get(connector_id)
 
+def set_connector_status(connector_id: int, status: str) -> None:
+    connector = _connectors.get(connector_id)
+    if connector is not None:
+        connector.status = status
+        _log("connector.status", connector_id, status)
+
 def start_session(connector_id: int) -> ChargingSession:
     session = ChargingSession(
         id=next(_session_seq), connector_id=connector_id, started_at=datetime.utcnow()
     )
-    sessions[session.id] = session
+    _put_session(session)
     _connectors[connector_id].charging_sessions.append(session)
+    _log("session.put", _dump_session(session))
     return session
 
+def add_session(session: Dict[str, Any]) -> None:
+    """Register a session record created outside :func:`start_session`."""
+
+    _put_session(session)
+    connector = _connectors.get(session["connector_id"])
+    if connector is not None:
+        connector.charging_sessions.append(session)
+    _log("session.put", _dump_session(session))
+
 def end_session(
     session_id: int,
     kwh_delivered: Optional[float] = None,
@@ -63,30 +202,652 @@ def end_session(
         session.temperature = temperature
         session.soc = soc
         session.status = "completed"
+        _put_session(session)
+        _log("session.put", _dump_session(session))
+    return session
+
+def archive_session(session_id: int) -> Optional[Any]:
+    """Move a finished session from ``sessions`` to ``sessions_history``."""
+
+    session = _remove_session(session_id)
+    if session is not None:
+        _append_history(session)
+        _log("session.archive", session_id, _dump_session(session))
     return session
 
 def delete_session(session_id: int) -> bool:
-    return sessions.pop(session_id, None) is not None
+    if _remove_session(session_id) is None:
+        return False
+    _log("session.delete", session_id)
+    return True
+
+def get_active_session(connector_id: int) -> Optional[Tuple[int, Any]]:
+    """Return ``(id, session)`` of the active session on ``connector_id``."""
+
+    session_id = _active_by_connector.get(connector_id)
+    if session_id is None:
+        return None
+    return session_id, sessions[session_id]
+
+def sessions_for_vehicle(vehicle_id: str) -> Tuple[List[Any], List[Any]]:
+    """Return ``(sessions, archived)`` recorded for ``vehicle_id``.
+
+    ``sessions`` are the entries still in :data:`sessions`; ``archived``
+    come from :data:`sessions_history` in the order they were archived.
+    """
+
+    current = [sessions[i] for i in _sessions_by_vehicle.get(vehicle_id, ())]
+    archived = [sessions_history[i] for i in _history_by_vehicle.get(vehicle_id, ())]
+    return current, archived
+
+def sessions_with_status(status: str) -> List[Any]:
+    return [sessions[i] for i in _sessions_by_status.get(status, ())]
+
+def sessions_for_connector(connector_id: int) -> List[Any]:
+    return [sessions[i] for i in _sessions_by_connector.get(connector_id, ())]
+
+def set_pending(cpid: str, connector_id: int, session: PendingSession) -> None:
+    pending[(cpid, connector_id)] = session
+    _log("pending.put", cpid, connector_id, session.model_dump(mode="json"))
+
+def pop_pending(cpid: str, connector_id: int) -> Optional[PendingSession]:
+    session = pending.pop((cpid, connector_id), None)
+    if session is not None:
+        _log("pending.delete", cpid, connector_id)
+    return session
+
+
+# Transaction registry ------------------------------------------------------
+
+# transactionId -> (cpid, connectorId, session record) for running OCPP
+# transactions; the record is the same dict held in ``CentralSystem.active_tx``.
+active_transactions: Dict[int, Tuple[str, int, Dict[str, Any]]] = {}
+# transactionId -> summary record of finished OCPP transactions, in stop order.
+completed_transactions: Dict[int, Dict[str, Any]] = {}
+# transactionIds of ``completed_transactions`` in stop order; a position in
+# this list is the history pagination cursor.
+_completed_order: List[int] = []
+# cpid / vehicleId -> positions in ``_completed_order``, ascending
+_completed_by_cpid: Dict[Any, List[int]] = {}
+_completed_by_vehicle: Dict[Any, List[int]] = {}
+# cpid -> transactionIds of its running transactions
+_cp_transactions: Dict[str, Dict[int, None]] = {}
+# Meter series are kept for this many of the newest finished transactions;
+# older ones are released.  ``central.py`` sets it before recovery.
+completed_series_limit = 10000
+
+
+def _dump_tx_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in info.items()
+    }
+
+
+def _load_tx_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    start_time = info.get("start_time")
+    if isinstance(start_time, str):
+        info["start_time"] = datetime.fromisoformat(start_time)
+    return info
+
+
+def _index_transaction(
+    transaction_id: int, cpid: str, connector_id: int, info: Dict[str, Any]
+) -> None:
+    previous = active_transactions.get(transaction_id)
+    if previous is not None:
+        _cp_transactions.get(previous[0], {}).pop(transaction_id, None)
+    active_transactions[transaction_id] = (cpid, connector_id, info)
+    _cp_transactions.setdefault(cpid, {})[transaction_id] = None
+
+
+def _unindex_transaction(transaction_id: int) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+    entry = active_transactions.pop(transaction_id, None)
+    if entry is not None:
+        owned = _cp_transactions.get(entry[0])
+        if owned is not None:
+            owned.pop(transaction_id, None)
+            if not owned:
+                del _cp_transactions[entry[0]]
+    return entry
+
+
+def register_transaction(
+    transaction_id: int, cpid: str, connector_id: int, info: Dict[str, Any]
+) -> None:
+    """Index a running transaction by its id."""
+
+    _index_transaction(transaction_id, cpid, connector_id, info)
+    _log("tx.put", transaction_id, cpid, connector_id, _dump_tx_info(info))
+
+
+def get_transaction(transaction_id: int) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+    """Return ``(cpid, connectorId, record)`` for a running transaction."""
+
+    return active_transactions.get(transaction_id)
+
+
+def pop_transaction(transaction_id: int) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+    """Remove a running transaction from the index and return its entry."""
+
+    entry = _unindex_transaction(transaction_id)
+    if entry is not None:
+        _log("tx.delete", transaction_id)
+    return entry
+
+
+def transactions_for(cpid: str) -> List[Tuple[int, int, Dict[str, Any]]]:
+    """Return ``(transactionId, connectorId, record)`` running on ``cpid``."""
+
+    return [
+        (tx_id, active_transactions[tx_id][1], active_transactions[tx_id][2])
+        for tx_id in _cp_transactions.get(cpid, ())
+    ]
+
+
+def export_transactions(cpid: str) -> List[List[Any]]:
+    """Remove the running transactions of ``cpid`` and return them serialised.
+
+    Used when another central worker takes over the charge point; the result
+    is accepted by :func:`import_transactions`.
+    """
+
+    exported: List[List[Any]] = []
+    for tx_id, conn_id, info in transactions_for(cpid):
+        series = meter_values.get(tx_id)
+        exported.append(
+            [tx_id, conn_id, _dump_tx_info(info), series.dump() if series is not None else None]
+        )
+        pop_transaction(tx_id)
+        clear_meter_values(tx_id)
+    return exported
+
+
+def import_transactions(cpid: str, exported: List[List[Any]]) -> None:
+    """Register transactions produced by :func:`export_transactions`."""
+
+    for tx_id, conn_id, info, series in exported:
+        register_transaction(tx_id, cpid, conn_id, _load_tx_info(info))
+        if series is not None:
+            record_meter_values(tx_id, MeterSeries.load(series).rows())
+
+
+def complete_transaction(transaction_id: int, record: Dict[str, Any]) -> None:
+    """Drop ``transaction_id`` from the running index and keep its summary."""
+
+    _unindex_transaction(transaction_id)
+    _add_completed(transaction_id, record)
+    _log("tx.complete", transaction_id, record)
+
+
+def _add_completed(transaction_id: int, record: Dict[str, Any]) -> None:
+    if transaction_id not in completed_transactions:
+        index = len(_completed_order)
+        _completed_order.append(transaction_id)
+        series = meter_values.get(transaction_id)
+        if series is not None:
+            series.compact()
+        if len(_completed_order) > completed_series_limit:
+            meter_values.pop(_completed_order[-completed_series_limit - 1], None)
+        _completed_by_cpid.setdefault(record.get("cpid"), []).append(index)
+        vehicle = record.get("vehicleId")
+        if vehicle is not None:
+            _completed_by_vehicle.setdefault(vehicle, []).append(index)
+    completed_transactions[transaction_id] = record
+
+
+def iter_completed(
+    position: int = 0, cpid: Optional[str] = None, vehicle_id: Optional[str] = None
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield ``(position, record)`` of finished transactions from ``position`` on.
+
+    ``cpid`` and ``vehicle_id`` restrict the records to one charge point or
+    vehicle through their indexes rather than by scanning.
+    """
+
+    order = _completed_order
+    records = completed_transactions
+    position = max(position, 0)
+    indexes = []
+    if cpid is not None:
+        indexes.append(_completed_by_cpid.get(cpid, []))
+    if vehicle_id is not None:
+        indexes.append(_completed_by_vehicle.get(vehicle_id, []))
+    if not indexes:
+        for index in range(position, len(order)):
+            yield index, records[order[index]]
+        return
+    # Walk the shorter index and check the other filter on the record.
+    positions = min(indexes, key=len)
+    for i in range(bisect_left(positions, position), len(positions)):
+        index = positions[i]
+        record = records[order[index]]
+        if cpid is not None and record.get("cpid") != cpid:
+            continue
+        if vehicle_id is not None and record.get("vehicleId") != vehicle_id:
+            continue
+        yield index, record
 
 
 # Meter value persistence ---------------------------------------------------
 
-meter_values: Dict[int, List[Dict[str, Any]]] = {}
+METER_FIELDS: Tuple[str, ...] = (
+    "timestamp",
+    "current",
+    "voltage",
+    "power",
+    "soc",
+    "temperature",
+    "energy",
+    "current_l1",
+    "current_l2",
+    "current_l3",
+    "voltage_l1",
+    "voltage_l2",
+    "voltage_l3",
+    "power_l1",
+    "power_l2",
+    "power_l3",
+)
+METER_CONTEXTS: Tuple[str, ...] = (
+    "Sample.Periodic",
+    "Sample.Clock",
+    "Transaction.Begin",
+    "Transaction.End",
+    "Interruption.Begin",
+    "Interruption.End",
+    "Trigger",
+    "Other",
+)
+_CONTEXT_CODES: Dict[str, int] = {name: code for code, name in enumerate(METER_CONTEXTS)}
+_METER_INITIAL = 8
+_NAN = float("nan")
+
+
+def _to_epoch(ts: Any) -> float:
+    if isinstance(ts, datetime):
+        return ts.timestamp()
+    if isinstance(ts, str):
+        try:
+            return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return _NAN
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    return _NAN
+
+
+def _from_epoch(value: float) -> Optional[str]:
+    if value != value:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class MeterSeries:
+    """Columnar storage of the meter samples of a single transaction.
+
+    Every measurand a charge point reports is kept in its own ``array('d')``
+    column; measurands it never reports get no column at all.  Missing
+    values are stored as NaN and timestamps as POSIX seconds.  The reading
+    context (``Sample.Periodic``, ``Transaction.End``, ...) is kept as a byte
+    code in a separate column.  Capacity starts at ``_METER_INITIAL`` rows
+    and doubles when full, so short transactions stay small and long ones
+    rarely reallocate.
+    """
+
+    __slots__ = ("_columns", "_contexts", "_size", "_capacity")
+
+    def __init__(self) -> None:
+        self._columns: Dict[str, array] = {"timestamp": array("d")}
+        self._contexts = array("B")
+        self._size = 0
+        self._capacity = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, rows: int) -> None:
+        needed = self._size + rows
+        if needed <= self._capacity:
+            return
+        capacity = max(self._capacity * 2, _METER_INITIAL)
+        while capacity < needed:
+            capacity *= 2
+        grow = capacity - self._capacity
+        filler = array("d", [_NAN]) * grow
+        for column in self._columns.values():
+            column.extend(filler)
+        self._contexts.extend(bytes(grow))
+        self._capacity = capacity
+
+    def _add_column(self, name: str) -> array:
+        column = self._columns[name] = array("d", [_NAN]) * self._capacity
+        return column
+
+    def append(self, sample: Dict[str, Any]) -> None:
+        """Append one sample dict; unknown keys are ignored."""
+
+        self._reserve(1)
+        row = self._size
+        columns = self._columns
+        columns["timestamp"][row] = _to_epoch(sample.get("timestamp"))
+        for name in METER_FIELDS[1:]:
+            value = sample.get(name)
+            if value is not None:
+                column = columns.get(name)
+                if column is None:
+                    column = self._add_column(name)
+                column[row] = float(value)
+        self._contexts[row] = _CONTEXT_CODES.get(sample.get("context"), 0)
+        self._size += 1
+
+    def extend(self, samples: List[Dict[str, Any]]) -> None:
+        """Append a batch of samples."""
+
+        for sample in samples:
+            self.append(sample)
+
+    def compact(self) -> None:
+        """Release the spare capacity once no more samples are expected."""
+
+        size = self._size
+        if self._capacity > size:
+            for column in self._columns.values():
+                del column[size:]
+            del self._contexts[size:]
+            self._capacity = size
+
+    def dump(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable copy of the filled rows."""
+
+        return _dump_columns(self._columns, self._contexts, self._size)
+
+    def deferred_dump(self) -> Callable[[], Dict[str, Any]]:
+        """Return a callable making :meth:`dump` of the rows filled so far.
+
+        Filled rows are never rewritten, so the callable may run on another
+        thread while samples are still being appended.
+        """
+
+        return partial(_dump_columns, dict(self._columns), self._contexts, self._size)
+
+    @classmethod
+    def load(cls, data: Dict[str, Any]) -> "MeterSeries":
+        """Rebuild a series from :meth:`dump` output."""
+
+        series = cls()
+        size = series._size = series._capacity = data["size"]
+        for name, encoded in data["columns"].items():
+            if name in METER_FIELDS:
+                series._columns[name] = array("d", base64.b64decode(encoded))
+        series._contexts.frombytes(base64.b64decode(data["contexts"]))
+        filler = array("d", [_NAN]) * size
+        for column in series._columns.values():
+            if len(column) < size:
+                column.extend(filler[: size - len(column)])
+        return series
+
+    def column(self, name: str) -> array:
+        """Return a copy of the filled part of column ``name``."""
+
+        column = self._columns.get(name)
+        if column is None:
+            if name not in METER_FIELDS:
+                raise KeyError(name)
+            return array("d", [_NAN]) * self._size
+        return column[: self._size]
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """Return row ``index`` as a sample dict without NaN entries."""
+
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        columns = self._columns
+        sample: Dict[str, Any] = {
+            "timestamp": _from_epoch(columns["timestamp"][index]),
+            "context": METER_CONTEXTS[self._contexts[index]],
+        }
+        for name in METER_FIELDS[1:]:
+            column = columns.get(name)
+            if column is not None:
+                value = column[index]
+                if value == value:
+                    sample[name] = value
+        return sample
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Materialise all samples as a list of dicts."""
+
+        return [self.row(i) for i in range(self._size)]
+
+
+def _dump_columns(columns: Dict[str, array], contexts: array, size: int) -> Dict[str, Any]:
+    return {
+        "size": size,
+        "columns": {
+            name: base64.b64encode(column[:size].tobytes()).decode("ascii")
+            for name, column in columns.items()
+        },
+        "contexts": base64.b64encode(contexts[:size].tobytes()).decode("ascii"),
+    }
+
+
+meter_values: Dict[int, MeterSeries] = {}
 
 
 def record_meter_value(transaction_id: int, sample: Dict[str, Any]) -> None:
     """Append a meter value sample for the given transaction."""
 
-    meter_values.setdefault(transaction_id, []).append(sample)
+    series = meter_values.get(transaction_id)
+    if series is None:
+        series = meter_values[transaction_id] = MeterSeries()
+    series.append(sample)
+    _log("meter.append", transaction_id, [sample])
+
+
+def record_meter_values(transaction_id: int, samples: List[Dict[str, Any]]) -> None:
+    """Append a batch of decoded samples for the given transaction."""
+
+    if not samples:
+        return
+    series = meter_values.get(transaction_id)
+    if series is None:
+        series = meter_values[transaction_id] = MeterSeries()
+    series.extend(samples)
+    _log("meter.append", transaction_id, samples)
+
+
+def get_meter_series(transaction_id: int) -> Optional[MeterSeries]:
+    """Return the columnar series for ``transaction_id`` if any."""
+
+    return meter_values.get(transaction_id)
 
 
 def get_meter_values(transaction_id: int) -> List[Dict[str, Any]]:
     """Return all recorded meter value samples for ``transaction_id``."""
 
-    return meter_values.get(transaction_id, [])
+    series = meter_values.get(transaction_id)
+    return series.rows() if series is not None else []
 
 
 def clear_meter_values(transaction_id: int) -> None:
     """Remove all stored samples for ``transaction_id`` if present."""
 
-    meter_values.pop(transaction_id, None)
\ No newline at end of file
+    if meter_values.pop(transaction_id, None) is not None:
+        _log("meter.clear", transaction_id)
+
+
+# Journal integration -------------------------------------------------------
+
+
+def bind_journal(append: Callable[[str, List[Any]], None]) -> None:
+    """Send every subsequent state change to ``append``."""
+
+    global _journal_append
+    _journal_append = append
+
+
+def dump_state() -> Dict[str, Any]:
+    """Return a snapshot of the whole store for :meth:`api.journal.Journal.capture`.
+
+    Only what may still change is copied here; archived sessions, completed
+    transactions and filled meter rows are not, so they are encoded later
+    from references.
+    """
+
+    return {
+        "stations": [_dump_station(s) for s in stations.values()],
+        "connectors": [_dump_connector(c) for c in _connectors.values()],
+        "sessions": [_dump_session(s) for s in sessions.values()],
+        "sessions_history": partial(_dump_sessions, list(sessions_history)),
+        "pending": [
+            [cpid, conn_id, p.model_dump(mode="json")]
+            for (cpid, conn_id), p in pending.items()
+        ],
+        "meter_values": [
+            [tx_id, series.deferred_dump()] for tx_id, series in meter_values.items()
+        ],
+        "active_transactions": [
+            [tx_id, cpid, conn_id, _dump_tx_info(info)]
+            for tx_id, (cpid, conn_id, info) in active_transactions.items()
+        ],
+        "completed_transactions": list(completed_transactions.values()),
+    }
+
+
+def load_state(state: Dict[str, Any]) -> None:
+    """Replace the store contents with a :func:`dump_state` snapshot."""
+
+    stations.clear()
+    _connectors.clear()
+    sessions.clear()
+    sessions_history.clear()
+    for index in (
+        _sessions_by_vehicle,
+        _sessions_by_connector,
+        _sessions_by_status,
+        _active_by_connector,
+        _session_keys,
+        _history_by_vehicle,
+    ):
+        index.clear()
+    pending.clear()
+    meter_values.clear()
+    active_transactions.clear()
+    _cp_transactions.clear()
+    completed_transactions.clear()
+    _completed_order.clear()
+    _completed_by_cpid.clear()
+    _completed_by_vehicle.clear()
+    for data in state.get("stations", []):
+        _apply_station_put(data)
+    for data in state.get("connectors", []):
+        _apply_connector_put(data)
+    for data in state.get("sessions", []):
+        _put_session(_load_session(data))
+    for data in state.get("sessions_history", []):
+        _append_history(_load_session(data))
+    for cpid, conn_id, data in state.get("pending", []):
+        pending[(cpid, conn_id)] = PendingSession.model_validate(data)
+    for tx_id, data in state.get("meter_values", []):
+        meter_values[tx_id] = MeterSeries.load(data)
+    for tx_id, cpid, conn_id, info in state.get("active_transactions", []):
+        _index_transaction(tx_id, cpid, conn_id, _load_tx_info(info))
+    for record in state.get("completed_transactions", []):
+        _add_completed(record["transactionId"], record)
+
+
+def _apply_station_put(data: Dict[str, Any]) -> None:
+    stations[data["id"]] = Station.model_validate(data)
+
+
+def _apply_connector_put(data: Dict[str, Any]) -> None:
+    connector = Connector.model_validate(data)
+    _connectors[connector.id] = connector
+    station = stations.get(connector.station_id)
+    if station is not None:
+        station.connectors.append(connector)
+
+
+def apply_journal(op: str, args: List[Any]) -> None:
+    """Re-apply one journal record during recovery."""
+
+    if op == "meter.append":
+        tx_id, samples = args
+        series = meter_values.get(tx_id)
+        if series is None:
+            series = meter_values[tx_id] = MeterSeries()
+        series.extend(samples)
+    elif op == "meter.clear":
+        meter_values.pop(args[0], None)
+    elif op == "tx.put":
+        tx_id, cpid, conn_id, info = args
+        _index_transaction(tx_id, cpid, conn_id, _load_tx_info(info))
+    elif op == "tx.delete":
+        _unindex_transaction(args[0])
+    elif op == "tx.complete":
+        tx_id, record = args
+        _unindex_transaction(tx_id)
+        _add_completed(tx_id, record)
+    elif op == "pending.put":
+        cpid, conn_id, data = args
+        pending[(cpid, conn_id)] = PendingSession.model_validate(data)
+    elif op == "pending.delete":
+        pending.pop((args[0], args[1]), None)
+    elif op == "session.put":
+        _put_session(_load_session(args[0]))
+    elif op == "session.archive":
+        _remove_session(args[0])
+        _append_history(_load_session(args[1]))
+    elif op == "session.delete":
+        _remove_session(args[0])
+    elif op == "station.put":
+        _apply_station_put(args[0])
+    elif op == "station.delete":
+        stations.pop(args[0], None)
+    elif op == "connector.put":
+        _apply_connector_put(args[0])
+    elif op == "connector.status":
+        connector = _connectors.get(args[0])
+        if connector is not None:
+            connector.status = args[1]
+
+
+def journal_replayed() -> None:
+    """Rebuild derived links and id sequences after recovery."""
+
+    global _station_seq, _connector_seq, _session_seq
+    for connector in _connectors.values():
+        connector.charging_sessions = []
+    linked = sorted(
+        list(sessions_history) + list(sessions.values()),
+        key=lambda s: _session_id(s) or 0,
+    )
+    for session in linked:
+        connector = _connectors.get(_session_connector(session))
+        if connector is not None:
+            connector.charging_sessions.append(session)
+    for tx_id, (_, _, info) in active_transactions.items():
+        series = meter_values.get(tx_id)
+        if series is not None and len(series):
+            info["last_sample"] = series.row(-1)
+    _station_seq = count(max(stations, default=0) + 1)
+    _connector_seq = count(max(_connectors, default=0) + 1)
+    _session_seq = count(
+        max((i for i in map(_session_id, linked) if isinstance(i, int)), default=0) + 1
+    )
+
+
+def max_transaction_id() -> int:
+    """Return the highest transaction/session id known to the store."""
+
+    candidates = [0]
+    candidates.extend(active_transactions)
+    candidates.extend(completed_transactions)
+    candidates.extend(i for i in sessions if isinstance(i, int))
+    candidates.extend(
+        i for i in map(_session_id, sessions_history) if isinstance(i, int)
+    )
+    return max(candidates)
@@ -1,13 +1,23 @@
 import asyncio
 import logging
+import hashlib
 import json
 from datetime import datetime, timezone
-from typing import List, Any, Dict
+from decimal import Decimal
+from typing import List, Any, Dict, Literal
+import argparse
 import itertools
+import math
+import multiprocessing
+import os
+import signal
+import socket
 import threading
+import time
 from uuid import uuid4
 
 from websockets import serve
+from ocpp.exceptions import OCPPError
 from ocpp.routing import on
 from ocpp.v16 import ChargePoint, call, call_result
 from ocpp.v16.enums import (
@@ -47,24 +57,267 @@ for legacy_name, canonical_name in _ACTION_ALIASES.items():
     elif canonical_attr is None and legacy_attr is not None:
         setattr(Action, canonical_name, legacy_attr)
 
+import codec
+
+# Parse and serialise OCPP frames with the fastest available JSON library.
+codec.install_ocpp()
+
 from fastapi import FastAPI, HTTPException, Request, Header
 from pydantic import BaseModel, Field, ConfigDict, AliasChoices, ValidationError
 import uvicorn
 from api import store
-from fastapi import FastAPI, HTTPException, Request, Header
-from pydantic import BaseModel, Field, ConfigDict, AliasChoices, ValidationError
+from fastapi import FastAPI, HTTPException, Request, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ConfigDict, AliasChoices, ValidationError, model_validator
 import uvicorn
 from api import store
+from api.journal import Journal
 from api.models import PendingSession
-from services.vid_manager import VIDManager
-from services.wallet import WalletService
-
-logging.basicConfig(level=logging.INFO)
+from central_server.log_pipeline import (
+    action_logger,
+    configure_logging,
+    parse_levels,
+    parse_sampling,
+)
+from central_server.bulk import fan_out
+from central_server.commands import CommandTable, KeyReused
+from central_server.live_feed import ConnectorFeed
+from central_server.liveness import LivenessTracker
+from central_server.loop_monitor import LoopMonitor, activity
+from central_server.metrics import MetricsRegistry
+from central_server.outbound import CallRejected, OutboundRegistry
+from central_server.schema_registry import (
+    SchemaRegistry,
+    ValidationPolicy,
+    current_cp,
+    install_ocpp as install_schema_validation,
+)
+from central_server.sharding import ShardRegistry, ShardWorker
+from central_server.timer_wheel import TimerWheel, parse_timeouts
+from central_server.views import MaterializedView
+from services.meter_values import decode_meter_values
+from services.provisioning import ProvisioningScheduler
+from services.vid_manager import vid_manager
+from services.vid_registry import VIDRegistry
+from services.wallet import InsufficientFunds, Posting, ReferenceConflict, WalletService
+
+# Formatting and output happen on a background thread; see log_pipeline.
+log_pipeline = configure_logging(
+    os.environ.get("CHARGEBRIDGE_LOG_LEVEL", "INFO").upper(),
+    fmt=os.environ.get("CHARGEBRIDGE_LOG_FORMAT", "text"),
+    # The ocpp library logs every raw frame at INFO; the handlers below log
+    # each action once.
+    levels=parse_levels(os.environ.get("CHARGEBRIDGE_LOG_LEVELS", "ocpp=WARNING")),
+    rate=float(os.environ.get("CHARGEBRIDGE_LOG_RATE", "5")),
+    sample=parse_sampling(os.environ.get("CHARGEBRIDGE_LOG_SAMPLE", "")),
+)
+log_boot = action_logger("BootNotification")
+log_authorize = action_logger("Authorize")
+log_status = action_logger("StatusNotification")
+log_heartbeat = action_logger("Heartbeat")
+log_meter = action_logger("MeterValues")
+log_data_transfer = action_logger("DataTransfer")
+log_start = action_logger("StartTransaction")
+log_stop = action_logger("StopTransaction")
+log_remote_start = action_logger("RemoteStartTransaction")
+log_remote_stop = action_logger("RemoteStopTransaction")
+log_reset = action_logger("Reset")
+log_change_configuration = action_logger("ChangeConfiguration")
+log_unlock = action_logger("UnlockConnector")
+log_change_availability = action_logger("ChangeAvailability")
+log_http = logging.getLogger("chargebridge.http")
+
+JOURNAL_DIR = os.environ.get("CHARGEBRIDGE_DATA_DIR", "data")
+# Callbacks holding the event loop longer than this are logged with a stack.
+LOOP_STALL_MS = float(os.environ.get("CHARGEBRIDGE_LOOP_STALL_MS", "250"))
+# Connector deltas pushed to /api/v1/live subscribers are batched this long.
+LIVE_COALESCE_MS = float(os.environ.get("CHARGEBRIDGE_LIVE_COALESCE_MS", "250"))
+# Connectors left in Preparing/Occupied without a transaction are unlocked
+# after this many seconds; CHARGEBRIDGE_NO_SESSION_TIMEOUTS overrides it per
+# charge point model ("Model A=120,Model B=45").
+NO_SESSION_TIMEOUT = float(os.environ.get("CHARGEBRIDGE_NO_SESSION_TIMEOUT", "90"))
+NO_SESSION_TIMEOUTS = parse_timeouts(os.environ.get("CHARGEBRIDGE_NO_SESSION_TIMEOUTS", ""))
+# Sent in BootNotification.conf and configured after boot.
+HEARTBEAT_INTERVAL = 300
+# A charge point silent this long (any inbound message counts) is flagged
+# stale; with CHARGEBRIDGE_STALE_CLOSE_AFTER > 0 its connection is closed
+# after that many seconds of silence.
+STALE_AFTER = float(os.environ.get("CHARGEBRIDGE_STALE_AFTER", str(2 * HEARTBEAT_INTERVAL + 60)))
+STALE_CLOSE_AFTER = float(os.environ.get("CHARGEBRIDGE_STALE_CLOSE_AFTER", "0")) or None
+# Deadline of a CALL to a charge point, time queued behind earlier CALLs
+# included; CHARGEBRIDGE_CALL_TIMEOUTS overrides it per action
+# ("Reset=10,RemoteStartTransaction=20").  At most CHARGEBRIDGE_CALL_QUEUE_DEPTH
+# CALLs wait per charge point.  After CHARGEBRIDGE_BREAKER_THRESHOLD deadlines
+# missed in a row, CALLs to it fail at once for CHARGEBRIDGE_BREAKER_COOLDOWN
+# seconds before one is tried again.
+CALL_TIMEOUT = float(os.environ.get("CHARGEBRIDGE_CALL_TIMEOUT", "30"))
+CALL_TIMEOUTS = parse_timeouts(os.environ.get("CHARGEBRIDGE_CALL_TIMEOUTS", ""))
+CALL_QUEUE_DEPTH = int(os.environ.get("CHARGEBRIDGE_CALL_QUEUE_DEPTH", "8"))
+BREAKER_THRESHOLD = int(os.environ.get("CHARGEBRIDGE_BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("CHARGEBRIDGE_BREAKER_COOLDOWN", "30"))
+# Charge points commanded at once by /api/v1/bulk unless the request says otherwise.
+BULK_CONCURRENCY = int(os.environ.get("CHARGEBRIDGE_BULK_CONCURRENCY", "64"))
+# Outcome of a remote command replayed to identical requests (same charge
+# point, command and connector or transaction) for this many seconds, and to
+# requests repeating an Idempotency-Key header for CHARGEBRIDGE_IDEMPOTENCY_TTL.
+COMMAND_TTL = float(os.environ.get("CHARGEBRIDGE_COMMAND_TTL", "5"))
+IDEMPOTENCY_TTL = float(os.environ.get("CHARGEBRIDGE_IDEMPOTENCY_TTL", "300"))
+PROVISION_CONCURRENCY = int(os.environ.get("CHARGEBRIDGE_PROVISION_CONCURRENCY", "16"))
+# Wallet amounts are integers of the currency's minor unit; this many make
+# one unit, for clients still sending decimal ``amount``s.
+WALLET_MINOR_UNITS = int(os.environ.get("CHARGEBRIDGE_WALLET_MINOR_UNITS", "100"))
+# Settlement file entries posted per ledger write by /api/v1/wallet/bulk.
+WALLET_BULK_CHUNK = 512
+# Finished transactions whose meter samples /api/v1/history still returns;
+# older ones keep their summary only.
+HISTORY_SAMPLES = int(os.environ.get("CHARGEBRIDGE_HISTORY_SAMPLES", "10000"))
+# 1 validates every OCPP message; N validates one in N per charge point.
+SCHEMA_SAMPLE_EVERY = int(os.environ.get("CHARGEBRIDGE_SCHEMA_SAMPLE_EVERY", "1"))
 
 connected_cps: Dict[str, "CentralSystem"] = {}
 _tx_counter = itertools.count(1)
-vid_manager = VIDManager()
-wallet = WalletService()
+wallet = WalletService(WALLET_MINOR_UNITS)
+# Post-boot configuration runs through here so boot storms are smoothed out.
+provisioning = ProvisioningScheduler(PROVISION_CONCURRENCY)
+# Per-connector timeouts of every charge point share one timing wheel.
+timers = TimerWheel()
+# OCPP schema validation with compiled validators, strict or sampled per CP.
+schema_policy = ValidationPolicy(SchemaRegistry(), sample_every=SCHEMA_SAMPLE_EVERY)
+install_schema_validation(schema_policy)
+# Set in sharded mode (``--workers N``) by ``main``.
+shard: ShardWorker | None = None
+# The store's write-ahead log, opened by ``main``.
+journal: Journal | None = None
+
+# Served in Prometheus text format at ``/metrics``; gauges are registered
+# further down, next to the state they read.
+metrics = MetricsRegistry()
+ocpp_messages = metrics.counter(
+    "chargebridge_ocpp_messages_total",
+    "OCPP CALLs by action and direction (in: from charge points, out: to them).",
+    ("action", "direction"),
+)
+ocpp_call_errors = metrics.counter(
+    "chargebridge_ocpp_call_errors_total",
+    "CALLERRORs by direction (out: sent by central, in: received as a reply).",
+    ("direction",),
+)
+ocpp_handler_seconds = metrics.histogram(
+    "chargebridge_ocpp_handler_seconds",
+    "Time from receiving a CALL to sending its reply, by action.",
+    ("action",),
+)
+ocpp_call_seconds = metrics.histogram(
+    "chargebridge_ocpp_call_seconds",
+    "Round trip of CALLs sent to charge points, including time queued behind "
+    "an earlier CALL to the same charge point, by action and outcome.",
+    ("action", "outcome"),
+)
+api_requests = metrics.counter(
+    "chargebridge_http_requests_total",
+    "HTTP API requests by method, route and status code.",
+    ("method", "route", "status"),
+)
+api_request_seconds = metrics.histogram(
+    "chargebridge_http_request_seconds",
+    "HTTP API request latency by method and route.",
+    ("method", "route"),
+)
+
+liveness = LivenessTracker(
+    timers,
+    stale_after=STALE_AFTER,
+    close_after=STALE_CLOSE_AFTER,
+    stale_counter=metrics.counter(
+        "chargebridge_stale_connections_total",
+        "Charge point connections flagged stale after a silence of the stale threshold.",
+    ),
+    closed_counter=metrics.counter(
+        "chargebridge_stale_connections_closed_total",
+        "Stale charge point connections closed by the central system.",
+    ),
+)
+metrics.gauge(
+    "chargebridge_stale_connections",
+    "Connected charge points currently flagged stale.",
+    lambda: len(liveness.stale),
+)
+outbound = OutboundRegistry(
+    depth=CALL_QUEUE_DEPTH,
+    default_timeout=CALL_TIMEOUT,
+    timeouts=CALL_TIMEOUTS,
+    failure_threshold=BREAKER_THRESHOLD,
+    cooldown=BREAKER_COOLDOWN,
+    opened_counter=metrics.counter(
+        "chargebridge_circuit_breaker_trips_total",
+        "Charge points whose circuit opened after missing CALL deadlines in a row.",
+    ),
+    rejected_counter=metrics.counter(
+        "chargebridge_ocpp_calls_rejected_total",
+        "CALLs refused without being sent (circuit open or queue full).",
+    ),
+)
+metrics.gauge(
+    "chargebridge_ocpp_calls_queued",
+    "CALLs queued or in flight to charge points.",
+    outbound.queued,
+)
+metrics.gauge(
+    "chargebridge_circuit_breakers",
+    "Charge point connections by circuit breaker state.",
+    lambda: {(state,): count for state, count in outbound.states().items()},
+    ("state",),
+)
+command_requests = metrics.counter(
+    "chargebridge_remote_command_requests_total",
+    "Remote command requests by table and outcome (executed: sent to the "
+    "charge point, joined: shared an in-flight command, replayed: answered "
+    "from a recent outcome, conflict: Idempotency-Key reused for another request).",
+    ("table", "outcome"),
+)
+
+
+def _answered(e: Exception) -> bool:
+    # Only failures the charge point answered (a 409 rejection) are replayed.
+    # Not connected (404), refused unsent (503), timed out (504) or otherwise
+    # failed (500) runs again on the next request.
+    return isinstance(e, HTTPException) and 400 <= e.status_code < 500 and e.status_code != 404
+
+
+commands = CommandTable(
+    COMMAND_TTL, name="commands", counter=command_requests, replay_error=_answered
+)
+idempotent = CommandTable(
+    IDEMPOTENCY_TTL, name="idempotency", counter=command_requests, replay_error=_answered
+)
+metrics.gauge(
+    "chargebridge_remote_commands_inflight",
+    "Remote commands waiting for the charge point's reply.",
+    lambda: len(commands),
+)
+wallet_postings = metrics.counter(
+    "chargebridge_wallet_postings_total",
+    "Wallet postings by type and outcome (posted, duplicate: reference "
+    "already posted, conflict: reference posted with another VID or amount, "
+    "insufficient: charge not covered by the balance).",
+    ("type", "outcome"),
+)
+loop_monitor = LoopMonitor(
+    stall_threshold=LOOP_STALL_MS / 1000,
+    lag_histogram=metrics.histogram(
+        "chargebridge_event_loop_lag_seconds",
+        "How late a probe scheduled on the event loop ran.",
+    ),
+    stall_counter=metrics.counter(
+        "chargebridge_event_loop_stalls_total",
+        f"Callbacks that held the event loop for more than {LOOP_STALL_MS:g} ms.",
+    ),
+)
+
+
+def _call_action(payload: Any) -> str:
+    name = type(payload).__name__
+    return name[:-7] if name.endswith("Payload") else name
 
 
 def _parse_timestamp(ts: str) -> datetime:
@@ -92,61 +345,145 @@ def make_display_message_call(message_type: str, uri: str):
 
 class CentralSystem(ChargePoint):
     def __init__(self, id, connection):
-        super().__init__(id, connection)
+        super().__init__(id, connection, response_timeout=outbound.max_timeout)
         self.active_tx: Dict[int, Dict[str, Any]] = {}
         self.pending_remote: Dict[int, str] = {}
         self.pending_start: Dict[int, Dict[str, Any]] = {}
         self.connector_status: Dict[int, str] = {}
-        self.no_session_tasks: Dict[int, asyncio.Task] = {}
-        self.completed_sessions: List[Dict[str, Any]] = []
+        self.model: str | None = None
+        self.liveness = liveness.track(id, connection.close)
+        self.outbound = outbound.open(id)
         self.last_heartbeat: datetime | None = None
         self.last_vid: str | None = None
         self.last_mac: str | None = None
+        # Transactions survive reconnects (and restarts via the journal); the
+        # charge point will report StopTransaction on this new connection.
+        for _, conn_id, info in store.transactions_for(id):
+            self.active_tx[conn_id] = info
+
+    async def route_message(self, raw_msg):
+        self.liveness.seen()
+        return await super().route_message(raw_msg)
+
+    # Schema validation inside the ocpp library is attributed to this CP;
+    # every CALL in either direction is counted and timed.
+    async def _handle_call(self, msg):
+        action = msg.action
+        ocpp_messages.labels(action, "in").inc()
+        token = current_cp.set(self.id)
+        started = time.perf_counter()
+        try:
+            with activity(f"ocpp:{action}", self.id):
+                return await super()._handle_call(msg)
+        finally:
+            ocpp_handler_seconds.labels(action).observe(time.perf_counter() - started)
+            current_cp.reset(token)
+
+    # Every CALL passes the connection's gate: bounded queue, deadline per
+    # action and circuit breaker (see ``central_server.outbound``).
+    async def call(self, payload, suppress=True, unique_id=None):
+        action = _call_action(payload)
+        ocpp_messages.labels(action, "out").inc()
+        token = current_cp.set(self.id)
+        started = time.perf_counter()
+        outcome = "error"
+        send = super().call
+        try:
+            response = await self.outbound.call(
+                action, lambda: send(payload, suppress=suppress, unique_id=unique_id)
+            )
+            # A suppressed CALLERROR is returned as ``None``.
+            if response is None:
+                ocpp_call_errors.labels("in").inc()
+            else:
+                outcome = "ok"
+            return response
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise
+        except CallRejected:
+            outcome = "rejected"
+            raise
+        except OCPPError:
+            ocpp_call_errors.labels("in").inc()
+            raise
+        finally:
+            ocpp_call_seconds.labels(action, outcome).observe(time.perf_counter() - started)
+            current_cp.reset(token)
+
+    async def _send(self, message):
+        if message.startswith("[4"):
+            ocpp_call_errors.labels("out").inc()
+        await super()._send(message)
 
     async def remote_start(self, connector_id: int, id_tag: str):
         req = call.RemoteStartTransaction(
             id_tag=id_tag,
             connector_id=connector_id
         )
-        logging.info(f"→ RemoteStartTransaction to {self.id} (connector={connector_id}, idTag={id_tag})")
+        log_remote_start.info(
+            "→ RemoteStartTransaction to %s (connector=%s, idTag=%s)",
+            self.id,
+            connector_id,
+            id_tag,
+            extra={"cpid": self.id},
+        )
         resp = await self.call(req)
         status = getattr(resp, "status", None)
         if status == RemoteStartStopStatus.accepted:
             self.pending_remote[int(connector_id)] = id_tag
         else:
-            logging.warning(f"RemoteStartTransaction rejected: {status}")
+            log_remote_start.warning(
+                "RemoteStartTransaction rejected: %s", status, extra={"cpid": self.id}
+            )
         return status
 
     async def remote_stop(self, transaction_id: int):
         req = call.RemoteStopTransaction(transaction_id=transaction_id)
-        logging.info(f"→ RemoteStopTransaction to {self.id} (tx={transaction_id})")
+        log_remote_stop.info(
+            "→ RemoteStopTransaction to %s (tx=%s)",
+            self.id,
+            transaction_id,
+            extra={"cpid": self.id},
+        )
         resp = await self.call(req)
         status = getattr(resp, "status", None)
         if status != RemoteStartStopStatus.accepted:
-            logging.warning(f"RemoteStopTransaction rejected: {status}")
+            log_remote_stop.warning(
+                "RemoteStopTransaction rejected: %s", status, extra={"cpid": self.id}
+            )
         return status
 
     async def remote_reset(self, reset_type: str):
         req = call.Reset(type=reset_type)
-        logging.info(f"→ Reset to {self.id} (type={reset_type})")
+        log_reset.info("→ Reset to %s (type=%s)", self.id, reset_type, extra={"cpid": self.id})
         resp = await self.call(req)
         status = getattr(resp, "status", None)
         if status != ResetStatus.accepted:
-            logging.warning(f"Reset rejected: {status}")
+            log_reset.warning("Reset rejected: %s", status, extra={"cpid": self.id})
         return status
 
     async def change_configuration(self, key: str, value: str):
         req = call.ChangeConfiguration(key=key, value=value)
-        logging.info(f"→ ChangeConfiguration to {self.id} ({key}={value})")
+        log_change_configuration.info(
+            "→ ChangeConfiguration to %s (%s=%s)", self.id, key, value, extra={"cpid": self.id}
+        )
         resp = await self.call(req)
-        logging.info(f"← ChangeConfiguration.conf: {resp}")
+        log_change_configuration.info(
+            "← ChangeConfiguration.conf: %s", resp, extra={"cpid": self.id}
+        )
         return getattr(resp, "status", None)
 
     async def unlock_connector(self, connector_id: int):
         req = call.UnlockConnector(connector_id=connector_id)
-        logging.info(f"→ UnlockConnector to {self.id} (connector={connector_id})")
+        log_unlock.info(
+            "→ UnlockConnector to %s (connector=%s)",
+            self.id,
+            connector_id,
+            extra={"cpid": self.id},
+        )
         resp = await self.call(req)
-        logging.info(f"← UnlockConnector.conf: {resp}")
+        log_unlock.info("← UnlockConnector.conf: %s", resp, extra={"cpid": self.id})
         return getattr(resp, "status", None)
 
     async def change_availability(self, connector_id: int, available: bool):
@@ -154,41 +491,68 @@ class CentralSystem(ChargePoint):
             connector_id=connector_id,
             type=AvailabilityType.operative if available else AvailabilityType.inoperative,
         )
-        logging.info(
-            f"→ ChangeAvailability to {self.id} (connector={connector_id}, available={available})"
+        log_change_availability.info(
+            "→ ChangeAvailability to %s (connector=%s, available=%s)",
+            self.id,
+            connector_id,
+            available,
+            extra={"cpid": self.id},
         )
         resp = await self.call(req)
-        logging.info(f"← ChangeAvailability.conf: {resp}")
+        log_change_availability.info(
+            "← ChangeAvailability.conf: %s", resp, extra={"cpid": self.id}
+        )
         return getattr(resp, "status", None)
 
-    async def _no_session_watchdog(self, connector_id: int, timeout: int = 90):
+    @property
+    def no_session_timeout(self) -> float:
+        return NO_SESSION_TIMEOUTS.get(self.model, NO_SESSION_TIMEOUT)
+
+    def watch_no_session(self, connector_id: int) -> None:
+        """Unlock ``connector_id`` if no transaction starts in time."""
+        key = (self, connector_id, "no-session")
+        if key not in timers:
+            timeout = self.no_session_timeout
+            timers.arm(key, timeout, lambda: self._no_session_expired(connector_id, timeout))
+
+    def cancel_no_session(self, connector_id: int) -> None:
+        timers.cancel((self, connector_id, "no-session"))
+
+    def _no_session_expired(self, connector_id: int, timeout: float) -> None:
+        status = self.connector_status.get(connector_id)
+        if status in ("Preparing", "Occupied") and connector_id not in self.active_tx:
+            logging.info(
+                f"No session started for connector {connector_id} after {timeout:g}s → unlocking"
+            )
+            asyncio.create_task(self._release_idle(connector_id))
+
+    async def _release_idle(self, connector_id: int) -> None:
         try:
-            await asyncio.sleep(timeout)
-            status = self.connector_status.get(connector_id)
-            if status in ("Preparing", "Occupied") and connector_id not in self.active_tx:
-                logging.info(
-                    f"No session started for connector {connector_id} after {timeout}s → unlocking"
-                )
-                await self.unlock_connector(connector_id)
-                self.pending_remote.pop(connector_id, None)
-                self.pending_start.pop(connector_id, None)
-        except asyncio.CancelledError:
-            logging.debug(f"Watchdog for connector {connector_id} cancelled")
-        finally:
-            self.no_session_tasks.pop(connector_id, None)
+            await self.unlock_connector(connector_id)
+        except Exception as e:
+            logging.warning(f"Unlocking idle connector {connector_id} of {self.id} failed: {e}")
+            return
+        self.pending_remote.pop(connector_id, None)
+        self.pending_start.pop(connector_id, None)
 
     @on(Action.boot_notification)
     async def on_boot_notification(self, charge_point_model, charge_point_vendor, **kwargs):
-        logging.info(
-            f"← BootNotification from vendor={charge_point_vendor}, model={charge_point_model}"
+        log_boot.info(
+            "← BootNotification from %s: vendor=%s, model=%s",
+            self.id,
+            charge_point_vendor,
+            charge_point_model,
+            extra={"cpid": self.id},
         )
+        self.model = charge_point_model
         response = call_result.BootNotification(
             current_time=datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
-            interval=300,
+            interval=HEARTBEAT_INTERVAL,
             status=RegistrationStatus.accepted,
         )
 
-        asyncio.create_task(self._post_boot_actions())
+        # Charge points with open transactions are configured first.
+        provisioning.submit(self.id, self._post_boot_actions, priority=1 if self.active_tx else 0)
 
         return response
 
@@ -225,7 +589,7 @@ class CentralSystem(ChargePoint):
         except Exception as e:
             logging.warning(f"Failed to fetch supported configuration keys: {e}")
         desired_configs = {
-            "HeartbeatInterval": "300",
+            "HeartbeatInterval": str(HEARTBEAT_INTERVAL),
             "MeterValueSampleInterval": "60",
             "OcppUrl": "wss://example.com/ocpp",
             "FreeChargingEnabled": "true",
@@ -245,8 +609,11 @@ class CentralSystem(ChargePoint):
                     )
                     await self._send_change_configuration(dt_req)
                 except Exception as e:
-                    logging.warning(
-                        f"Failed to send unsupported key {key} via DataTransfer: {e}"
+                    log_change_configuration.warning(
+                        "Failed to send unsupported key %s via DataTransfer: %s",
+                        key,
+                        e,
+                        extra={"cpid": self.id},
                     )
 
         if "AuthorizeRemoteTxRequests" in supported_keys:
@@ -265,18 +632,26 @@ class CentralSystem(ChargePoint):
                 fallback = make_display_message_call(message_type="QRCode", uri=qr_url)
                 await self._send_change_configuration(fallback)
             except Exception as e:
-                logging.error(f"Failed to send fallback display message: {e}")
+                log_change_configuration.error(
+                    "Failed to send fallback display message: %s", e, extra={"cpid": self.id}
+                )
 
     async def _send_change_configuration(self, request_payload):
         try:
             resp = await self.call(request_payload)
-            logging.info(f"→ ChangeConfiguration / Custom response: {resp}")
+            log_change_configuration.info(
+                "→ ChangeConfiguration / Custom response: %s", resp, extra={"cpid": self.id}
+            )
         except Exception as e:
-            logging.error(f"!!! ChangeConfiguration/custom failed: {e}")
+            log_change_configuration.error(
+                "!!! ChangeConfiguration/custom failed: %s", e, extra={"cpid": self.id}
+            )
 
     @on(Action.authorize)
     async def on_authorize(self, id_tag, **kwargs):
-        logging.info(f"← Authorize request, idTag={id_tag}")
+        log_authorize.info(
+            "← Authorize request from %s, idTag=%s", self.id, id_tag, extra={"cpid": self.id}
+        )
         conn_id = int(kwargs.get("connector_id", 0) or 0)
         vid = vid_manager.get_or_create_vid("id_tag", id_tag) if id_tag else None
         info = self.pending_start.get(conn_id, {})
@@ -295,17 +670,27 @@ class CentralSystem(ChargePoint):
         if mac:
             info["mac"] = mac
         self.pending_start[conn_id] = info
-        store.pending[(self.id, conn_id)] = PendingSession(
-            station_id=self.id, connector_id=conn_id, id_tag=id_tag, vid=vid, mac=mac
+        store.set_pending(
+            self.id,
+            conn_id,
+            PendingSession(
+                station_id=self.id, connector_id=conn_id, id_tag=id_tag, vid=vid, mac=mac
+            ),
         )
+        _connector_changed(self.id, conn_id)
         self.last_vid = vid
         self.last_mac = mac if mac else self.last_mac
         return call_result.Authorize(id_tag_info={"status": AuthorizationStatus.accepted})
 
     @on(Action.status_notification)
     async def on_status_notification(self, connector_id, error_code, status, **kwargs):
-        logging.info(
-            f"← StatusNotification: connector {connector_id} → status={status}, errorCode={error_code}"
+        log_status.info(
+            "← StatusNotification from %s: connector %s → status=%s, errorCode=%s",
+            self.id,
+            connector_id,
+            status,
+            error_code,
+            extra={"cpid": self.id},
         )
         c_id = int(connector_id)
         self.connector_status[c_id] = status
@@ -326,34 +711,36 @@ class CentralSystem(ChargePoint):
                 vid = vid_manager.get_or_create_vid(
                     "temp", f"{self.id}:{c_id}:{uuid4().hex}"
                 )
-            store.pending[(self.id, c_id)] = PendingSession(
-                station_id=self.id,
-                connector_id=c_id,
-                id_tag=vid,
-                vid=vid,
-                mac=mac,
+            store.set_pending(
+                self.id,
+                c_id,
+                PendingSession(
+                    station_id=self.id,
+                    connector_id=c_id,
+                    id_tag=vid,
+                    vid=vid,
+                    mac=mac,
+                ),
             )
             self.pending_start[c_id] = {"vid": vid, "mac": mac}
             self.last_vid = None
             self.last_mac = None
-            store.pending.pop((self.id, 0), None)
+            if store.pop_pending(self.id, 0) is not None:
+                _connector_changed(self.id, 0)
         else:
-            store.pending.pop((self.id, c_id), None)
+            store.pop_pending(self.id, c_id)
             self.pending_start.pop(c_id, None)
+        _connector_changed(self.id, c_id)
         if status in ("Preparing", "Occupied"):
-            if c_id not in self.active_tx and c_id not in self.no_session_tasks:
-                self.no_session_tasks[c_id] = asyncio.create_task(
-                    self._no_session_watchdog(c_id)
-                )
+            if c_id not in self.active_tx:
+                self.watch_no_session(c_id)
         else:
-            task = self.no_session_tasks.pop(c_id, None)
-            if task:
-                task.cancel()
+            self.cancel_no_session(c_id)
         return call_result.StatusNotification()
 
     @on(Action.heartbeat)
     def on_heartbeat(self, **kwargs):
-        logging.info("← Heartbeat received")
+        log_heartbeat.debug("← Heartbeat from %s", self.id, extra={"cpid": self.id})
         self.last_heartbeat = datetime.now(timezone.utc)
         return call_result.Heartbeat(
             current_time=self.last_heartbeat.isoformat().replace("+00:00", "Z")
@@ -361,35 +748,25 @@ class CentralSystem(ChargePoint):
 
     @on(Action.meter_values)
     async def on_meter_values(self, connector_id, meter_value, **kwargs):
-        logging.info(f"← MeterValues from connector {connector_id}: {meter_value}")
+        log_meter.debug(
+            "← MeterValues from %s connector %s: %s",
+            self.id,
+            connector_id,
+            meter_value,
+            extra={"cpid": self.id},
+        )
         c_id = int(connector_id)
         session = self.active_tx.get(c_id)
         if session is not None:
-            tx_id = session.get("transaction_id")
-            for entry in meter_value:
-                sample = {"timestamp": entry.get("timestamp")}
-                for sv in entry.get("sampledValue", []):
-                    meas = sv.get("measurand")
-                    try:
-                        val = float(sv.get("value"))
-                    except (TypeError, ValueError):
-                        continue
-                    if meas == "Current.Import":
-                        sample["current"] = val
-                    elif meas == "Voltage":
-                        sample["voltage"] = val
-                    elif meas == "Power.Active.Import":
-                        sample["power"] = val
-                    elif meas == "SoC":
-                        sample["soc"] = val
-                    elif meas == "Temperature":
-                        sample["temperature"] = val
-                    elif meas == "Energy.Active.Import.Register":
-                        sample["energy"] = val
-                session.setdefault("meter_samples", []).append(sample)
-                session["last_sample"] = sample
+            samples = decode_meter_values(meter_value)
+            if samples:
+                last = session.setdefault("last_sample", {})
+                for sample in samples:
+                    last.update(sample)
+                tx_id = session.get("transaction_id")
                 if tx_id is not None:
-                    store.record_meter_value(int(tx_id), sample)
+                    store.record_meter_values(int(tx_id), samples)
+                _connector_changed(self.id, c_id)
         return call_result.MeterValues()
 
     @on(Action.data_transfer)
@@ -413,7 +790,9 @@ class CentralSystem(ChargePoint):
         try:
             parsed = json.loads(data) if isinstance(data, str) else data
         except Exception as exc:
-            logging.error("DataTransfer parse error from %s: %s", cp_id, exc)
+            log_data_transfer.error(
+                "DataTransfer parse error from %s: %s", cp_id, exc, extra={"cpid": cp_id}
+            )
             return call_result.DataTransfer(status=DataTransferStatus.rejected)
 
         count = 0
@@ -422,12 +801,13 @@ class CentralSystem(ChargePoint):
         elif parsed is not None:
             count = 1
 
-        logging.info(
+        log_data_transfer.info(
             "← DataTransfer from %s: vendorId=%s, messageId=%s, accepted=%d",
             cp_id,
             vendor_id,
             message_id,
             count,
+            extra={"cpid": cp_id},
         )
 
         if debug:
@@ -435,7 +815,9 @@ class CentralSystem(ChargePoint):
             sanitized = serialized.replace("\n", " ")
             if len(sanitized) > 2000:
                 sanitized = sanitized[:2000] + "..."
-            logging.debug("Sanitized DataTransfer payload from %s: %s", cp_id, sanitized)
+            log_data_transfer.debug(
+                "Sanitized DataTransfer payload from %s: %s", cp_id, sanitized, extra={"cpid": cp_id}
+            )
 
         vid = None
         mac = None
@@ -466,6 +848,8 @@ class CentralSystem(ChargePoint):
                     pending.vid = vid
                     if mac:
                         pending.mac = mac
+                    store.set_pending(sid, cid, pending)
+                    _connector_changed(sid, cid)
                     ps = self.pending_start.setdefault(cid, {})
                     ps["vid"] = vid
                     if mac:
@@ -498,7 +882,7 @@ class CentralSystem(ChargePoint):
 
         pending = self.pending_start.pop(int(connector_id), None)
         self.pending_remote.pop(int(connector_id), None)
-        store.pending.pop((self.id, int(connector_id)), None)
+        store.pop_pending(self.id, int(connector_id))
 
         tx_id = next(_tx_counter)
         store.clear_meter_values(tx_id)
@@ -507,7 +891,6 @@ class CentralSystem(ChargePoint):
             "id_tag": id_tag,
             "meter_start": meter_start,
             "start_time": _parse_timestamp(timestamp),
-            "meter_samples": [],
         }
         if pending:
             if "vid" in pending:
@@ -524,17 +907,35 @@ class CentralSystem(ChargePoint):
             self.last_mac = None
         if "mac" in info and "vid" not in info:
             info["vid"] = vid_manager.get_or_create_vid("mac", info["mac"])
+        previous = self.active_tx.get(int(connector_id))
+        if previous:
+            # Never stopped; its samples would otherwise outlive it.
+            store.pop_transaction(previous.get("transaction_id"))
+            store.clear_meter_values(previous.get("transaction_id"))
+            active_view.touch(previous.get("transaction_id"))
         self.active_tx[int(connector_id)] = info
-        task = self.no_session_tasks.pop(int(connector_id), None)
-        if task:
-            task.cancel()
-        logging.info(
-            f"← StartTransaction from {self.id}: connector={connector_id}, idTag={id_tag}, meterStart={meter_start}, vid={info.get('vid')}"
+        store.register_transaction(tx_id, self.id, int(connector_id), info)
+        active_view.touch(tx_id)
+        _connector_changed(self.id, int(connector_id))
+        self.cancel_no_session(int(connector_id))
+        log_start.info(
+            "← StartTransaction from %s: connector=%s, idTag=%s, meterStart=%s, vid=%s → transactionId=%s",
+            self.id,
+            connector_id,
+            id_tag,
+            meter_start,
+            info.get("vid"),
+            tx_id,
+            extra={"cpid": self.id},
         )
-        logging.info(f"→ Assign transactionId={tx_id}")
         vid = info.get("vid")
         if vid and wallet.get_balance(vid) <= 0:
-            logging.info(f"Insufficient balance for {vid}; stopping transaction {tx_id}")
+            log_start.info(
+                "Insufficient balance for %s; stopping transaction %s",
+                vid,
+                tx_id,
+                extra={"cpid": self.id},
+            )
             asyncio.create_task(self.remote_stop(tx_id))
         return call_result.StartTransaction(
             transaction_id=tx_id,
@@ -545,24 +946,26 @@ class CentralSystem(ChargePoint):
     async def on_stop_transaction(self, transaction_id, meter_stop, timestamp, **kwargs):
         session_info = None
         c_id = None
-        for conn_id, info in list(self.active_tx.items()):
-            if info.get("transaction_id") == int(transaction_id):
-                session_info = info
-                c_id = conn_id
-                self.active_tx.pop(conn_id, None)
-                break
-        logging.info(f"← StopTransaction from {self.id}: tx={transaction_id}, meterStop={meter_stop}")
+        entry = store.get_transaction(int(transaction_id))
+        if entry is not None and entry[0] == self.id:
+            _, c_id, session_info = entry
+            self.active_tx.pop(c_id, None)
+            _connector_changed(self.id, c_id)
+        log_stop.info(
+            "← StopTransaction from %s: tx=%s, meterStop=%s",
+            self.id,
+            transaction_id,
+            meter_stop,
+            extra={"cpid": self.id},
+        )
         if session_info:
             start_time = session_info.get("start_time")
             stop_time = _parse_timestamp(timestamp)
             duration_secs = (stop_time - start_time).total_seconds() if start_time else 0
             meter_start = session_info.get("meter_start", meter_stop)
             energy = meter_stop - meter_start
-            samples = (
-                store.get_meter_values(int(transaction_id))
-                or session_info.get("meter_samples", [])
-            )
             record = {
+                "cpid": self.id,
                 "connectorId": c_id,
                 "transactionId": int(transaction_id),
                 "idTag": session_info.get("id_tag", ""),
@@ -574,15 +977,18 @@ class CentralSystem(ChargePoint):
                 "startTime": start_time.isoformat() if start_time else None,
                 "stopTime": stop_time.isoformat(),
                 "durationSecs": duration_secs,
-                "samples": session_info.get("meter_samples", []),
             }
             last_sample = session_info.get("last_sample", {})
             record["current"] = last_sample.get("current")
             record["voltage"] = last_sample.get("voltage")
             record["temperature"] = last_sample.get("temperature")
             record["soc"] = last_sample.get("soc")
-            self.completed_sessions.append(record)
-            logging.info(f"Session summary: {record}")
+            samples = len(store.get_meter_series(int(transaction_id)) or ())
+            store.complete_transaction(int(transaction_id), record)
+            active_view.touch(int(transaction_id))
+            log_stop.info(
+                "Session summary: %s (%d samples)", record, samples, extra={"cpid": self.id}
+            )
         return call_result.StopTransaction(
             id_tag_info={"status": AuthorizationStatus.accepted}
         )
@@ -593,16 +999,122 @@ API_KEY = "changeme-123"
 app = FastAPI(title="OCPP Central Control API", version="1.0.0")
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logging.info(f">>> {request.method} {request.url.path}")
-    try:
-        response = await call_next(request)
-        logging.info(f"<<< {request.method} {request.url.path} -> {response.status_code}")
-        return response
-    except Exception:
-        logging.exception("Handler crashed")
-        raise
+# Route templates (``/api/v1/cp/{cpid}``) by endpoint, for metric labels.
+_route_paths: Dict[Any, str] = {}
+
+
+def _route_label(scope: Dict[str, Any]) -> str:
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None:
+        path = next(
+            (r.path for r in app.routes if getattr(r, "endpoint", None) is endpoint), "unmatched"
+        )
+        _route_paths[endpoint] = path
+    return path
+
+
+class RequestLogMiddleware:
+    """Log, count and time every HTTP request.
+
+    Plain ASGI rather than ``@app.middleware("http")``, which runs the
+    endpoint outside the request's asyncio task: here the whole request,
+    including writing the response, is attributed to it by the loop monitor.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        try:
+            with activity(f"http:{method} {scope['path']}"):
+                await self.app(scope, receive, send_with_status)
+            log_http.info(
+                "%s %s -> %d (%.1f ms)",
+                method,
+                scope["path"],
+                status,
+                (time.perf_counter() - started) * 1000,
+            )
+        except Exception:
+            log_http.exception("Handler crashed: %s %s", method, scope["path"])
+            raise
+        finally:
+            route = _route_label(scope)
+            api_requests.labels(method, route, str(status)).inc()
+            api_request_seconds.labels(method, route).observe(time.perf_counter() - started)
+
+
+app.add_middleware(RequestLogMiddleware)
+
+
+metrics.gauge(
+    "chargebridge_connected_charge_points",
+    "Charge points with an open OCPP connection.",
+    lambda: len(connected_cps),
+)
+metrics.gauge(
+    "chargebridge_active_transactions",
+    "Running OCPP transactions.",
+    lambda: len(store.active_transactions),
+)
+metrics.gauge(
+    "chargebridge_pending_sessions",
+    "Authorized or remotely started sessions waiting for StartTransaction.",
+    lambda: len(store.pending),
+)
+metrics.gauge(
+    "chargebridge_connector_timers",
+    "Armed connector timeouts (connectors waiting for a session before they are unlocked).",
+    lambda: len(timers),
+)
+
+
+def _provisioning_jobs() -> Dict[tuple, int]:
+    stats = provisioning.stats()
+    return {("queued",): stats["queued"], ("running",): stats["running"]}
+
+
+metrics.gauge(
+    "chargebridge_provisioning_jobs",
+    "Post-boot provisioning jobs by state.",
+    _provisioning_jobs,
+    ("state",),
+)
+metrics.gauge(
+    "chargebridge_log_records_queued",
+    "Log records waiting for the logging thread.",
+    lambda: log_pipeline.stats()["queued"],
+)
+journal_errors = metrics.counter(
+    "chargebridge_journal_write_errors_total",
+    "Journal group commits that failed and were retried.",
+)
+metrics.gauge(
+    "chargebridge_journal_failed",
+    "1 while journal commits keep failing and records queue up in memory.",
+    lambda: int(journal is not None and journal.failed),
+)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/api/v1/health")
@@ -610,6 +1122,63 @@ def health():
     now = datetime.now(timezone.utc)
     return {"ok": True, "time": now.isoformat().replace("+00:00", "Z")}
 
+
+class ProvisioningPriorityReq(BaseModel):
+    cpid: str
+    priority: int
+
+
+@app.get("/api/v1/provisioning")
+async def get_provisioning():
+    """Post-boot provisioning queue depth and counters."""
+    return provisioning.stats()
+
+
+@app.post("/api/v1/provisioning/priority")
+async def set_provisioning_priority(req: ProvisioningPriorityReq):
+    provisioning.set_priority(req.cpid, req.priority)
+    return {"cpid": req.cpid, "priority": req.priority}
+
+
+class ValidationPolicyReq(BaseModel):
+    cpid: str
+    sampleEvery: int = Field(ge=1)
+
+
+@app.get("/api/v1/validation")
+async def get_validation():
+    """Schema validation counters and per-CP sampling policy."""
+    return schema_policy.stats()
+
+
+@app.post("/api/v1/validation/policy")
+async def set_validation_policy(req: ValidationPolicyReq):
+    schema_policy.set_mode(req.cpid, req.sampleEvery)
+    return {"cpid": req.cpid, "sampleEvery": schema_policy.mode(req.cpid)}
+
+
+@app.get("/api/v1/loop")
+async def get_loop(limit: int = Query(10, ge=0, le=50)):
+    """Event-loop lag and the latest stalls with the stack that caused them."""
+    return {**loop_monitor.stats(), "recentStalls": loop_monitor.recent_stalls(limit)}
+
+
+@app.get("/api/v1/liveness")
+async def get_liveness(limit: int = Query(50, ge=0, le=1000)):
+    """Connections by time since their last message, and the stale ones."""
+    return liveness.snapshot(limit)
+
+
+@app.get("/api/v1/outbound")
+async def get_outbound(
+    limit: int = Query(50, ge=0, le=1000),
+    state: str | None = Query(None, pattern="^(closed|open|half-open)$"),
+    cpid: str | None = None,
+):
+    """CALLs queued per charge point and circuit breaker states."""
+    return outbound.snapshot(limit, state, cpid)
+
+
 class StationIn(BaseModel):
     name: str
     location: str | None = None
@@ -690,6 +1259,25 @@ class AvailabilityReq(BaseModel):
     available: bool
 
 
+class BulkTarget(BaseModel):
+    cpids: List[str] | None = None
+    # Stations registered through /api/v1/stations, by id; a station's
+    # name is its charge point id.
+    stationIds: List[int] | None = None
+    all: bool = False
+
+
+class BulkReq(BaseModel):
+    target: BulkTarget
+    key: str | None = None
+    value: str | None = None
+    connectorId: int = 0
+    available: bool = True
+    type: str = "Soft"
+    concurrency: int = Field(default=BULK_CONCURRENCY, ge=1, le=1000)
+    timeout: float = Field(default=30.0, gt=0, le=300)
+
+
 class SessionStartReq(BaseModel):
     vehicleId: str
 
@@ -729,7 +1317,30 @@ class UserIdentifier(BaseModel):
 
 class WalletReq(BaseModel):
     identifier: UserIdentifier
-    amount: float
+    # Minor units (satang); a decimal ``amount`` in whole units also works.
+    amountMinor: int | None = Field(default=None, gt=0)
+    amount: Decimal | None = Field(default=None, gt=0)
+    # Payment or settlement line id; a reference is posted only once.
+    reference: str | None = None
+
+    @model_validator(mode="after")
+    def _minor_units(self) -> "WalletReq":
+        if self.amountMinor is None:
+            if self.amount is None:
+                raise ValueError("amountMinor or amount is required")
+            minor = self.amount * WALLET_MINOR_UNITS
+            if minor != minor.to_integral_value():
+                raise ValueError(f"amount {self.amount} is finer than the minor unit")
+            self.amountMinor = int(minor)
+        return self
+
+
+class WalletBulkEntry(WalletReq):
+    type: Literal["topup", "charge"]
+
+
+class WalletBulkReq(BaseModel):
+    entries: List[WalletBulkEntry] = Field(min_length=1)
 
 
 class CompletedSession(BaseModel):
@@ -754,29 +1365,33 @@ class CompletedSession(BaseModel):
     soc: float | None = None
 
 
-class ConnectorStatus(BaseModel):
-    cpid: str
-    connectorId: int
-    status: str
-
-
-class ConnectorOverview(BaseModel):
-    cpid: str
-    connectorId: int
-    status: str
-    pending: PendingSession | None = None
-    active: Dict[str, Any] | None = None
-
-
 def require_key(x_api_key: str | None):
     if API_KEY and x_api_key != API_KEY:
         raise HTTPException(status_code=401, detail="invalid api key")
 
 
+def _call_failed(e: Exception) -> HTTPException:
+    """The HTTP error for a remote command that got no usable answer."""
+    if isinstance(e, CallRejected):
+        return HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="ChargePoint did not answer in time")
+    return HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/v1/start")
-async def api_start(req: StartReq):
+async def api_start(req: StartReq, idempotency_key: str | None = Header(default=None)):
+    return await _run_command("start", req, idempotency_key)
+
+
+async def _start_charge_point(req: StartReq):
     cp = connected_cps.get(req.cpid)
     if not cp:
+        routed = await _forward("start", req)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
     try:
         id_tag = req.id_tag or DEFAULT_ID_TAG
@@ -797,26 +1412,32 @@ async def api_start(req: StartReq):
         if status != RemoteStartStopStatus.accepted:
             cp.pending_start.pop(int(req.connectorId), None)
             raise HTTPException(status_code=409, detail=f"RemoteStart rejected: {status}")
-        store.pending.pop((req.cpid, int(req.connectorId)), None)
+        if store.pop_pending(req.cpid, int(req.connectorId)) is not None:
+            _connector_changed(req.cpid, int(req.connectorId))
         return {"ok": True, "message": "RemoteStartTransaction sent"}
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
 
 
 @app.post("/api/v1/stop")
-async def api_stop(req: StopReq):
+async def api_stop(req: StopReq, idempotency_key: str | None = Header(default=None)):
+    return await _run_command("stop", req, idempotency_key)
+
+
+async def _stop_charge_point(req: StopReq):
     cp = connected_cps.get(req.cpid)
     if not cp:
+        routed = await _forward("stop", req)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
     try:
         tx_id = req.transactionId
         if tx_id is not None:
-            if not any(
-                session.get("transaction_id") == tx_id
-                for session in cp.active_tx.values()
-            ):
+            entry = store.get_transaction(tx_id)
+            if entry is None or entry[0] != req.cpid:
                 raise HTTPException(status_code=404, detail="No matching active transaction")
         elif req.connectorId is not None:
             session = cp.active_tx.get(req.connectorId)
@@ -831,13 +1452,22 @@ async def api_stop(req: StopReq):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
 
 
 @app.post("/charge/stop")
-async def api_stop_by_connector(req: StopByConnectorReq):
+async def api_stop_by_connector(
+    req: StopByConnectorReq, idempotency_key: str | None = Header(default=None)
+):
+    return await _run_command("stop_by_connector", req, idempotency_key)
+
+
+async def _stop_connector(req: StopByConnectorReq):
     cp = connected_cps.get(req.cpid)
     if not cp:
+        routed = await _forward("stop_by_connector", req)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
     session = cp.active_tx.get(req.connectorId)
     if session is None:
@@ -851,19 +1481,24 @@ async def api_stop_by_connector(req: StopByConnectorReq):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
 
 
 @app.post("/api/v1/release")
-async def api_release(req: ReleaseReq):
+async def api_release(req: ReleaseReq, idempotency_key: str | None = Header(default=None)):
+    return await _run_command("release", req, idempotency_key)
+
+
+async def _release_connector(req: ReleaseReq):
     cp = connected_cps.get(req.cpid)
     if not cp:
+        routed = await _forward("release", req)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
     if req.connectorId in cp.active_tx:
         raise HTTPException(status_code=400, detail="Connector has active transaction")
-    task = cp.no_session_tasks.pop(req.connectorId, None)
-    if task:
-        task.cancel()
+    cp.cancel_no_session(req.connectorId)
     cp.pending_remote.pop(req.connectorId, None)
     cp.pending_start.pop(req.connectorId, None)
     try:
@@ -872,30 +1507,22 @@ async def api_release(req: ReleaseReq):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
 
 
 @app.post("/api/v1/availability")
-async def api_change_availability(req: AvailabilityReq):
-    cp = connected_cps.get(req.cpid)
-    if not cp:
-        raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
-    try:
-        status = await cp.change_availability(req.connectorId, req.available)
-        if status not in (AvailabilityStatus.accepted, AvailabilityStatus.scheduled):
-            raise HTTPException(status_code=409, detail=f"ChangeAvailability rejected: {status}")
-        value = status.value if hasattr(status, "value") else status
-        return {"ok": True, "status": value}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def api_change_availability(
+    req: AvailabilityReq, idempotency_key: str | None = Header(default=None)
+):
+    return await _run_command("availability", req, idempotency_key)
 
 
-@app.post("/api/v1/availability")
-async def api_change_availability(req: AvailabilityReq):
+async def _change_availability(req: AvailabilityReq):
     cp = connected_cps.get(req.cpid)
     if not cp:
+        routed = await _forward("availability", req)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{req.cpid}' not connected")
     try:
         status = await cp.change_availability(req.connectorId, req.available)
@@ -906,7 +1533,7 @@ async def api_change_availability(req: AvailabilityReq):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
 
 @app.post("/api/v1/reset")
 async def api_reset(request: Request):
@@ -921,8 +1548,15 @@ async def api_reset(request: Request):
         data = ResetReq(**payload)
     except ValidationError as e:
         raise HTTPException(status_code=400, detail=e.errors())
+    return await _run_command("reset", data, request.headers.get("idempotency-key"))
+
+
+async def _reset_charge_point(data: ResetReq):
     cp = connected_cps.get(data.cpid)
     if not cp:
+        routed = await _forward("reset", data)
+        if routed is not None:
+            return routed
         raise HTTPException(status_code=404, detail=f"ChargePoint '{data.cpid}' not connected")
     if data.type not in ("Hard", "Soft"):
         raise HTTPException(status_code=400, detail="invalid reset type")
@@ -934,43 +1568,395 @@ async def api_reset(request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _call_failed(e)
+
+# Commands that are executed by the worker owning the charge point when the
+# central runs sharded (see ``run_workers``).
+_SHARD_ROUTES = {
+    "start": (_start_charge_point, StartReq),
+    "stop": (_stop_charge_point, StopReq),
+    "stop_by_connector": (_stop_connector, StopByConnectorReq),
+    "release": (_release_connector, ReleaseReq),
+    "availability": (_change_availability, AvailabilityReq),
+    "reset": (_reset_charge_point, ResetReq),
+}
+
+# What a remote command acts on besides the charge point: requests that agree
+# on it share one OCPP call (see ``_run_command``).
+_COMMAND_TARGETS = {
+    "start": lambda req: (int(req.connectorId), req.id_tag, req.vid, req.mac),
+    "stop": lambda req: (req.transactionId, req.connectorId),
+    "stop_by_connector": lambda req: req.connectorId,
+    "release": lambda req: req.connectorId,
+    "availability": lambda req: (req.connectorId, req.available),
+    "reset": lambda req: req.type,
+}
+
+
+async def _run_command(route: str, req: BaseModel, idempotency_key: str | None = None):
+    """Run a remote command once for all identical requests in flight.
+
+    Requests for the same charge point, command and target share the OCPP
+    call and its outcome, which is replayed for ``COMMAND_TTL`` seconds; a
+    request carrying an ``Idempotency-Key`` header gets the outcome of the
+    first request with that key for ``IDEMPOTENCY_TTL`` seconds, or ``422``
+    if that request had another route or body.  In sharded mode the worker
+    owning the charge point shares in-flight commands again, so duplicates
+    accepted by different workers still make one call.
+    """
+
+    func = _SHARD_ROUTES[route][0]
+    key = (req.cpid, route, _COMMAND_TARGETS[route](req))
+
+    def run():
+        return commands.run(key, lambda: func(req))
+
+    if idempotency_key:
+        body = json.dumps([route, req.model_dump(mode="json")], sort_keys=True)
+        fingerprint = hashlib.sha256(body.encode()).hexdigest()
+        try:
+            return await idempotent.run(idempotency_key, run, fingerprint)
+        except KeyReused:
+            raise HTTPException(
+                status_code=422, detail="Idempotency-Key was already used for a different request"
+            )
+    return await run()
+
+
+# Statuses counted as success per bulk operation.
+_BULK_ACCEPTED = {
+    "configuration": ("Accepted", "RebootRequired"),
+    "availability": ("Accepted", "Scheduled"),
+    "reset": ("Accepted",),
+    "unlock": ("Unlocked",),
+}
+
+
+async def _bulk_targets(target: BulkTarget) -> List[str]:
+    if target.all:
+        cpids = list(connected_cps)
+        if shard is not None:
+            for worker in range(shard.workers):
+                if worker == shard.worker_id:
+                    continue
+                try:
+                    cpids += (await shard.request(worker, "connected", {}))["cpids"]
+                except Exception as e:
+                    logging.warning(f"Listing charge points of worker {worker} failed: {e}")
+    else:
+        cpids = list(target.cpids or [])
+    station_ids = target.stationIds or []
+    names = await _station_names(station_ids)
+    for station_id in station_ids:
+        if station_id not in names:
+            raise HTTPException(status_code=404, detail=f"Station {station_id} not found")
+        cpids.append(names[station_id])
+    return list(dict.fromkeys(cpids))
+
+
+async def _station_names(station_ids: List[int]) -> Dict[int, str]:
+    """Charge point ids of ``station_ids``, looked up on every worker."""
+
+    names = {}
+    for station_id in station_ids:
+        station = store.get_station(station_id)
+        if station is not None:
+            names[station_id] = station.name
+    if shard is None:
+        return names
+    for worker in range(shard.workers):
+        missing = [i for i in station_ids if i not in names]
+        if not missing:
+            break
+        if worker == shard.worker_id:
+            continue
+        try:
+            reply = await shard.request(worker, "stations", {"ids": missing})
+        except Exception as e:
+            raise HTTPException(
+                status_code=503, detail=f"Looking up stations on worker {worker} failed: {e}"
+            )
+        names.update((station_id, name) for station_id, name in reply["stations"])
+    return names
+
+
+async def _bulk_command(cpid: str, operation: str, req: BulkReq, forward: bool = True) -> Dict[str, Any]:
+    """Run one bulk ``operation`` on ``cpid`` and describe the outcome."""
+    cp = connected_cps.get(cpid)
+    if cp is None:
+        owner = shard.registry.owner(cpid) if shard is not None and forward else None
+        if owner is None or owner == shard.worker_id:
+            return {"cpid": cpid, "ok": False, "error": "not connected"}
+        try:
+            return await shard.request(
+                owner, "bulk", {"cpid": cpid, "operation": operation, "body": req.model_dump()}
+            )
+        except Exception as e:
+            return {"cpid": cpid, "ok": False, "error": str(e)}
+    if operation == "configuration":
+        command = cp.change_configuration(req.key, req.value)
+    elif operation == "availability":
+        command = cp.change_availability(req.connectorId, req.available)
+    elif operation == "reset":
+        command = cp.remote_reset(req.type)
+    else:
+        command = cp.unlock_connector(req.connectorId)
+    started = time.perf_counter()
+    try:
+        status = await asyncio.wait_for(command, timeout=req.timeout)
+    except asyncio.TimeoutError:
+        result = {"cpid": cpid, "ok": False, "error": "timeout"}
+    except Exception as e:
+        result = {"cpid": cpid, "ok": False, "error": str(e) or type(e).__name__}
+    else:
+        value = status.value if hasattr(status, "value") else status
+        result = {"cpid": cpid, "ok": value in _BULK_ACCEPTED[operation], "status": value}
+        if status is None:
+            result["error"] = "CALLERROR"
+    result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+@app.post("/api/v1/bulk/{operation}")
+async def api_bulk(operation: str, req: BulkReq):
+    """Send one command to many charge points; results stream as NDJSON.
+
+    One line per charge point in completion order, then a summary line.
+    """
+    if operation not in _BULK_ACCEPTED:
+        raise HTTPException(status_code=404, detail=f"unknown bulk operation {operation!r}")
+    if operation == "configuration" and (not req.key or req.value is None):
+        raise HTTPException(status_code=400, detail="configuration needs key and value")
+    if operation == "reset" and req.type not in ("Hard", "Soft"):
+        raise HTTPException(status_code=400, detail="invalid reset type")
+    if operation == "unlock" and req.connectorId < 1:
+        raise HTTPException(status_code=400, detail="unlock needs connectorId >= 1")
+    cpids = await _bulk_targets(req.target)
+    if not cpids:
+        raise HTTPException(status_code=400, detail="no charge points targeted")
+
+    async def stream():
+        started = time.perf_counter()
+        succeeded = 0
+        results = fan_out(cpids, lambda cpid: _bulk_command(cpid, operation, req), req.concurrency)
+        async for result in results:
+            succeeded += result["ok"]
+            yield codec.dumps(result) + "\n"
+        summary = {
+            "done": True,
+            "operation": operation,
+            "total": len(cpids),
+            "ok": succeeded,
+            "failed": len(cpids) - succeeded,
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        }
+        yield codec.dumps(summary) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+async def _shard_bulk(payload: Dict[str, Any]) -> Dict[str, Any]:
+    req = BulkReq.model_validate(payload["body"])
+    return await _bulk_command(payload["cpid"], payload["operation"], req, forward=False)
+
+
+async def _shard_connected(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {"cpids": list(connected_cps)}
+
+
+async def _shard_stations(payload: Dict[str, Any]) -> Dict[str, Any]:
+    stations = (store.get_station(station_id) for station_id in payload["ids"])
+    return {"stations": [[s.id, s.name] for s in stations if s is not None]}
+
+
+async def _forward(route: str, req: BaseModel) -> Dict[str, Any] | None:
+    """Run ``route`` on the worker owning ``req.cpid``.
+
+    Returns ``None`` when the central is not sharded or no other worker owns
+    the charge point, so the caller handles the request locally.
+    """
+
+    if shard is None:
+        return None
+    owner = shard.registry.owner(req.cpid)
+    if owner is None or owner == shard.worker_id:
+        return None
+    reply = await shard.request(
+        owner, "api", {"route": route, "body": req.model_dump(by_alias=True)}
+    )
+    if "status_code" in reply:
+        raise HTTPException(
+            status_code=reply["status_code"], detail=reply["detail"], headers=reply.get("headers")
+        )
+    return reply["body"]
+
+
+async def _shard_api(payload: Dict[str, Any]) -> Dict[str, Any]:
+    route = payload["route"]
+    try:
+        body = await _run_command(route, _SHARD_ROUTES[route][1].model_validate(payload["body"]))
+    except HTTPException as e:
+        return {"status_code": e.status_code, "detail": e.detail, "headers": e.headers}
+    return {"body": body}
+
+
+async def _shard_handoff(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Give up a charge point that reconnected to another worker."""
+
+    cpid = payload["cpid"]
+    cp = connected_cps.get(cpid)
+    if cp is not None:
+        asyncio.create_task(cp._connection.close())
+    exported = store.export_transactions(cpid)
+    for tx in exported:
+        active_view.touch(tx[0])
+    return {"transactions": exported}
+
 
 @app.get("/api/v1/pending")
 def list_pending():
     return [p.model_dump() for p in store.pending.values()]
 
+
+def _active_session(transaction_id: int) -> Dict[str, Any] | None:
+    entry = store.active_transactions.get(transaction_id)
+    if entry is None:
+        return None
+    cpid, conn_id, info = entry
+    station_id = None
+    conn = store.get_connector(conn_id)
+    if conn is not None:
+        station_id = getattr(conn, "station_id", getattr(conn, "stationId", None))
+    return ActiveSession(
+        cpid=cpid,
+        connectorId=conn_id,
+        stationId=station_id,
+        idTag=info.get("id_tag"),
+        vehicleId=info.get("vid"),
+        mac=info.get("mac"),
+        transactionId=info.get("transaction_id"),
+    ).model_dump()
+
+
 @app.get("/api/v1/active")
-def api_active_sessions():
-    sessions: list[ActiveSession] = []
-    for cpid, cp in connected_cps.items():
-        for conn_id, info in cp.active_tx.items():
-            station_id = None
-            conn = store.get_connector(conn_id)
-            if conn is not None:
-                station_id = getattr(conn, "station_id", getattr(conn, "stationId", None))
-            sessions.append(
-                ActiveSession(
-                    cpid=cpid,
-                    connectorId=conn_id,
-                    stationId=station_id,
-                    idTag=info.get("id_tag"),
-                    vehicleId=info.get("vid"),
-                    mac=info.get("mac"),
-                    transactionId=info.get("transaction_id"),
-                    lastSample=info.get("last_sample"),
-                )
-            )
-    return {"sessions": [s.dict() for s in sessions]}
+async def api_active_sessions(request: Request):
+    return _view_response(active_view, request)
+
+
+_HISTORY_FIELDS = tuple(CompletedSession.model_fields)
+# Records the history endpoint examines between yields to the event loop.
+HISTORY_SCAN_BATCH = 1000
+# Sessions on a history page when the request gives no ``limit``.
+HISTORY_PAGE_SIZE = 100
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _history_bound(name: str, value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return _as_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"invalid {name} timestamp")
+
+
+async def _history_records(
+    position: int,
+    since: datetime | None,
+    until: datetime | None,
+    cpid: str | None,
+    vehicle_id: str | None,
+    fields: tuple[str, ...],
+):
+    """Yield ``(position, projected record)`` for matching finished sessions.
+
+    Gives way to the event loop every ``HISTORY_SCAN_BATCH`` records
+    examined, whether they matched or not.
+    """
+
+    with_samples = "samples" in fields
+    records = store.iter_completed(position, cpid, vehicle_id)
+    for scanned, (index, record) in enumerate(records, 1):
+        if scanned % HISTORY_SCAN_BATCH == 0:
+            await asyncio.sleep(0)
+        if since is not None or until is not None:
+            stopped = _as_utc(datetime.fromisoformat(record["stopTime"]))
+            if since is not None and stopped < since:
+                continue
+            if until is not None and stopped >= until:
+                continue
+        item = {name: record.get(name) for name in fields if name != "samples"}
+        if with_samples:
+            item["samples"] = store.get_meter_values(record["transactionId"])
+        yield index, item
 
 
 @app.get("/api/v1/history")
-async def api_session_history():
-    sessions: list[CompletedSession] = []
-    for cpid, cp in connected_cps.items():
-        for record in cp.completed_sessions:
-            sessions.append(CompletedSession(cpid=cpid, **record))
-    return {"sessions": [s.dict() for s in sessions]}
+async def api_session_history(
+    cursor: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    since: str | None = None,
+    until: str | None = None,
+    cpid: str | None = None,
+    vehicleId: str | None = None,
+    fields: str | None = None,
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+):
+    """Return finished sessions in stop order.
+
+    ``cursor`` is the ``nextCursor`` of a previous page, ``since``/``until``
+    bound ``stopTime`` and ``fields`` is a comma separated projection (omit
+    ``samples`` to skip meter data).  A page holds ``limit`` sessions,
+    ``HISTORY_PAGE_SIZE`` by default, and ``nextCursor`` is ``None`` on the
+    last one.  ``format=ndjson`` streams one record per line instead of
+    building a page.
+    """
+
+    try:
+        position = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    projection = _HISTORY_FIELDS
+    if fields:
+        projection = tuple(f.strip() for f in fields.split(",") if f.strip())
+        unknown = [f for f in projection if f not in _HISTORY_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(unknown)}")
+    records = _history_records(
+        position,
+        _history_bound("since", since),
+        _history_bound("until", until),
+        cpid,
+        vehicleId,
+        projection,
+    )
+
+    if format == "ndjson":
+        async def stream():
+            count = 0
+            async for _, item in records:
+                yield codec.dumps(item) + "\n"
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    page_size = HISTORY_PAGE_SIZE if limit is None else limit
+    sessions: list[Dict[str, Any]] = []
+    next_cursor = None
+    last = position
+    async for index, item in records:
+        if len(sessions) == page_size:
+            # Another match exists, so the page was not the last.
+            next_cursor = str(last + 1)
+            break
+        sessions.append(item)
+        last = index
+    return {"sessions": sessions, "nextCursor": next_cursor}
 
 
 @app.post("/api/v1/sessions/{connector_id}/start")
@@ -980,7 +1966,7 @@ def api_start_session(connector_id: int, req: SessionStartReq):
         raise HTTPException(status_code=404, detail="Connector not found")
     if getattr(connector, "status", None) != "Available":
         raise HTTPException(status_code=409, detail="Connector not available")
-    connector.status = "Charging"
+    store.set_connector_status(connector_id, "Charging")
     tx_id = next(_tx_counter)
     session = {
         "id": tx_id,
@@ -989,11 +1975,7 @@ def api_start_session(connector_id: int, req: SessionStartReq):
         "status": "active",
         "started_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
     }
-    store.sessions[tx_id] = session
-    try:
-        connector.charging_sessions.append(session)
-    except Exception:
-        pass
+    store.add_session(session)
     return {"transactionId": tx_id}
 
 
@@ -1002,17 +1984,10 @@ def api_stop_session(connector_id: int, req: SessionStopReq):
     connector = store.get_connector(connector_id)
     if connector is None:
         raise HTTPException(status_code=404, detail="Connector not found")
-    active_id = None
-    active_session = None
-    for sid, session in list(store.sessions.items()):
-        conn = session.get("connector_id") if isinstance(session, dict) else getattr(session, "connector_id", None)
-        status = session.get("status") if isinstance(session, dict) else getattr(session, "status", None)
-        if conn == connector_id and status == "active":
-            active_id = sid
-            active_session = session
-            break
-    if active_session is None:
+    found = store.get_active_session(connector_id)
+    if found is None:
         raise HTTPException(status_code=404, detail="Active session not found")
+    active_id, active_session = found
     finished_at = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
     if isinstance(active_session, dict):
         active_session["finishedAt"] = finished_at
@@ -1030,10 +2005,8 @@ def api_stop_session(connector_id: int, req: SessionStopReq):
         setattr(active_session, "voltage", req.voltage)
         setattr(active_session, "temperature", req.temperature)
         setattr(active_session, "soc", req.soc)
-    connector.status = "Available"
-    store.sessions_history.append(active_session)
-    if active_id is not None:
-        store.sessions.pop(active_id, None)
+    store.set_connector_status(connector_id, "Available")
+    store.archive_session(active_id)
     return {"session": active_session}
 
 
@@ -1053,67 +2026,167 @@ def get_sessions_for_vehicle(vehicle_id: str):
             return obj.__dict__
         return obj
 
-    for session in store.sessions.values():
-        vid = None
-        if isinstance(session, dict):
-            vid = session.get("vehicleId") or session.get("vehicle_id")
-            status = session.get("status")
-        else:
-            vid = getattr(session, "vehicleId", getattr(session, "vehicle_id", None))
-            status = getattr(session, "status", None)
-
-        if vid != vehicle_id:
-            continue
-
+    sessions, archived = store.sessions_for_vehicle(vehicle_id)
+    for session in sessions:
         session_dict = _to_dict(session)
-        if status == "active" or (isinstance(session_dict, dict) and session_dict.get("status") == "active"):
+        if session_dict.get("status") == "active":
             current = session_dict
         else:
             history.append(session_dict)
+    history.extend(_to_dict(session) for session in archived)
 
     return {"current": current, "history": history}
 
 
 @app.get("/api/v1/status")
-async def api_connector_status():
-    statuses: list[ConnectorStatus] = []
-    for cpid, cp in connected_cps.items():
-        for conn_id, status in cp.connector_status.items():
-            statuses.append(ConnectorStatus(cpid=cpid, connectorId=conn_id, status=status))
-    return {"connectors": [s.dict() for s in statuses]}
+async def api_connector_status(request: Request):
+    return _view_response(status_view, request)
+
+
+def _active_info(active: Dict[str, Any] | None) -> Dict[str, Any] | None:
+    if not active:
+        return None
+    start_time = active.get("start_time")
+    if isinstance(start_time, datetime):
+        start_time = start_time.isoformat()
+    return {
+        "transactionId": active.get("transaction_id"),
+        "idTag": active.get("id_tag"),
+        "vehicleId": active.get("vid"),
+        "mac": active.get("mac"),
+        "startTime": start_time,
+        "meterStart": active.get("meter_start"),
+        "lastSample": active.get("last_sample"),
+    }
 
 
 @app.get("/api/v1/overview")
-def api_overview():
-    connectors: list[ConnectorOverview] = []
-    for cpid, cp in connected_cps.items():
-        for conn_id, status in cp.connector_status.items():
-            pending = store.pending.get((cpid, conn_id))
-            active = cp.active_tx.get(conn_id)
-            active_info = None
-            if active:
-                start_time = active.get("start_time")
-                if isinstance(start_time, datetime):
-                    start_time = start_time.isoformat()
-                active_info = {
-                    "transactionId": active.get("transaction_id"),
-                    "idTag": active.get("id_tag"),
-                    "vehicleId": active.get("vid"),
-                    "mac": active.get("mac"),
-                    "startTime": start_time,
-                    "meterStart": active.get("meter_start"),
-                    "lastSample": active.get("last_sample"),
-                }
-            connectors.append(
-                ConnectorOverview(
-                    cpid=cpid,
-                    connectorId=conn_id,
-                    status=status,
-                    pending=pending,
-                    active=active_info,
-                )
-            )
-    return {"connectors": [c.model_dump() for c in connectors]}
+async def api_overview(request: Request):
+    return _view_response(overview_view, request)
+
+
+def _connector_state(cpid: str, connector_id: int) -> Dict[str, Any] | None:
+    """An ``/api/v1/overview`` entry as plain JSON-ready data."""
+    cp = connected_cps.get(cpid)
+    status = cp.connector_status.get(connector_id) if cp is not None else None
+    if status is None:
+        return None
+    pending = store.pending.get((cpid, connector_id))
+    return {
+        "cpid": cpid,
+        "connectorId": connector_id,
+        "status": status,
+        "pending": pending.model_dump(mode="json") if pending is not None else None,
+        "active": _active_info(cp.active_tx.get(connector_id)),
+    }
+
+
+def _connector_status(cpid: str, connector_id: int) -> Dict[str, Any] | None:
+    cp = connected_cps.get(cpid)
+    status = cp.connector_status.get(connector_id) if cp is not None else None
+    if status is None:
+        return None
+    return {"cpid": cpid, "connectorId": connector_id, "status": status}
+
+
+def _connector_keys():
+    for cpid, cp in list(connected_cps.items()):
+        for conn_id in list(cp.connector_status):
+            yield cpid, conn_id
+
+
+# Bodies of /api/v1/overview, /api/v1/status and /api/v1/active, updated by
+# the OCPP handlers through _connector_changed() and active_view.touch().
+overview_view = MaterializedView("overview", "connectors", lambda key: _connector_state(*key), _connector_keys)
+status_view = MaterializedView("status", "connectors", lambda key: _connector_status(*key), _connector_keys)
+active_view = MaterializedView("active", "sessions", _active_session, lambda: list(store.active_transactions))
+
+
+def _connector_changed(cpid: str, connector_id: int) -> None:
+    """Refresh the views and live feed after a connector's state changed."""
+    key = (cpid, connector_id)
+    overview_view.touch(key)
+    status_view.touch(key)
+    live_feed.publish(cpid, connector_id)
+
+
+def _view_response(view: MaterializedView, request: Request) -> Response:
+    headers = {"ETag": view.etag, "Cache-Control": "no-cache"}
+    if view.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(view.body(), media_type="application/json", headers=headers)
+
+
+# Deltas for /api/v1/live; in sharded mode only this worker's charge points.
+live_feed = ConnectorFeed(_connector_state, _connector_keys, coalesce=LIVE_COALESCE_MS / 1000)
+metrics.gauge(
+    "chargebridge_live_subscribers",
+    "Dashboards subscribed to /api/v1/live.",
+    lambda: len(live_feed.subscriptions),
+)
+
+# SSE comment lines keep idle connections open through proxies.
+LIVE_KEEPALIVE_SECONDS = 15
+
+
+@app.get("/api/v1/live")
+async def api_live(cpid: List[str] | None = Query(default=None)):
+    """Server-Sent Events stream of connector changes, optionally for some ``cpid`` only.
+
+    Starts with the current state of every matching connector, then sends
+    coalesced deltas; see ``central_server.live_feed`` for the event format.
+    """
+
+    sub = live_feed.subscribe(cpid)
+
+    async def stream():
+        try:
+            while True:
+                try:
+                    frames = await asyncio.wait_for(sub.get(), LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(f"data: {frame}\n\n" for frame in frames)
+        finally:
+            live_feed.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/api/v1/live/ws")
+async def api_live_ws(websocket: WebSocket, cpid: List[str] | None = Query(default=None)):
+    """WebSocket variant of ``/api/v1/live``: one JSON event per text message."""
+
+    await websocket.accept()
+    sub = live_feed.subscribe(cpid)
+    # Messages from the client are ignored; receiving notices a close while idle.
+    closed = asyncio.create_task(websocket.receive())
+    batch = None
+    try:
+        while True:
+            batch = asyncio.ensure_future(sub.get())
+            await asyncio.wait({batch, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed.done():
+                if closed.exception() or closed.result()["type"] == "websocket.disconnect":
+                    break
+                closed = asyncio.create_task(websocket.receive())
+            if not batch.done():
+                batch.cancel()
+                continue
+            for frame in batch.result():
+                await websocket.send_text(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if batch is not None:
+            batch.cancel()
+        closed.cancel()
+        live_feed.unsubscribe(sub)
 
 
 @app.post("/api/v1/identify")
@@ -1123,12 +2196,33 @@ def api_identify(identifier: UserIdentifier):
     return {"vid": vid}
 
 
+def _wallet_result(posting: Posting) -> Dict[str, Any]:
+    return {
+        "vid": posting.vid,
+        "balance": posting.balance / WALLET_MINOR_UNITS,
+        "balanceMinor": posting.balance,
+        "entry": posting.seq,
+        "duplicate": posting.duplicate,
+    }
+
+
+@app.get("/api/v1/wallet/{vid}")
+def api_wallet_balance(vid: str):
+    balance = wallet.get_balance(vid_manager.resolve(vid))
+    return {"vid": vid, "balance": balance / WALLET_MINOR_UNITS, "balanceMinor": balance}
+
+
 @app.post("/api/v1/wallet/topup")
 def api_wallet_topup(req: WalletReq):
     field, value = req.identifier.first()
     vid = vid_manager.get_or_create_vid(field, value)
-    balance = wallet.top_up(vid, req.amount)
-    return {"vid": vid, "balance": balance}
+    try:
+        posting = wallet.top_up(vid, req.amountMinor, req.reference)
+    except ReferenceConflict as e:
+        wallet_postings.labels("topup", "conflict").inc()
+        raise HTTPException(status_code=409, detail=str(e))
+    wallet_postings.labels("topup", "duplicate" if posting.duplicate else "posted").inc()
+    return _wallet_result(posting)
 
 
 @app.post("/api/v1/wallet/charge")
@@ -1136,19 +2230,132 @@ def api_wallet_charge(req: WalletReq):
     field, value = req.identifier.first()
     vid = vid_manager.get_or_create_vid(field, value)
     try:
-        balance = wallet.deduct(vid, req.amount)
-    except ValueError:
+        posting = wallet.deduct(vid, req.amountMinor, req.reference)
+    except InsufficientFunds:
+        wallet_postings.labels("charge", "insufficient").inc()
         raise HTTPException(status_code=402, detail="Insufficient balance")
-    return {"vid": vid, "balance": balance}
+    except ReferenceConflict as e:
+        wallet_postings.labels("charge", "conflict").inc()
+        raise HTTPException(status_code=409, detail=str(e))
+    wallet_postings.labels("charge", "duplicate" if posting.duplicate else "posted").inc()
+    return _wallet_result(posting)
+
+
+@app.post("/api/v1/wallet/bulk")
+def api_wallet_bulk(req: WalletBulkReq):
+    """Post a settlement file of top-ups and charges; results stream as NDJSON.
+
+    Entries are posted in order, ``WALLET_BULK_CHUNK`` per ledger write.  One
+    line per entry, then a summary line.  Entries whose reference was
+    already posted are reported as duplicates, so a file can be sent again;
+    a reference posted before with another VID or amount is rejected.
+    """
+
+    def stream():
+        started = time.perf_counter()
+        counts = {"posted": 0, "duplicate": 0, "rejected": 0}
+        for first in range(0, len(req.entries), WALLET_BULK_CHUNK):
+            chunk = req.entries[first : first + WALLET_BULK_CHUNK]
+            results: List[Dict[str, Any]] = []
+            posted: List[Dict[str, Any]] = []
+            postings = []
+            for line, entry in enumerate(chunk, first):
+                try:
+                    field, value = entry.identifier.first()
+                except ValueError as e:
+                    counts["rejected"] += 1
+                    results.append({"line": line, "ok": False, "error": str(e)})
+                    continue
+                vid = vid_manager.get_or_create_vid(field, value)
+                amount = entry.amountMinor if entry.type == "topup" else -entry.amountMinor
+                results.append({"line": line})
+                posted.append(results[-1])
+                postings.append((vid, amount, entry.reference))
+            for body, entry, result in zip(posted, postings, wallet.post_many(postings)):
+                kind = "topup" if entry[1] > 0 else "charge"
+                if isinstance(result, InsufficientFunds):
+                    counts["rejected"] += 1
+                    wallet_postings.labels(kind, "insufficient").inc()
+                    body.update(ok=False, vid=result.vid, error="insufficient balance")
+                elif isinstance(result, ReferenceConflict):
+                    counts["rejected"] += 1
+                    wallet_postings.labels(kind, "conflict").inc()
+                    body.update(ok=False, vid=entry[0], error=str(result))
+                else:
+                    outcome = "duplicate" if result.duplicate else "posted"
+                    counts[outcome] += 1
+                    wallet_postings.labels(kind, outcome).inc()
+                    body.update(ok=True, **_wallet_result(result))
+            for body in results:
+                yield codec.dumps(body) + "\n"
+        summary = {
+            "done": True,
+            "total": len(req.entries),
+            **counts,
+            "elapsedMs": round((time.perf_counter() - started) * 1000, 1),
+        }
+        yield codec.dumps(summary) + "\n"
 
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
-async def run_http_api():
-    config = uvicorn.Config(app, host="0.0.0.0", port=8080, loop="asyncio", log_level="info")
-    server = uvicorn.Server(config)
-    await server.serve()
 
+async def run_http_api(sharded: bool = False):
+    # uvicorn's records go through the root logger's queue; the middleware
+    # above already logs each request once.
+    config = uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=8080,
+        loop="asyncio",
+        log_level="info",
+        log_config=None,
+        access_log=False,
+    )
+    server = uvicorn.Server(config)
+    if not sharded:
+        await server.serve()
+        return
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((config.host, config.port))
+    await server.serve(sockets=[sock])
+
+
+async def main(worker_id: int = 0, workers: int = 1, run_dir: str | None = None):
+    global _tx_counter, shard, journal
+
+    sharded = workers > 1
+    journal_dir = os.path.join(JOURNAL_DIR, f"worker-{worker_id}") if sharded else JOURNAL_DIR
+    # One VID registry for all workers, mapped from disk rather than replayed.
+    vid_registry = VIDRegistry(os.path.join(JOURNAL_DIR, "vids"))
+    vid_manager.use_registry(vid_registry)
+    # Likewise the wallet balances, next to an append-only ledger.
+    wallet_registry = VIDRegistry(os.path.join(JOURNAL_DIR, "wallet"), name="balances")
+    wallet.use_registry(wallet_registry)
+    store.completed_series_limit = HISTORY_SAMPLES
+    journal = Journal(journal_dir, error_counter=journal_errors)
+    journal.attach("store", store)
+    journal.recover()
+    # Workers hand out disjoint transaction ids: worker n uses ids = n mod workers.
+    first_tx = store.max_transaction_id() + 1
+    first_tx += (worker_id - first_tx) % workers
+    _tx_counter = itertools.count(first_tx, workers)
+    journal.start()
+    snapshot_task = asyncio.create_task(journal.run_snapshots())
+    vid_sync_task = asyncio.create_task(vid_registry.run_sync())
+    wallet_sync_task = asyncio.create_task(wallet.run_sync())
+
+    if sharded:
+        shard = ShardWorker(ShardRegistry(run_dir, worker_id), workers)
+        metrics.const_labels = (("worker", str(worker_id)),)
+        shard.register("api", _shard_api)
+        shard.register("handoff", _shard_handoff)
+        shard.register("bulk", _shard_bulk)
+        shard.register("connected", _shard_connected)
+        shard.register("stations", _shard_stations)
+        await shard.start()
 
-async def main():
     async def handler(websocket, path=None):
         if path is None:
             try:
@@ -1158,12 +2365,31 @@ async def main():
         cp_id = path.rsplit('/', 1)[-1] if path else "UNKNOWN"
         logging.info(f"[Central] New connection for Charge Point ID: {cp_id}")
 
+        if shard is not None:
+            previous = shard.registry.claim(cp_id)
+            if previous is not None and previous != shard.worker_id:
+                try:
+                    reply = await shard.request(previous, "handoff", {"cpid": cp_id})
+                    store.import_transactions(cp_id, reply["transactions"])
+                    for tx in reply["transactions"]:
+                        active_view.touch(tx[0])
+                except Exception as e:
+                    logging.warning(f"Handoff of {cp_id} from worker {previous} failed: {e}")
+
         central = CentralSystem(cp_id, websocket)
         connected_cps[cp_id] = central
         try:
             await central.start()
         finally:
-            connected_cps.pop(cp_id, None)
+            provisioning.cancel(cp_id, central._post_boot_actions)
+            if connected_cps.get(cp_id) is central:
+                connected_cps.pop(cp_id, None)
+            log_pipeline.limiter.forget(cp_id)
+            liveness.forget(central.liveness)
+            outbound.close(central.outbound)
+            for conn_id in central.connector_status:
+                central.cancel_no_session(conn_id)
+                _connector_changed(cp_id, conn_id)
             logging.info(f"[Central] Disconnected: {cp_id}")
 
     def console_thread(loop: asyncio.AbstractEventLoop):
@@ -1212,13 +2438,9 @@ async def main():
                     txid = session.get("transaction_id", num)
                     asyncio.run_coroutine_threadsafe(cp.remote_stop(txid), loop)
                     continue
-                tx_match = None
-                for info in cp.active_tx.values():
-                    if info.get("transaction_id") == num:
-                        tx_match = num
-                        break
-                if tx_match is not None:
-                    asyncio.run_coroutine_threadsafe(cp.remote_stop(tx_match), loop)
+                entry = store.get_transaction(num)
+                if entry is not None and entry[0] == cpid:
+                    asyncio.run_coroutine_threadsafe(cp.remote_stop(num), loop)
                 else:
                     asyncio.run_coroutine_threadsafe(cp.unlock_connector(num), loop)
                 continue
@@ -1236,24 +2458,91 @@ async def main():
             print("Unknown command. Examples: start CP_123 1 TESTTAG | stop CP_123 42 | ls | map CP_123")
 
     loop = asyncio.get_running_loop()
-    threading.Thread(target=console_thread, args=(loop,), daemon=True).start()
+    loop_monitor.start()
+    if not sharded:
+        threading.Thread(target=console_thread, args=(loop,), daemon=True).start()
 
-    api_task = asyncio.create_task(run_http_api())
+    api_task = asyncio.create_task(run_http_api(sharded=sharded))
 
     supported_protocols = ["ocpp1.6", "ocpp1.6j"]
 
-    async with serve(
-        handler,
-        host="0.0.0.0",
-        port=9000,
-        subprotocols=supported_protocols,
-    ):
-        logging.info(
-            "⚡ Central listening on ws://0.0.0.0:9000/ocpp/<ChargePointID> | HTTP :8080 | Protocols: %s",
-            ", ".join(supported_protocols),
+    try:
+        async with serve(
+            handler,
+            host="0.0.0.0",
+            port=9000,
+            subprotocols=supported_protocols,
+            reuse_port=sharded,
+        ):
+            logging.info(
+                "⚡ Central listening on ws://0.0.0.0:9000/ocpp/<ChargePointID> | HTTP :8080 | Protocols: %s",
+                ", ".join(supported_protocols),
+            )
+            if sharded:
+                # uvicorn handles SIGTERM from the supervisor; the worker
+                # exits once the HTTP server has shut down.
+                await api_task
+            else:
+                await asyncio.Future()
+    finally:
+        snapshot_task.cancel()
+        vid_sync_task.cancel()
+        wallet_sync_task.cancel()
+        loop_monitor.close()
+        timers.close()
+        await provisioning.close()
+        if shard is not None:
+            await shard.close()
+        journal.close()
+        vid_registry.close()
+        wallet.close()
+        wallet_registry.close()
+
+
+def _worker_main(worker_id: int, workers: int, run_dir: str) -> None:
+    asyncio.run(main(worker_id, workers, run_dir))
+
+
+def run_workers(workers: int) -> None:
+    """Run ``workers`` central processes sharing the OCPP and HTTP ports.
+
+    The kernel spreads connections across workers (``SO_REUSEPORT``); API
+    commands for a charge point owned by another worker are forwarded to it.
+    Read endpoints such as ``/api/v1/active`` report the serving worker only.
+    """
+
+    run_dir = os.path.join(JOURNAL_DIR, "run")
+    processes = [
+        multiprocessing.Process(
+            target=_worker_main, args=(i, workers, run_dir), name=f"central-{i}"
         )
-        await asyncio.Future()
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    def _terminate(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="OCPP 1.6 central system")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="worker processes sharing ports 9000/8080"
+    )
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_workers(args.workers)
+    else:
+        asyncio.run(main())
@@ -0,0 +1,56 @@
+"""Run one command against many charge points.
+
+Each charge point answers a CALL in one network round trip, so pushing a
+setting to a site one HTTP request at a time is bound by latency, not by
+the central system.  :func:`fan_out` keeps up to ``concurrency`` commands
+in flight and yields each result as soon as it is available, so the
+``/api/v1/bulk`` endpoints can stream progress while the slowest charge
+points are still answering.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def fan_out(
+    items: Iterable[T], run: Callable[[T], Awaitable[R]], concurrency: int
+) -> AsyncIterator[R]:
+    """Yield ``await run(item)`` for every item, in completion order.
+
+    ``run`` should turn its own failures into results; an exception it
+    raises ends the iteration.  Closing the iterator early (a client that
+    disconnects) cancels the commands still running.
+    """
+
+    pending = iter(items)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker() -> None:
+        for item in pending:
+            try:
+                results.put_nowait((True, await run(item)))
+            except Exception as e:
+                results.put_nowait((False, e))
+                return
+        results.put_nowait(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(concurrency, 1))]
+    running = len(workers)
+    try:
+        while running:
+            entry = await results.get()
+            if entry is None:
+                running -= 1
+                continue
+            ok, value = entry
+            if not ok:
+                raise value
+            yield value
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,128 @@
+"""Share remote commands between identical API requests.
+
+A mobile app that retries ``/api/v1/start`` or ``/api/v1/stop`` on every
+timeout, or two operators pressing the same button, used to send one
+RemoteStartTransaction or RemoteStopTransaction per request, each
+overwriting the pending session of the previous one and each queued behind
+the others on the charge point's single outstanding CALL.
+
+A :class:`CommandTable` runs at most one command per key at a time.  The
+first request for a key starts the command as a task; requests for the same
+key that arrive while it runs await that task instead of starting their
+own, and every one of them gets its result or its exception.  The outcome
+is then kept for ``ttl`` seconds and replayed to later requests with the
+same key, so a retry that arrives just after the reply costs nothing either.
+Failures that ``replay_error`` rejects (no answer from the charge point) are
+not kept: the next request runs the command again.
+
+A key may come with a fingerprint of the request it stands for, as for an
+``Idempotency-Key`` header.  A request reusing the key with a different
+fingerprint, while the first is in flight or remembered, gets
+:class:`KeyReused` instead of the other request's outcome.
+
+The task is shielded from its callers: a client that disconnects does not
+cancel the CALL the other callers (or its own retry) are waiting on.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class KeyReused(Exception):
+    """A key already taken by a request with a different fingerprint."""
+
+
+class CommandTable:
+    """In-flight commands and recently completed outcomes, by key."""
+
+    def __init__(
+        self,
+        ttl: float,
+        *,
+        name: str = "commands",
+        counter: Any = None,
+        replay_error: Optional[Callable[[Exception], bool]] = None,
+    ) -> None:
+        self.ttl = ttl
+        self.name = name
+        self.counter = counter
+        self.replay_error = replay_error
+        # key -> (task, fingerprint)
+        self._inflight: Dict[Hashable, Tuple[asyncio.Future, Hashable]] = {}
+        # key -> (expiry, fingerprint, ok, result or exception), in expiry
+        # order since every entry lives for the same ``ttl``.
+        self._done: "OrderedDict[Hashable, Tuple[float, Hashable, bool, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    @property
+    def cached(self) -> int:
+        return len(self._done)
+
+    def _count(self, outcome: str) -> None:
+        if self.counter is not None:
+            self.counter.labels(self.name, outcome).inc()
+
+    def _expire(self, now: float) -> None:
+        done = self._done
+        while done:
+            key, (expiry, _, _, _) = next(iter(done.items()))
+            if expiry > now:
+                break
+            del done[key]
+
+    def _check(self, key: Hashable, used: Hashable, fingerprint: Hashable) -> None:
+        if used != fingerprint:
+            self._count("conflict")
+            raise KeyReused(f"{key!r} was used for a different request")
+
+    async def run(
+        self,
+        key: Hashable,
+        command: Callable[[], Awaitable[Any]],
+        fingerprint: Hashable = None,
+    ) -> Any:
+        """Return the outcome of ``command()`` shared by every caller with ``key``."""
+
+        self._expire(time.monotonic())
+        entry = self._done.get(key)
+        if entry is not None:
+            _, used, ok, value = entry
+            self._check(key, used, fingerprint)
+            self._count("replayed")
+            if ok:
+                return value
+            raise value.with_traceback(None)
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self._count("executed")
+            task = asyncio.ensure_future(command())
+            self._inflight[key] = (task, fingerprint)
+            task.add_done_callback(lambda t: self._finished(key, t, fingerprint))
+        else:
+            task, used = inflight
+            self._check(key, used, fingerprint)
+            self._count("joined")
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future, fingerprint: Hashable) -> None:
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            if not isinstance(exc, Exception):
+                return
+            if self.replay_error is not None and not self.replay_error(exc):
+                return
+        if self.ttl > 0:
+            outcome = (exc is None, task.result() if exc is None else exc)
+            self._done[key] = (time.monotonic() + self.ttl, fingerprint, *outcome)
+            self._done.move_to_end(key)
@@ -0,0 +1,139 @@
+"""Push connector state changes to dashboards.
+
+OCPP handlers call :meth:`ConnectorFeed.publish` whenever a connector's
+status, pending session or transaction changes.  Publishing only marks the
+connector dirty; every ``coalesce`` seconds the feed builds the current
+state of each dirty connector once, encodes it once and hands the same text
+to every interested :class:`Subscription`.  A burst of MeterValues and
+StatusNotifications therefore costs one delta per connector per window, and
+nothing at all while nobody is subscribed.
+
+Each subscription keeps at most one undelivered update per connector and at
+most ``max_pending`` connectors.  Beyond that the oldest update is dropped,
+and the subscriber is sent a ``dropped`` event so it can refetch
+``/api/v1/overview``.  A slow dashboard never holds memory or time on the
+event loop.
+
+Events are JSON objects:
+
+* ``{"type": "connector", "cpid", "connectorId", "status", "pending", "active"}``
+  (the same fields as an ``/api/v1/overview`` entry),
+* ``{"type": "removed", "cpid", "connectorId"}`` when a charge point
+  disconnects,
+* ``{"type": "dropped", "count"}`` after updates were discarded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import codec
+
+Key = Tuple[str, int]
+StateFn = Callable[[str, int], Optional[Dict[str, Any]]]
+ConnectorsFn = Callable[[], Iterable[Key]]
+
+
+class Subscription:
+    """Undelivered updates for one subscriber, coalesced per connector."""
+
+    def __init__(self, cpids: Optional[Iterable[str]], max_pending: int) -> None:
+        self.cpids: Optional[Set[str]] = set(cpids) if cpids else None
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._reported = 0
+        self._pending: "OrderedDict[Key, str]" = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def wants(self, cpid: str) -> bool:
+        return self.cpids is None or cpid in self.cpids
+
+    def push(self, key: Key, frame: str) -> None:
+        pending = self._pending
+        if key in pending:
+            pending.move_to_end(key)
+        pending[key] = frame
+        if len(pending) > self.max_pending:
+            pending.popitem(last=False)
+            self.dropped += 1
+        self._ready.set()
+
+    async def get(self) -> List[str]:
+        """Wait for and return the next batch of encoded events."""
+
+        await self._ready.wait()
+        self._ready.clear()
+        frames = list(self._pending.values())
+        self._pending.clear()
+        if self.dropped != self._reported:
+            frames.insert(0, codec.dumps({"type": "dropped", "count": self.dropped - self._reported}))
+            self._reported = self.dropped
+        return frames
+
+
+class ConnectorFeed:
+    """Fan out coalesced connector state deltas to subscriptions.
+
+    ``state(cpid, connector_id)`` returns the connector's current state, or
+    ``None`` once it is gone; ``connectors()`` lists the known connectors for
+    the initial snapshot of a new subscription.
+    """
+
+    def __init__(
+        self,
+        state: StateFn,
+        connectors: ConnectorsFn,
+        *,
+        coalesce: float = 0.25,
+        max_pending: int = 1024,
+    ) -> None:
+        self._state = state
+        self._connectors = connectors
+        self.coalesce = coalesce
+        self.max_pending = max_pending
+        self.subscriptions: Set[Subscription] = set()
+        self._dirty: Dict[Key, None] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def publish(self, cpid: str, connector_id: int) -> None:
+        """Note that a connector changed; cheap and safe to call often."""
+
+        if not self.subscriptions:
+            return
+        self._dirty[(cpid, connector_id)] = None
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.coalesce, self._flush)
+
+    def _event(self, key: Key) -> str:
+        state = self._state(*key)
+        if state is None:
+            return codec.dumps({"type": "removed", "cpid": key[0], "connectorId": key[1]})
+        return codec.dumps({"type": "connector", **state})
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        dirty, self._dirty = self._dirty, {}
+        for key in dirty:
+            targets = [sub for sub in self.subscriptions if sub.wants(key[0])]
+            if not targets:
+                continue
+            frame = self._event(key)
+            for sub in targets:
+                sub.push(key, frame)
+
+    def subscribe(self, cpids: Optional[Iterable[str]] = None) -> Subscription:
+        """Register a subscriber and queue a snapshot of its connectors."""
+
+        sub = Subscription(cpids, self.max_pending)
+        snapshot = [key for key in self._connectors() if sub.wants(key[0])]
+        # The snapshot is always delivered whole.
+        sub.max_pending = max(self.max_pending, len(snapshot))
+        for key in snapshot:
+            sub.push(key, self._event(key))
+        self.subscriptions.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self.subscriptions.discard(sub)
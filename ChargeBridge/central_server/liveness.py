@@ -0,0 +1,161 @@
+"""Detect charge points that stopped talking.
+
+A charge point whose TCP session is left half open (a cut cable, a NAT
+that forgot the flow) never triggers a WebSocket close, so without a check
+it stays in ``connected_cps`` indefinitely.  :class:`LivenessTracker`
+watches the time of the last inbound message of every connection, whether
+that is a Heartbeat, a MeterValues or a reply to one of our calls.
+
+Recording a message is a single attribute store (:meth:`Peer.seen`).  The
+check is lazy: each connection has one timer on the central's
+:class:`~central_server.timer_wheel.TimerWheel`, due ``stale_after``
+seconds after the last message seen when it was armed.  When it fires it
+re-arms for the new deadline if the charge point has been heard from in
+the meantime; otherwise the connection is flagged stale and, with
+``close_after`` set, closed once it has been silent that long.  A busy
+charge point therefore costs one timer operation per ``stale_after``
+period regardless of how many messages it sends.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from bisect import bisect_right
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from central_server.timer_wheel import TimerWheel
+
+logger = logging.getLogger("chargebridge.liveness")
+
+# Upper bounds (seconds since the last message) of the /api/v1/liveness buckets.
+BUCKETS = (60, 300, 600, 1800)
+
+
+class Peer:
+    """Liveness state of one connection."""
+
+    __slots__ = ("cpid", "last_seen", "stale_since", "close", "_tracker")
+
+    def __init__(self, tracker: "LivenessTracker", cpid: str, close: Callable[[], Awaitable[Any]]) -> None:
+        self.cpid = cpid
+        self.last_seen = time.monotonic()
+        self.stale_since: Optional[float] = None
+        self.close = close
+        self._tracker = tracker
+
+    def seen(self) -> None:
+        """Record an inbound message."""
+
+        self.last_seen = time.monotonic()
+        if self.stale_since is not None:
+            self._tracker._recovered(self)
+
+
+class LivenessTracker:
+    """Flag, and optionally close, connections silent for too long."""
+
+    def __init__(
+        self,
+        timers: TimerWheel,
+        *,
+        stale_after: float,
+        close_after: Optional[float] = None,
+        stale_counter: Any = None,
+        closed_counter: Any = None,
+    ) -> None:
+        self.timers = timers
+        self.stale_after = stale_after
+        self.close_after = close_after
+        self.stale_counter = stale_counter
+        self.closed_counter = closed_counter
+        self.peers: Dict[Peer, None] = {}
+        self.stale: Dict[Peer, None] = {}
+
+    def track(self, cpid: str, close: Callable[[], Awaitable[Any]]) -> Peer:
+        """Start watching a new connection; ``close()`` drops it."""
+
+        peer = Peer(self, cpid, close)
+        self.peers[peer] = None
+        self.timers.arm(peer, self.stale_after, lambda: self._check(peer))
+        return peer
+
+    def forget(self, peer: Peer) -> None:
+        self.timers.cancel(peer)
+        self.peers.pop(peer, None)
+        self.stale.pop(peer, None)
+
+    def _check(self, peer: Peer) -> None:
+        if peer not in self.peers:
+            return
+        now = time.monotonic()
+        idle = now - peer.last_seen
+        if idle < self.stale_after:
+            self.timers.arm(peer, self.stale_after - idle, lambda: self._check(peer))
+            return
+        if peer.stale_since is None:
+            peer.stale_since = peer.last_seen + self.stale_after
+            self.stale[peer] = None
+            if self.stale_counter is not None:
+                self.stale_counter.inc()
+            logger.warning(
+                "No message from %s for %.0f s; connection flagged stale",
+                peer.cpid,
+                idle,
+                extra={"cpid": peer.cpid},
+            )
+        if self.close_after is None:
+            # Check again later so a charge point that resumes is noticed
+            # by seen() and one that stays silent keeps its flag.
+            self.timers.arm(peer, self.stale_after, lambda: self._check(peer))
+        elif idle >= self.close_after:
+            logger.warning(
+                "Closing stale connection of %s after %.0f s without a message",
+                peer.cpid,
+                idle,
+                extra={"cpid": peer.cpid},
+            )
+            if self.closed_counter is not None:
+                self.closed_counter.inc()
+            asyncio.ensure_future(peer.close())
+        else:
+            self.timers.arm(peer, self.close_after - idle, lambda: self._check(peer))
+
+    def _recovered(self, peer: Peer) -> None:
+        logger.info(
+            "%s is sending again after %.0f s stale",
+            peer.cpid,
+            time.monotonic() - peer.stale_since,
+            extra={"cpid": peer.cpid},
+        )
+        peer.stale_since = None
+        self.stale.pop(peer, None)
+
+    def snapshot(self, limit: int = 50) -> Dict[str, Any]:
+        """Connections per time-since-last-message bucket and the stalest ones."""
+
+        now = time.monotonic()
+        labels = [f"<{BUCKETS[0]}s"]
+        labels += [f"{lo}-{hi}s" for lo, hi in zip(BUCKETS, BUCKETS[1:])]
+        labels.append(f">={BUCKETS[-1]}s")
+        counts = [0] * len(labels)
+        for peer in self.peers:
+            counts[bisect_right(BUCKETS, now - peer.last_seen)] += 1
+        stalest: List[Peer] = sorted(self.stale, key=lambda p: p.last_seen)[:limit]
+        return {
+            "staleAfterSeconds": self.stale_after,
+            "closeAfterSeconds": self.close_after,
+            "connections": len(self.peers),
+            "stale": len(self.stale),
+            "buckets": dict(zip(labels, counts)),
+            "staleChargePoints": [
+                {
+                    "cpid": peer.cpid,
+                    "idleSeconds": round(now - peer.last_seen, 1),
+                    "staleForSeconds": round(now - peer.stale_since, 1),
+                }
+                for peer in stalest
+            ],
+        }
+
@@ -0,0 +1,200 @@
+"""Event-loop lag probe and stall detector.
+
+All charge points and the HTTP API share one asyncio loop, so a single slow
+callback delays everyone.  :class:`LoopMonitor` measures this in two ways:
+
+* A probe scheduled on the loop every ``interval`` seconds records how late
+  it runs (the loop lag).
+* A watchdog thread notices when the probe has not run for
+  ``stall_threshold`` seconds and captures the loop thread's stack while
+  the offending code is still running.  The stall is attributed to the
+  task being run: its name and coroutine, and what the OCPP handlers and
+  HTTP routes declared with :func:`activity` (``ocpp:MeterValues`` and the
+  charge point, or ``http:GET /api/v1/history``).
+
+Stalls are logged as warnings and kept for ``GET /api/v1/loop``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger("chargebridge.loop")
+
+# Task -> (activity, cpid).  Keyed by task rather than held in a context
+# variable so the watchdog thread can read it.
+_activities: Dict[asyncio.Task, Tuple[str, Optional[str]]] = {}
+_attribution_warned = False
+
+
+@contextmanager
+def activity(name: str, cpid: Optional[str] = None) -> Iterator[None]:
+    """Attribute stalls in the current task to ``name`` (and ``cpid``)."""
+
+    task = asyncio.current_task()
+    previous = _activities.get(task)
+    _activities[task] = (name, cpid)
+    try:
+        yield
+    finally:
+        if previous is None:
+            _activities.pop(task, None)
+        else:
+            _activities[task] = previous
+
+
+def _running_task(loop: asyncio.AbstractEventLoop) -> Optional[asyncio.Task]:
+    # Called from the watchdog thread: with an explicit loop, current_task()
+    # only looks up the task that loop is running.
+    global _attribution_warned
+    try:
+        return asyncio.current_task(loop)
+    except Exception:
+        if not _attribution_warned:
+            _attribution_warned = True
+            logger.warning("Stalls cannot be attributed to tasks here", exc_info=True)
+        return None
+
+
+def _describe(task: Optional[asyncio.Task]) -> Dict[str, Any]:
+    if task is None:
+        return {"task": None}
+    coro = task.get_coro()
+    info: Dict[str, Any] = {
+        "task": task.get_name(),
+        "coroutine": getattr(coro, "__qualname__", repr(coro)),
+    }
+    declared = _activities.get(task)
+    if declared is not None:
+        info["activity"], info["cpid"] = declared
+    return info
+
+
+class LoopMonitor:
+    """Measure loop lag and capture stacks of callbacks that block the loop."""
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        stall_threshold: float = 0.25,
+        keep: int = 50,
+        stack_limit: int = 25,
+        lag_histogram: Any = None,
+        stall_counter: Any = None,
+    ) -> None:
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.stack_limit = stack_limit
+        self.lag_histogram = lag_histogram
+        self.stall_counter = stall_counter
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.stall_count = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._tick = 0.0
+        self._expected = 0.0
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start probing the running loop; call from inside it."""
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._tick = time.monotonic()
+        self._expected = self._tick + self.interval
+        self._handle = self._loop.call_later(self.interval, self._probe)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _probe(self) -> None:
+        now = time.monotonic()
+        lag = max(now - self._expected, 0.0)
+        self.last_lag = lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if self.lag_histogram is not None:
+            self.lag_histogram.observe(lag)
+        self._tick = now
+        self._expected = now + self.interval
+        self._handle = self._loop.call_later(self.interval, self._probe)
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None
+        event: Optional[Dict[str, Any]] = None
+        while not self._stop.wait(self.interval / 2):
+            tick = self._tick
+            if event is not None:
+                if tick > stalled_since:
+                    # The loop is running again; the probe ran at ``tick``.
+                    duration = tick - self.interval - stalled_since
+                    event["durationMs"] = round(max(duration, 0.0) * 1000, 1)
+                    logger.warning(
+                        "Event loop blocked for %.0f ms by %s (cpid=%s, task=%s)\n%s",
+                        event["durationMs"],
+                        event.get("activity") or event.get("coroutine"),
+                        event.get("cpid"),
+                        event.get("task"),
+                        "\n".join(event["stack"]),
+                    )
+                    event = None
+                continue
+            if time.monotonic() - tick - self.interval >= self.stall_threshold:
+                stalled_since = tick
+                event = self._capture()
+
+    def _capture(self) -> Optional[Dict[str, Any]]:
+        # Take the task and frame first: formatting the stack reads source
+        # files and lets the loop thread run again.
+        task = _running_task(self._loop)
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return None
+        described = _describe(task)
+        stack = traceback.format_stack(frame, limit=self.stack_limit)
+        event = {
+            "at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "durationMs": None,
+            **described,
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stall_count += 1
+        if self.stall_counter is not None:
+            self.stall_counter.inc()
+        self.stalls.append(event)
+        return event
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "intervalMs": self.interval * 1000,
+            "stallThresholdMs": self.stall_threshold * 1000,
+            "lagMs": round(self.last_lag * 1000, 2),
+            "maxLagMs": round(self.max_lag * 1000, 2),
+            "stalls": self.stall_count,
+        }
+
+    def recent_stalls(self, limit: int = 10) -> List[Dict[str, Any]]:
+        return list(self.stalls)[-limit:][::-1]
@@ -3,9 +3,7 @@
 import json
 import logging
 
-from services.vid_manager import VIDManager
-
-vid_manager = VIDManager()
+from services.vid_manager import vid_manager
 
 
 def to_vid(source_type: str, source_value: str) -> str:
@@ -0,0 +1,241 @@
+"""Bound the CALLs waiting on each charge point.
+
+OCPP allows one outstanding CALL per connection, so the commands sent to a
+charge point queue behind each other, and the ocpp library only gives up on
+one after its response timeout.  A charger that stopped answering therefore
+parks every API request and console command aimed at it for a multiple of
+that timeout.
+
+Each connection gets a :class:`CallGate`:
+
+* at most ``depth`` CALLs may be queued or in flight; more are refused with
+  :class:`QueueFull`;
+* every CALL has a deadline per action, covering the time spent queued as
+  well as the round trip;
+* after ``failure_threshold`` consecutive deadlines missed the circuit opens
+  and CALLs fail at once with :class:`CircuitOpen`.  After ``cooldown``
+  seconds one CALL is let through as a probe (half-open): an answer closes
+  the circuit, another timeout opens it for a further ``cooldown``.
+
+Any answer counts as success, CALLERRORs included: the charger is talking.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger("chargebridge.outbound")
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CallRejected(Exception):
+    """A CALL refused without being sent; retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(CallRejected):
+    pass
+
+
+class CircuitOpen(CallRejected):
+    pass
+
+
+class CallGate:
+    """Queue bound, deadlines and circuit breaker of one connection."""
+
+    __slots__ = (
+        "cpid",
+        "queued",
+        "failures",
+        "opened_at",
+        "probing",
+        "timeouts",
+        "rejected",
+        "_registry",
+    )
+
+    def __init__(self, registry: "OutboundRegistry", cpid: str) -> None:
+        self.cpid = cpid
+        self.queued = 0
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.timeouts = 0
+        self.rejected = 0
+        self._registry = registry
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.probing or time.monotonic() >= self.opened_at + self._registry.cooldown:
+            return HALF_OPEN
+        return OPEN
+
+    async def call(self, action: str, send: Callable[[], Awaitable[T]]) -> T:
+        """Run ``send()`` (one CALL of ``action``) under the gate's limits."""
+
+        registry = self._registry
+        probe = False
+        if self.opened_at is not None:
+            wait = self.opened_at + registry.cooldown - time.monotonic()
+            if wait > 0 or self.probing:
+                self._reject()
+                raise CircuitOpen(
+                    f"ChargePoint '{self.cpid}' is not answering; "
+                    f"circuit open after {self.failures} timeouts",
+                    max(wait, 1.0),
+                )
+            probe = self.probing = True
+        if self.queued >= registry.depth:
+            self._reject()
+            raise QueueFull(
+                f"ChargePoint '{self.cpid}' has {self.queued} CALLs queued", registry.timeout(action)
+            )
+        self.queued += 1
+        try:
+            result = await asyncio.wait_for(send(), registry.timeout(action))
+        except asyncio.TimeoutError:
+            self._timed_out(action, probe)
+            raise
+        else:
+            self._answered()
+            return result
+        finally:
+            self.queued -= 1
+            if probe:
+                self.probing = False
+
+    def _reject(self) -> None:
+        self.rejected += 1
+        if self._registry.rejected_counter is not None:
+            self._registry.rejected_counter.inc()
+
+    def _timed_out(self, action: str, probe: bool) -> None:
+        self.timeouts += 1
+        self.failures += 1
+        registry = self._registry
+        if probe:
+            self.opened_at = time.monotonic()
+        elif self.opened_at is None and self.failures >= registry.failure_threshold:
+            self.opened_at = time.monotonic()
+            if registry.opened_counter is not None:
+                registry.opened_counter.inc()
+            logger.warning(
+                "%s missed %d CALL deadlines in a row (last: %s); failing CALLs for %.0f s",
+                self.cpid,
+                self.failures,
+                action,
+                registry.cooldown,
+                extra={"cpid": self.cpid},
+            )
+
+    def _answered(self) -> None:
+        if self.opened_at is not None:
+            logger.info("%s answered again; circuit closed", self.cpid, extra={"cpid": self.cpid})
+        self.failures = 0
+        self.opened_at = None
+
+
+class OutboundRegistry:
+    """The :class:`CallGate` of every connection, with shared limits."""
+
+    def __init__(
+        self,
+        *,
+        depth: int,
+        default_timeout: float,
+        timeouts: Optional[Dict[str, float]] = None,
+        failure_threshold: int,
+        cooldown: float,
+        opened_counter: Any = None,
+        rejected_counter: Any = None,
+    ) -> None:
+        self.depth = depth
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts or {}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.opened_counter = opened_counter
+        self.rejected_counter = rejected_counter
+        self.gates: Dict[CallGate, None] = {}
+
+    def timeout(self, action: str) -> float:
+        return self.timeouts.get(action, self.default_timeout)
+
+    @property
+    def max_timeout(self) -> float:
+        return max([self.default_timeout, *self.timeouts.values()])
+
+    def open(self, cpid: str) -> CallGate:
+        gate = CallGate(self, cpid)
+        self.gates[gate] = None
+        return gate
+
+    def close(self, gate: CallGate) -> None:
+        self.gates.pop(gate, None)
+
+    def queued(self) -> int:
+        return sum(gate.queued for gate in self.gates)
+
+    def states(self) -> Dict[str, int]:
+        counts = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+        for gate in self.gates:
+            counts[gate.state] += 1
+        return counts
+
+    def snapshot(
+        self, limit: int = 50, state: Optional[str] = None, cpid: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Fleet totals and the busiest or failing connections.
+
+        Idle connections with a closed circuit are listed only when asked
+        for by ``cpid``.
+        """
+
+        def listed(gate: CallGate) -> bool:
+            if cpid is not None:
+                return gate.cpid == cpid
+            return bool(gate.queued or gate.failures or gate.opened_at is not None)
+
+        now = time.monotonic()
+        gates: List[CallGate] = [
+            gate for gate in self.gates if listed(gate) and (state is None or gate.state == state)
+        ]
+        gates.sort(key=lambda g: (g.opened_at is None, -g.failures, -g.queued))
+        return {
+            "depth": self.depth,
+            "defaultTimeoutSeconds": self.default_timeout,
+            "timeoutSeconds": self.timeouts,
+            "failureThreshold": self.failure_threshold,
+            "cooldownSeconds": self.cooldown,
+            "connections": len(self.gates),
+            "queued": self.queued(),
+            "circuits": self.states(),
+            "chargePoints": [
+                {
+                    "cpid": gate.cpid,
+                    "state": gate.state,
+                    "queued": gate.queued,
+                    "consecutiveTimeouts": gate.failures,
+                    "timeouts": gate.timeouts,
+                    "rejected": gate.rejected,
+                    "openForSeconds": None
+                    if gate.opened_at is None
+                    else round(now - gate.opened_at, 1),
+                }
+                for gate in gates[:limit]
+            ],
+        }
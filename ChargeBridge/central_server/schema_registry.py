@@ -0,0 +1,330 @@
+"""Compiled OCPP 1.6 JSON-schema validation for the central system.
+
+Every schema in ``schemas/json`` is loaded once and compiled into a tree of
+plain Python closures covering the keywords the OCPP 1.6 schemas use
+(``type``, ``properties``, ``required``, ``additionalProperties``,
+``enum``, ``maxLength``, ``items``, ``multipleOf``).  A schema using any other
+keyword falls back to a ``jsonschema`` Draft 4 validator.  As with the
+``ocpp`` library, ``format`` is not asserted.
+
+:class:`ValidationPolicy` decides per charge point whether a message is
+validated: strict mode checks everything, sampled mode checks one message in
+``N`` for trusted hardware.  A charge point caught sending an invalid
+message in sampled mode is switched back to strict mode.
+
+:func:`install_ocpp` routes the ``ocpp`` library's own validation of
+inbound and outbound messages through a policy.  ``CentralSystem`` sets
+:data:`current_cp` so the policy knows which charge point a message
+belongs to.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections import defaultdict
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "schemas", "json")
+
+# Charge point whose message is being validated; set by ``CentralSystem``.
+current_cp: ContextVar[Optional[str]] = ContextVar("current_cp", default=None)
+
+Check = Callable[[Any, str], None]
+
+_IGNORED = {"$schema", "id", "title", "description", "format"}
+_SUPPORTED = _IGNORED | {
+    "type",
+    "properties",
+    "required",
+    "additionalProperties",
+    "enum",
+    "maxLength",
+    "items",
+    "multipleOf",
+}
+
+
+class SchemaViolation(Exception):
+    """A payload does not match its schema."""
+
+    def __init__(self, keyword: str, path: str, message: str) -> None:
+        super().__init__(f"{path or '<payload>'}: {message}")
+        self.keyword = keyword
+        self.path = path
+        self.message = message
+
+
+def _type_check(name: str) -> Callable[[Any], bool]:
+    if name == "string":
+        return lambda v: isinstance(v, str)
+    if name == "integer":
+        return lambda v: isinstance(v, int) and not isinstance(v, bool)
+    if name == "number":
+        return lambda v: isinstance(v, (int, float, Decimal)) and not isinstance(v, bool)
+    if name == "boolean":
+        return lambda v: isinstance(v, bool)
+    if name == "object":
+        return lambda v: isinstance(v, dict)
+    if name == "array":
+        return lambda v: isinstance(v, list)
+    if name == "null":
+        return lambda v: v is None
+    raise ValueError(f"unknown type {name!r}")
+
+
+def compile_schema(schema: Dict[str, Any]) -> Check:
+    """Compile ``schema`` into ``check(instance, path)`` raising :class:`SchemaViolation`.
+
+    Raises ``ValueError`` when the schema uses a keyword this compiler does
+    not implement.
+    """
+
+    unknown = set(schema) - _SUPPORTED
+    if unknown:
+        raise ValueError(f"unsupported keywords {sorted(unknown)}")
+
+    checks = []
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        tests = [_type_check(n) for n in names]
+        expected = " or ".join(names)
+
+        if len(tests) == 1:
+            test = tests[0]
+
+            def check_type(value, path):
+                if not test(value):
+                    raise SchemaViolation("type", path, f"{value!r} is not of type {expected}")
+
+        else:
+
+            def check_type(value, path):
+                if not any(t(value) for t in tests):
+                    raise SchemaViolation("type", path, f"{value!r} is not of type {expected}")
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        options = schema["enum"]
+        allowed = set(options) if all(isinstance(o, str) for o in options) else options
+
+        def check_enum(value, path):
+            if value not in allowed:
+                raise SchemaViolation("enum", path, f"{value!r} is not one of {options}")
+
+        checks.append(check_enum)
+
+    if "maxLength" in schema:
+        limit = schema["maxLength"]
+
+        def check_length(value, path):
+            if isinstance(value, str) and len(value) > limit:
+                raise SchemaViolation("maxLength", path, f"{value!r} is too long")
+
+        checks.append(check_length)
+
+    if "multipleOf" in schema:
+        step = Decimal(str(schema["multipleOf"]))
+
+        def check_multiple(value, path):
+            # Decimal arithmetic: 21.4 is a multiple of 0.1, unlike in floats.
+            if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+                if Decimal(str(value)) % step != 0:
+                    raise SchemaViolation("multipleOf", path, f"{value!r} is not a multiple of {step}")
+
+        checks.append(check_multiple)
+
+    properties = {name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    required = tuple(schema.get("required", ()))
+    closed = schema.get("additionalProperties", True) is False
+    if properties or required or closed:
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise SchemaViolation("required", path, f"{name!r} is a required property")
+            for name, item in value.items():
+                sub = properties.get(name)
+                if sub is not None:
+                    sub(item, f"{path}.{name}" if path else name)
+                elif closed:
+                    raise SchemaViolation(
+                        "additionalProperties", path, f"additional property {name!r} is not allowed"
+                    )
+
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_check = compile_schema(schema["items"])
+
+        def check_items(value, path):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    item_check(item, f"{path}[{i}]")
+
+        checks.append(check_items)
+
+    if not checks:
+        return lambda value, path: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path):
+        for c in checks:
+            c(value, path)
+
+    return check_all
+
+
+def _draft4_check(schema: Dict[str, Any]) -> Check:
+    from jsonschema import Draft4Validator
+    from jsonschema.exceptions import ValidationError
+
+    validator = Draft4Validator(schema)
+
+    def check(value, path):
+        try:
+            validator.validate(value)
+        except ValidationError as e:
+            raise SchemaViolation(e.validator, ".".join(map(str, e.absolute_path)), e.message)
+
+    return check
+
+
+class SchemaRegistry:
+    """Validators for every OCPP schema file in ``directory``, compiled once."""
+
+    def __init__(self, directory: str = SCHEMA_DIR) -> None:
+        self.directory = directory
+        self._checks: Dict[Tuple[str, bool], Check] = {}
+        for entry in sorted(os.listdir(directory)):
+            if not entry.endswith(".json"):
+                continue
+            with open(os.path.join(directory, entry), encoding="utf-8-sig") as f:
+                schema = json.load(f)
+            name = entry[:-5]
+            response = name.endswith("Response")
+            action = name[: -len("Response")] if response else name
+            try:
+                check = compile_schema(schema)
+            except ValueError as e:
+                logger.info("Using jsonschema for %s: %s", entry, e)
+                check = _draft4_check(schema)
+            self._checks[(action, response)] = check
+
+    def __contains__(self, key: Tuple[str, bool]) -> bool:
+        return key in self._checks
+
+    def __len__(self) -> int:
+        return len(self._checks)
+
+    def validate(self, action: str, payload: Any, response: bool = False) -> None:
+        """Raise :class:`SchemaViolation` if ``payload`` is invalid for ``action``.
+
+        Raises ``KeyError`` for actions without a schema.
+        """
+
+        self._checks[(action, response)](payload, "")
+
+
+class ValidationPolicy:
+    """Per charge point choice between strict and sampled validation."""
+
+    def __init__(self, registry: SchemaRegistry, *, sample_every: int = 1) -> None:
+        self.registry = registry
+        self.default_sample_every = sample_every
+        self.sample_every: Dict[str, int] = {}
+        self._seen: Dict[Optional[str], int] = defaultdict(int)
+        self.validated = 0
+        self.skipped = 0
+        self.violations: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def set_mode(self, cpid: str, sample_every: int) -> None:
+        """Validate every ``sample_every``-th message of ``cpid`` (1 = strict)."""
+
+        self.sample_every[cpid] = max(int(sample_every), 1)
+
+    def mode(self, cpid: Optional[str]) -> int:
+        if cpid is None:
+            return 1
+        return self.sample_every.get(cpid, self.default_sample_every)
+
+    def should_validate(self, cpid: Optional[str]) -> bool:
+        every = self.mode(cpid)
+        if every <= 1:
+            return True
+        self._seen[cpid] += 1
+        return self._seen[cpid] % every == 0
+
+    def check(self, cpid: Optional[str], action: str, payload: Any, response: bool) -> bool:
+        """Validate one message if the policy selects it.
+
+        Returns ``False`` when the message was skipped; raises
+        :class:`SchemaViolation` (after counting it) when it is invalid.
+        """
+
+        if not self.should_validate(cpid):
+            self.skipped += 1
+            return False
+        self.validated += 1
+        try:
+            self.registry.validate(action, payload, response)
+        except SchemaViolation:
+            key = f"{action}Response" if response else action
+            self.violations[cpid or "-"][key] += 1
+            if cpid is not None and self.mode(cpid) > 1:
+                logger.warning("Schema violation from sampled charge point %s; validating strictly", cpid)
+                self.sample_every[cpid] = 1
+            raise
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "schemas": len(self.registry),
+            "defaultSampleEvery": self.default_sample_every,
+            "sampled": dict(self.sample_every),
+            "validated": self.validated,
+            "skipped": self.skipped,
+            "violations": {cp: dict(v) for cp, v in self.violations.items()},
+        }
+
+
+def install_ocpp(policy: ValidationPolicy) -> None:
+    """Validate the ``ocpp`` library's OCPP 1.6 messages through ``policy``.
+
+    Violations raise the same OCPP errors as the library's own validation,
+    so charge points receive the same CALLERRORs as before.
+    """
+
+    import ocpp.charge_point
+    from ocpp.exceptions import FormatViolationError, ProtocolError, TypeConstraintViolationError
+    from ocpp.messages import Call, CallResult
+
+    library_validate = ocpp.charge_point.validate_payload
+
+    def validate_payload(message, ocpp_version):
+        response = type(message) is CallResult
+        if ocpp_version != "1.6" or not (response or type(message) is Call):
+            return library_validate(message, ocpp_version)
+        if (message.action, response) not in policy.registry:
+            return library_validate(message, ocpp_version)
+        try:
+            policy.check(current_cp.get(), message.action, message.payload, response)
+        except SchemaViolation as e:
+            details = {"cause": str(e), "ocpp_message": message}
+            if e.keyword in ("type", "maxLength"):
+                raise TypeConstraintViolationError(details=details) from e
+            if e.keyword == "required":
+                raise ProtocolError(details={"cause": str(e)}) from e
+            raise FormatViolationError(details=details) from e
+
+    ocpp.charge_point.validate_payload = validate_payload
@@ -0,0 +1,143 @@
+"""Multi-process sharding support for ``central.py``.
+
+In sharded mode several worker processes accept charge point connections
+on the same port (``SO_REUSEPORT``).  Workers coordinate through a run
+directory on the local filesystem, with no external service:
+
+* ``owners/<cpid>`` holds the index of the worker currently serving the
+  charge point.  Claims are written atomically with :func:`os.replace`.
+* ``worker-<n>.sock`` is a Unix socket on which worker ``n`` answers
+  JSON requests from its siblings, e.g. an API command for a charge point
+  it owns.
+
+Each request is a single JSON message answered by a single JSON message on
+a fresh connection.  A message is framed by its length as a 4-byte big-endian
+prefix, so replies listing thousands of charge points or carrying a meter
+series are not bounded by a line buffer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+_LENGTH = struct.Struct(">I")
+
+
+def _write_message(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    data = json.dumps(message).encode()
+    writer.write(_LENGTH.pack(len(data)) + data)
+
+
+async def _read_message(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return json.loads(await reader.readexactly(length))
+
+
+class ShardRegistry:
+    """Filesystem record of which worker owns which charge point."""
+
+    def __init__(self, run_dir: str, worker_id: int) -> None:
+        self.run_dir = run_dir
+        self.worker_id = worker_id
+        self._owners_dir = os.path.join(run_dir, "owners")
+        os.makedirs(self._owners_dir, exist_ok=True)
+
+    def _owner_path(self, cpid: str) -> str:
+        return os.path.join(self._owners_dir, quote(cpid, safe=""))
+
+    def socket_path(self, worker_id: int) -> str:
+        return os.path.join(self.run_dir, f"worker-{worker_id}.sock")
+
+    def owner(self, cpid: str) -> Optional[int]:
+        """Return the worker owning ``cpid`` or ``None``."""
+
+        try:
+            with open(self._owner_path(cpid), encoding="ascii") as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def claim(self, cpid: str) -> Optional[int]:
+        """Mark this worker as owner of ``cpid`` and return the previous owner."""
+
+        previous = self.owner(cpid)
+        path = self._owner_path(cpid)
+        tmp = f"{path}.{self.worker_id}.tmp"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(str(self.worker_id))
+        os.replace(tmp, path)
+        return previous
+
+
+class ShardWorker:
+    """Command endpoint of one worker and client for its siblings."""
+
+    def __init__(self, registry: ShardRegistry, workers: int, *, timeout: float = 60.0) -> None:
+        self.registry = registry
+        self.workers = workers
+        self.timeout = timeout
+        self._handlers: Dict[str, Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def worker_id(self) -> int:
+        return self.registry.worker_id
+
+    def register(self, op: str, handler: Handler) -> None:
+        """Answer requests for ``op`` with ``handler``."""
+
+        self._handlers[op] = handler
+
+    async def start(self) -> None:
+        path = self.registry.socket_path(self.worker_id)
+        if os.path.exists(path):
+            os.remove(path)
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            message = await _read_message(reader)
+            handler = self._handlers.get(message.get("op"))
+            if handler is None:
+                reply: Dict[str, Any] = {"error": f"unknown op {message.get('op')!r}"}
+            else:
+                try:
+                    reply = await handler(message.get("payload") or {})
+                except Exception as e:
+                    logger.exception("Shard request %s failed", message.get("op"))
+                    reply = {"error": str(e)}
+            _write_message(writer, reply)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def request(self, worker_id: int, op: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send ``op`` to ``worker_id`` and return its reply."""
+
+        path = self.registry.socket_path(worker_id)
+        reader, writer = await asyncio.open_unix_connection(path)
+        try:
+            _write_message(writer, {"op": op, "payload": payload})
+            await writer.drain()
+            reply = await asyncio.wait_for(_read_message(reader), timeout=self.timeout)
+        finally:
+            writer.close()
+        if "error" in reply:
+            raise RuntimeError(f"worker {worker_id}: {reply['error']}")
+        return reply
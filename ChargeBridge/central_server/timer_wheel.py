@@ -0,0 +1,130 @@
+"""Shared timeouts for charge points and connectors.
+
+A connector that goes to Preparing or Occupied without a transaction is
+unlocked after a while.  Giving every such connector its own sleeping task
+means a task and a loop timer created and cancelled on each status change;
+with many connectors flapping between states that churn adds up.
+
+:class:`TimerWheel` keeps all of these timeouts in one hashed timing wheel
+(Varghese and Lauck): a ring of ``slots`` buckets, each ``resolution``
+seconds wide.  A timer is stored in the bucket of its deadline under a key
+chosen by the caller, so arming, re-arming and cancelling are a dict insert
+or delete.  A single loop callback advances the wheel once per
+``resolution`` while any timer is armed, and fires what is due.  Deadlines
+further away than one turn of the ring stay in their bucket until the turn
+in which they are due.  Timers fire up to ``resolution`` late, which suits
+timeouts measured in tens of seconds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from typing import Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Callback = Callable[[], None]
+
+
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """Parse ``"Model A=120,Model B=45"`` into seconds per charge point model."""
+
+    timeouts: Dict[str, float] = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, seconds = item.rpartition("=")
+        timeouts[model.strip()] = float(seconds)
+    return timeouts
+
+
+class _Timer:
+    __slots__ = ("key", "due", "callback")
+
+    def __init__(self, key: Hashable, due: int, callback: Callback) -> None:
+        self.key = key
+        self.due = due
+        self.callback = callback
+
+
+class TimerWheel:
+    """Keyed one-shot timers driven by a single loop callback.
+
+    Callbacks are plain functions run on the event loop; they should start
+    a task for anything that awaits.
+    """
+
+    def __init__(self, resolution: float = 1.0, slots: int = 512) -> None:
+        self.resolution = resolution
+        self._buckets: List[Dict[Hashable, _Timer]] = [{} for _ in range(slots)]
+        self._timers: Dict[Hashable, _Timer] = {}
+        # Next tick to process; ``None`` while no timer is armed.
+        self._tick: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self.fired = 0
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def arm(self, key: Hashable, delay: float, callback: Callback) -> None:
+        """Run ``callback`` after ``delay`` seconds, replacing any timer for ``key``."""
+
+        loop = asyncio.get_running_loop()
+        now = loop.time() / self.resolution
+        if self._tick is None:
+            self._tick = math.floor(now)
+        due = max(math.ceil(now + delay / self.resolution), self._tick)
+        self.cancel(key)
+        timer = _Timer(key, due, callback)
+        self._timers[key] = timer
+        self._buckets[due % len(self._buckets)][key] = timer
+        if self._handle is None:
+            self._handle = loop.call_at(self._tick * self.resolution, self._advance)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Disarm the timer for ``key``; returns whether one was armed."""
+
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        del self._buckets[timer.due % len(self._buckets)][key]
+        return True
+
+    def _advance(self) -> None:
+        self._handle = None
+        if self._tick is None:
+            return
+        loop = asyncio.get_running_loop()
+        now = math.floor(loop.time() / self.resolution)
+        while self._tick <= now and self._timers:
+            tick = self._tick
+            bucket = self._buckets[tick % len(self._buckets)]
+            due = [timer for timer in bucket.values() if timer.due <= tick]
+            for timer in due:
+                del bucket[timer.key]
+                del self._timers[timer.key]
+            # Callbacks may re-arm; this tick is done with.
+            self._tick = tick + 1
+            for timer in due:
+                self.fired += 1
+                try:
+                    timer.callback()
+                except Exception:
+                    logger.exception("Timer %r failed", timer.key)
+        if not self._timers:
+            self._tick = None
+        elif self._handle is None:
+            # (A callback that re-armed has already scheduled the next tick.)
+            self._handle = loop.call_at(self._tick * self.resolution, self._advance)
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        for bucket in self._buckets:
+            bucket.clear()
+        self._timers.clear()
+        self._tick = None
@@ -0,0 +1,119 @@
+"""Materialised read views for the dashboard endpoints.
+
+``/api/v1/overview``, ``/api/v1/status`` and ``/api/v1/active`` used to walk
+every connected charge point and build a model per connector on each
+request.  A :class:`MaterializedView` instead keeps one pre-encoded JSON
+fragment per row and is updated in place: the OCPP handlers call
+:meth:`MaterializedView.touch` with the key of the row they changed, and
+only that row is rebuilt and re-encoded.  Each change that alters a row
+bumps :attr:`MaterializedView.version`; the response body is assembled from
+the fragments at most once per version and then served as is, so repeated
+reads cost the same no matter how large the fleet is.
+
+The version is exposed as an ``ETag``.  It is prefixed with a random epoch
+chosen per process (and again in each forked worker), so a tag from before
+a restart, or from another worker, never matches by accident.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Dict, Generic, Hashable, Iterable, Optional, TypeVar
+
+import codec
+
+K = TypeVar("K", bound=Hashable)
+
+
+def _new_epoch() -> str:
+    return os.urandom(4).hex()
+
+
+class MaterializedView(Generic[K]):
+    """A JSON document ``{field: [row, ...]}`` kept current row by row.
+
+    ``row(key)`` returns the JSON-ready row for ``key``, or ``None`` when the
+    row no longer exists; ``keys()`` lists every row and is only used to
+    build the view the first time it is read.  Until then :meth:`touch` is a
+    no-op, so a view nobody requests costs nothing.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        field: str,
+        row: Callable[[K], Optional[Dict[str, Any]]],
+        keys: Callable[[], Iterable[K]],
+    ) -> None:
+        self.name = name
+        self.field = field
+        self._row = row
+        self._keys = keys
+        self.version = 0
+        self._rows: Optional[Dict[K, bytes]] = None
+        self._body: Optional[bytes] = None
+        self._epoch = _new_epoch()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self._epoch = _new_epoch()
+        self._rows = None
+        self._body = None
+        self.version = 0
+
+    def _encode(self, key: K) -> Optional[bytes]:
+        row = self._row(key)
+        return None if row is None else codec.dumpb(row)
+
+    def touch(self, key: K) -> None:
+        """Rebuild the row for ``key`` after its source data changed."""
+
+        rows = self._rows
+        if rows is None:
+            return
+        fragment = self._encode(key)
+        if fragment is None:
+            if rows.pop(key, None) is None:
+                return
+        elif rows.get(key) == fragment:
+            return
+        else:
+            rows[key] = fragment
+        self.version += 1
+        self._body = None
+
+    def _build(self) -> Dict[K, bytes]:
+        rows: Dict[K, bytes] = {}
+        for key in self._keys():
+            fragment = self._encode(key)
+            if fragment is not None:
+                rows[key] = fragment
+        self._rows = rows
+        self.version += 1
+        return rows
+
+    @property
+    def etag(self) -> str:
+        if self._rows is None:
+            self._build()
+        return f'"{self.name}-{self._epoch}-{self.version}"'
+
+    def body(self) -> bytes:
+        """The encoded document for the current version."""
+
+        if self._body is None:
+            rows = self._rows if self._rows is not None else self._build()
+            self._body = b'{"%s":[%s]}' % (self.field.encode(), b",".join(rows.values()))
+        return self._body
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an ``If-None-Match`` header names the current version."""
+
+        if not if_none_match:
+            return False
+        etag = self.etag
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == etag:
+                return True
+        return False
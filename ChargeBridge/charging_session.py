@@ -47,8 +47,11 @@ class ChargingSession:
         return response
 
     async def _meter_loop(self) -> None:
+        task = asyncio.current_task()
         try:
-            while self.transaction_id is not None:
+            # ``stop`` clears ``_meter_task``; checking it as well as
+            # cancelling covers a cancellation swallowed by ``wait_for``.
+            while self.transaction_id is not None and self._meter_task is task:
                 sample = self._read_sample()
                 self.samples.append(sample)
                 await self.ocpp.send_meter_values(
@@ -0,0 +1,94 @@
+"""JSON codec for OCPP-J frames.
+
+``orjson`` is used when it is installed and the stdlib :mod:`json` module
+otherwise; :data:`NAME` tells which one is active.  Both the central system
+and :class:`ocpp_client.OCPPClient` encode and decode frames through this
+module:
+
+* :func:`loads` accepts ``str`` or ``bytes``.
+* :func:`dumps` returns ``str``; :func:`dumpb` returns UTF-8 ``bytes``.
+* :func:`send_frame` encodes a frame and sends it as a WebSocket text
+  frame through the connection's public ``send()``.
+* :func:`install_ocpp` makes the ``ocpp`` library (used by ``central.py``)
+  parse and serialise its messages with the same codec.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+NAME = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+    def dumpb(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+
+else:
+
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def dumpb(obj: Any) -> bytes:
+        return dumps(obj).encode()
+
+
+async def send_frame(ws: Any, frame: Any) -> None:
+    """Encode ``frame`` and send it on ``ws`` as a text frame."""
+
+    # OCPP-J requires text frames; ``send(bytes)`` would make a binary one.
+    await ws.send(dumps(frame))
+
+
+class _OcppJson:
+    """Stand-in for the ``json`` module referenced by :mod:`ocpp.messages`."""
+
+    JSONDecodeError = json.JSONDecodeError
+    JSONEncoder = json.JSONEncoder
+
+    @staticmethod
+    def loads(s: str | bytes, **kwargs: Any) -> Any:
+        # ``parse_float=Decimal`` (schema validation of a few actions) has no
+        # orjson equivalent.
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return loads(s)
+
+    @staticmethod
+    def dumps(obj: Any, *, cls: type[json.JSONEncoder] | None = None, **kwargs: Any) -> str:
+        kwargs.pop("separators", None)
+        if kwargs:
+            return json.dumps(obj, cls=cls, **kwargs)
+        default = cls().default if cls is not None else None
+        return orjson.dumps(obj, default=default).decode()
+
+
+def install_ocpp() -> bool:
+    """Route the ``ocpp`` library's JSON handling through this codec.
+
+    Returns ``False`` (and changes nothing) when only the stdlib is
+    available.
+    """
+
+    if orjson is None:
+        return False
+    import ocpp.messages
+
+    ocpp.messages.json = _OcppJson
+    return True
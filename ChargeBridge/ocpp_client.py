@@ -1,5 +1,4 @@
 import asyncio
-import json
 import uuid
 from datetime import datetime
 import logging
@@ -7,9 +6,21 @@ import csv
 
 import websockets
 
+import codec
+
 logger = logging.getLogger(__name__)
 
 
+class OCPPCallError(Exception):
+    """A CALLERROR frame received in reply to one of our CALLs."""
+
+    def __init__(self, code: str, description: str = "", details: dict | None = None) -> None:
+        super().__init__(f"{code}: {description}" if description else code)
+        self.code = code
+        self.description = description
+        self.details = details or {}
+
+
 class OCPPClient:
     """Minimal OCPP client for interacting with charging stations.
 
@@ -44,14 +55,20 @@ class OCPPClient:
         self._ws: websockets.WebSocketClientProtocol | None = None
         self._heartbeat_task: asyncio.Task | None = None
         self._listener_task: asyncio.Task | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self._handler_tasks: set[asyncio.Task] = set()
         self._active_tx: dict | None = None
         self._last_meter: int = 0
 
     async def connect(self) -> None:
         """Establish a WebSocket connection and announce the charge point."""
         self._ws = await websockets.connect(self.uri, subprotocols=[self.ocpp_protocol])
+        # The listener must run first: it delivers the BootNotification reply.
+        # Each connection gets its own pending map so a listener shutting
+        # down only fails the calls made on its socket.
+        self._pending = {}
+        self._listener_task = asyncio.create_task(self._listen(self._ws, self._pending))
         await self.boot_notification()
-        self._listener_task = asyncio.create_task(self._listen())
 
     async def close(self) -> None:
         if self._heartbeat_task:
@@ -64,35 +81,85 @@ class OCPPClient:
             await self._ws.close()
             self._ws = None
 
-    async def _listen(self) -> None:
-        """Listen for incoming CALL messages and dispatch handlers."""
-        assert self._ws is not None
+    async def _listen(
+        self, ws: websockets.WebSocketClientProtocol, pending: dict[str, asyncio.Future]
+    ) -> None:
+        """Read every frame from ``ws``.
+
+        This is the only reader of the socket.  Results and errors resolve
+        the future of the matching outbound CALL; incoming CALLs are handled
+        in their own tasks so a handler that makes calls itself cannot block
+        the reader.
+        """
+        error: BaseException = ConnectionError("Connection closed")
         try:
             while True:
-                raw = await self._ws.recv()
-                msg = json.loads(raw)
-                if not isinstance(msg, list) or len(msg) < 4:
+                try:
+                    msg = codec.loads(await ws.recv())
+                except ValueError:
+                    logger.warning("Ignoring malformed frame")
+                    continue
+                if not isinstance(msg, list) or len(msg) < 3:
                     continue
-                if msg[0] != 2:
+                message_type, message_id = msg[0], msg[1]
+                if message_type == 2 and len(msg) >= 4:
+                    task = asyncio.create_task(self._handle_call(ws, message_id, msg[2], msg[3]))
+                    self._handler_tasks.add(task)
+                    task.add_done_callback(self._handler_tasks.discard)
                     continue
-                _, message_id, action, payload = msg
-                handler = getattr(self, f"on_{action.lower()}", None)
-                if handler:
-                    resp_payload = await handler(payload)
-                    response = [3, message_id, resp_payload]
-                else:
-                    response = [4, message_id, "NotImplemented", {}]
-                await self._ws.send(json.dumps(response))
+                future = pending.pop(message_id, None)
+                if future is None or future.done():
+                    logger.debug("Dropping reply to unknown message %s", message_id)
+                elif message_type == 3:
+                    future.set_result(msg[2])
+                elif message_type == 4:
+                    future.set_exception(
+                        OCPPCallError(
+                            msg[2],
+                            msg[3] if len(msg) > 3 else "",
+                            msg[4] if len(msg) > 4 else None,
+                        )
+                    )
         except asyncio.CancelledError:
             pass
+        except websockets.ConnectionClosed as e:
+            error = e
+        finally:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            pending.clear()
+
+    async def _handle_call(
+        self, ws: websockets.WebSocketClientProtocol, message_id: str, action: str, payload: dict
+    ) -> None:
+        handler = getattr(self, f"on_{action.lower()}", None)
+        if handler is None:
+            response = [4, message_id, "NotImplemented", f"{action} is not supported", {}]
+        else:
+            try:
+                response = [3, message_id, await handler(payload)]
+            except Exception as e:
+                logger.exception("Handler for %s failed", action)
+                response = [4, message_id, "InternalError", str(e), {}]
+        try:
+            await codec.send_frame(ws, response)
         except websockets.ConnectionClosed:
-            pass
+            logger.debug("Connection closed before replying to %s", action)
 
     async def _call(
-        self, action: str, payload: dict, *, return_message_id: bool = False
+        self,
+        action: str,
+        payload: dict,
+        *,
+        return_message_id: bool = False,
+        timeout: float | None = None,
     ) -> dict | tuple[dict, str]:
         """Send an OCPP CALL message and return the payload of the result.
 
+        Any number of calls may be in flight at once; the listener matches
+        replies to calls by message ID.
+
         Parameters
         ----------
         action: str
@@ -103,21 +170,33 @@ class OCPPClient:
             When ``True`` the generated message ID is returned along with the
             response payload.  This is useful for logging and debugging
             purposes.
+        timeout: float, optional
+            Seconds to wait for the reply, ``connection_timeout`` by default.
+            ``asyncio.TimeoutError`` is raised when it expires.
+
+        Raises
+        ------
+        OCPPCallError
+            When the central system answers with a CALLERROR frame.
         """
 
         if self._ws is None:
             raise RuntimeError("Client is not connected")
 
         message_id = str(uuid.uuid4())
-        request = [2, message_id, action, payload]
-        await self._ws.send(json.dumps(request))
-
-        raw_response = await self._ws.recv()
-        response = json.loads(raw_response)
-        # OCPP result frames are of the form [3, message_id, payload]
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending
+        pending[message_id] = future
+        try:
+            await codec.send_frame(self._ws, [2, message_id, action, payload])
+            response = await asyncio.wait_for(
+                future, timeout=self.connection_timeout if timeout is None else timeout
+            )
+        finally:
+            pending.pop(message_id, None)
         if return_message_id:
-            return response[2], message_id
-        return response[2]
+            return response, message_id
+        return response
 
     async def boot_notification(self) -> None:
         """Send a BootNotification and schedule periodic heartbeats."""
@@ -359,7 +438,9 @@ class OCPPClient:
             for troubleshooting.
         """
 
-        serialized = json.dumps(data)
+        # DataTransfer.data is a string in OCPP 1.6, so structured data is
+        # carried as JSON text inside the frame.
+        serialized = codec.dumps(data)
         payload = {
             "vendorId": vendor_id,
             "messageId": message_id,
@@ -0,0 +1,133 @@
+"""Benchmark the OCPP frame codec.
+
+Encodes and decodes typical frames with the stdlib ``json`` module and with
+:mod:`codec` (``orjson`` when installed):
+
+* BootNotification CALL,
+* MeterValues CALL with a three-phase sample (12 sampled values),
+* DataTransfer CALL carrying a CsvLog batch, whose ``data`` field is
+  itself JSON text.
+
+    python scripts/bench_codec.py --rows 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec  # noqa: E402
+
+
+def _boot_notification() -> list:
+    return [
+        2,
+        "7f5b8e9a-0c4e-4d36-9a3e-51e0e0b1c9f2",
+        "BootNotification",
+        {
+            "chargePointModel": "Gresgying 120-180",
+            "chargePointVendor": "Gresgying",
+            "chargePointSerialNumber": "GY-2024-000123",
+            "firmwareVersion": "v2.3.7",
+        },
+    ]
+
+
+def _meter_values() -> list:
+    sampled = []
+    for phase in ("L1", "L2", "L3"):
+        sampled += [
+            {"value": "61.3", "measurand": "Current.Import", "phase": phase, "unit": "A"},
+            {"value": "230.8", "measurand": "Voltage", "phase": phase, "unit": "V"},
+            {"value": "14.15", "measurand": "Power.Active.Import", "phase": phase, "unit": "kW"},
+        ]
+    sampled += [
+        {"value": "18234.5", "measurand": "Energy.Active.Import.Register", "unit": "Wh"},
+        {"value": "57", "measurand": "SoC", "unit": "Percent", "location": "EV"},
+        {"value": "31.5", "measurand": "Temperature", "unit": "Celsius"},
+    ]
+    return [
+        2,
+        "c2d7a1e4-5b0f-4b9f-8a63-2f0d4e7c9a11",
+        "MeterValues",
+        {
+            "connectorId": 1,
+            "transactionId": 4821,
+            "meterValue": [{"timestamp": "2024-01-01T00:00:00Z", "sampledValue": sampled}],
+        },
+    ]
+
+
+def _csv_records(rows: int) -> list:
+    return [
+        {
+            "timestamp": f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}",
+            "sender": "EVCC",
+            "title": "SessionSetupReq",
+            "detail": f"EVCCID=0x00A0B1C2D3E4 step={i} ok",
+        }
+        for i in range(rows)
+    ]
+
+
+def _data_transfer(records: list, dumps) -> list:
+    return [
+        2,
+        "0b9f3c2a-77d1-4e1d-9a54-6a9b8a0e3f70",
+        "DataTransfer",
+        {"vendorId": "com.yourco.logs", "messageId": "CsvLog", "data": dumps(records)},
+    ]
+
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def _stdlib_dumps(obj) -> str:
+    return json.dumps(obj)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200, help="CsvLog rows per DataTransfer")
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"codec: {codec.NAME}")
+    print(f"{'frame':<22} {'bytes':>7} {'op':<7} {'json us':>9} {'codec us':>9} {'speedup':>8}")
+    records = _csv_records(args.rows)
+    frames = {
+        "BootNotification": (_boot_notification, _boot_notification),
+        "MeterValues": (_meter_values, _meter_values),
+        f"DataTransfer({args.rows})": (
+            lambda: _data_transfer(records, _stdlib_dumps),
+            lambda: _data_transfer(records, codec.dumps),
+        ),
+    }
+    for name, (build_json, build_codec) in frames.items():
+        repeat = max(args.repeat // max(args.rows // 20, 1), 100) if "Data" in name else args.repeat
+        raw = json.dumps(build_json())
+        rows = [
+            # DataTransfer encoding includes the nested ``data`` text.
+            ("encode", lambda: json.dumps(build_json()), lambda: codec.dumps(build_codec())),
+            ("decode", lambda: json.loads(raw), lambda: codec.loads(raw)),
+        ]
+        for op, stdlib_fn, codec_fn in rows:
+            baseline = _time(stdlib_fn, repeat)
+            fast = _time(codec_fn, repeat)
+            print(
+                f"{name:<22} {len(raw):>7} {op:<7} {baseline:>9.2f} {fast:>9.2f} "
+                f"{baseline / fast:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark the store journal.
+
+Measures sustained MeterValues batch writes per second through
+``store.record_meter_values`` with the group-commit writer running, then the
+time to recover a log of ``--log-mb`` megabytes.  Pass ``--log-mb 4096`` for
+a multi-GB recovery run.
+
+    python scripts/bench_journal.py --seconds 10 --log-mb 1024
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import store  # noqa: E402
+from api.journal import Journal  # noqa: E402
+
+
+def _sample(i: int) -> dict:
+    return {
+        "timestamp": "2024-01-01T00:00:00Z",
+        "context": "Sample.Periodic",
+        "current": 180.0 + i % 7,
+        "voltage": 400.0,
+        "power": 72000.0,
+        "soc": float(i % 100),
+        "temperature": 31.5,
+        "energy": float(i),
+    }
+
+
+def _reset_store() -> None:
+    store.load_state({})
+
+
+def bench_writes(directory: str, seconds: float, transactions: int) -> None:
+    journal = Journal(directory)
+    journal.attach("store", store)
+    journal.recover()
+    journal.start()
+    batch = [_sample(0)]
+    writes = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for tx_id in range(1, transactions + 1):
+            store.record_meter_values(tx_id, batch)
+        writes += transactions
+    enqueue_elapsed = time.perf_counter() - started
+    journal.close()
+    total_elapsed = time.perf_counter() - started
+    print(
+        f"writes: {writes} MeterValues in {enqueue_elapsed:.2f}s "
+        f"({writes / enqueue_elapsed:,.0f}/s enqueued, {writes / total_elapsed:,.0f}/s durable), "
+        f"{journal.commits} group commits"
+    )
+
+
+def build_log(directory: str, megabytes: int, transactions: int) -> int:
+    journal = Journal(directory, commit_interval=0, fsync=False)
+    journal.attach("store", store)
+    journal.recover()
+    journal.start()
+    target = megabytes * 1024 * 1024
+    path_size = 0
+    i = 0
+    while path_size < target:
+        for _ in range(10_000):
+            store.record_meter_values(1 + i % transactions, [_sample(i)])
+            i += 1
+        path_size = sum(
+            os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)
+        )
+    journal.close()
+    return i
+
+
+def bench_recovery(directory: str) -> None:
+    _reset_store()
+    size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+    journal = Journal(directory)
+    journal.attach("store", store)
+    started = time.perf_counter()
+    records = journal.recover()
+    elapsed = time.perf_counter() - started
+    print(
+        f"recovery: {records} records / {size / 1024 / 1024:,.0f} MB in {elapsed:.2f}s "
+        f"({records / elapsed:,.0f} records/s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--log-mb", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        bench_writes(directory, args.seconds, args.transactions)
+    _reset_store()
+    with tempfile.TemporaryDirectory() as directory:
+        build_log(directory, args.log_mb, args.transactions)
+        bench_recovery(directory)
+
+
+if __name__ == "__main__":
+    main()
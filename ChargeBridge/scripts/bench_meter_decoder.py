@@ -0,0 +1,90 @@
+"""Benchmark :func:`services.meter_values.decode_meter_values`.
+
+Decodes ``--messages`` MeterValues payloads with the table-driven decoder
+and with the if/elif chain it replaced in ``CentralSystem.on_meter_values``.
+Each payload holds one entry with the sampled values of a three-phase AC
+charger (``--phases``) or of a DC charger reporting totals only.  The old
+chain ignores units and phases, so it does less work per value; the
+comparison is of the cost per message, not of identical output.
+
+    python scripts/bench_meter_decoder.py
+    python scripts/bench_meter_decoder.py --messages 100000 --phases
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meter_values import decode_meter_values  # noqa: E402
+
+
+def _report(label: str, elapsed: float, count: int, unit: str) -> None:
+    print(f"  {label:<40}{elapsed:8.2f}s {elapsed / max(count, 1) * 1e6:8.2f} us/{unit}")
+
+
+def _legacy_decode(meter_value):
+    samples = []
+    for entry in meter_value:
+        sample = {"timestamp": entry.get("timestamp")}
+        for sv in entry.get("sampledValue", []):
+            meas = sv.get("measurand")
+            try:
+                val = float(sv.get("value"))
+            except (TypeError, ValueError):
+                continue
+            if meas == "Current.Import":
+                sample["current"] = val
+            elif meas == "Voltage":
+                sample["voltage"] = val
+            elif meas == "Power.Active.Import":
+                sample["power"] = val
+            elif meas == "SoC":
+                sample["soc"] = val
+            elif meas == "Temperature":
+                sample["temperature"] = val
+            elif meas == "Energy.Active.Import.Register":
+                sample["energy"] = val
+        samples.append(sample)
+    return samples
+
+
+def _payload(i: int, phases: bool):
+    values = [
+        {"value": str(1000 + i), "measurand": "Energy.Active.Import.Register", "unit": "Wh"},
+        {"value": "7.2", "measurand": "Power.Active.Import", "unit": "kW"},
+        {"value": "55", "measurand": "SoC", "unit": "Percent"},
+        {"value": "31.5", "measurand": "Temperature", "unit": "Celsius"},
+    ]
+    if phases:
+        for phase in ("L1", "L2", "L3"):
+            values.append({"value": "16.0", "measurand": "Current.Import", "phase": phase})
+            values.append({"value": "230.1", "measurand": "Voltage", "phase": f"{phase}-N"})
+    else:
+        values.append({"value": "120.5", "measurand": "Current.Import", "unit": "A"})
+        values.append({"value": "400.2", "measurand": "Voltage", "unit": "V"})
+    return [{"timestamp": "2026-01-01T00:00:00Z", "sampledValue": values}]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--phases", action="store_true", help="per-phase AC values")
+    args = parser.parse_args()
+
+    payloads = [_payload(i, args.phases) for i in range(min(args.messages, 10_000))]
+    per_message = len(payloads[0][0]["sampledValue"])
+    print(f"{args.messages} messages of {per_message} sampled values")
+    for label, decode in (("if/elif chain", _legacy_decode), ("lookup table", decode_meter_values)):
+        started = time.perf_counter()
+        for i in range(args.messages):
+            decode(payloads[i % len(payloads)])
+        _report(label, time.perf_counter() - started, args.messages, "message")
+
+
+if __name__ == "__main__":
+    main()
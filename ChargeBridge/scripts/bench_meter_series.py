@@ -0,0 +1,98 @@
+"""Benchmark :class:`api.store.MeterSeries` against lists of sample dicts.
+
+Simulates ``--transactions`` concurrent transactions each reporting one
+sample every ``--interval`` seconds for ``--minutes`` minutes, interleaved
+the way MeterValues arrive from a fleet.  Every sample carries the first
+``--measurands`` of ``energy``, ``power``, ``current``, ``voltage``,
+``soc``, ``temperature`` and the per-phase currents, as decoded by
+:mod:`services.meter_values`.  Memory is measured with :mod:`tracemalloc`.
+
+    python scripts/bench_meter_series.py
+    python scripts/bench_meter_series.py --minutes 480 --measurands 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.store import MeterSeries  # noqa: E402
+
+_MEASURANDS = (
+    "energy",
+    "power",
+    "current",
+    "voltage",
+    "soc",
+    "temperature",
+    "current_l1",
+    "current_l2",
+    "current_l3",
+)
+
+
+def _report(label: str, elapsed: float, count: int, unit: str) -> None:
+    print(f"  {label:<40}{elapsed:8.2f}s {elapsed / max(count, 1) * 1e6:8.2f} us/{unit}")
+
+
+def _sample(tick: int, tx: int, interval: int, measurands, start: datetime):
+    ts = start + timedelta(seconds=tick * interval)
+    sample = {"timestamp": ts.isoformat().replace("+00:00", "Z"), "context": "Sample.Periodic"}
+    for n, name in enumerate(measurands):
+        sample[name] = float(tick * 7 + tx + n)
+    return sample
+
+
+def _fill(make, add, args, measurands):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    store = [make() for _ in range(args.transactions)]
+    elapsed = 0.0
+    for tick in range(args.minutes * 60 // args.interval):
+        samples = [
+            _sample(tick, tx, args.interval, measurands, start) for tx in range(args.transactions)
+        ]
+        started = time.perf_counter()
+        for series, sample in zip(store, samples):
+            add(series, sample)
+        elapsed += time.perf_counter() - started
+    return elapsed, store
+
+
+def _run(label: str, make, add, args, measurands) -> None:
+    total = args.minutes * 60 // args.interval * args.transactions
+    elapsed, _ = _fill(make, add, args, measurands)
+    # Measured on a second pass: tracing slows the appends down.
+    tracemalloc.start()
+    _, store = _fill(make, add, args, measurands)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    print(f"{label}: {used / 2**20:8.1f} MB, {used / total:6.1f} bytes/sample")
+    _report(f"{total} appends", elapsed, total, "sample")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--interval", type=int, default=60, help="seconds between samples")
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--measurands", type=int, default=4, choices=range(1, 10))
+    args = parser.parse_args()
+
+    measurands = _MEASURANDS[: args.measurands]
+    print(
+        f"{args.transactions} transactions, one sample per {args.interval}s for "
+        f"{args.minutes} min, measurands: {', '.join(measurands)}"
+    )
+    _run("dict lists ", list, list.append, args, measurands)
+    _run("MeterSeries", MeterSeries, MeterSeries.append, args, measurands)
+
+
+if __name__ == "__main__":
+    main()
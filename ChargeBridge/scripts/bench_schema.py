@@ -0,0 +1,74 @@
+"""Benchmark OCPP schema validation.
+
+Validates a three-phase MeterValues request and a StartTransaction request
+with the ``ocpp`` library's jsonschema path, with the compiled validators
+of :mod:`central_server.schema_registry` and through a sampled
+:class:`ValidationPolicy`.
+
+    python scripts/bench_schema.py --sample-every 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocpp.messages import Call, validate_payload  # noqa: E402
+
+from central_server.schema_registry import SchemaRegistry, ValidationPolicy  # noqa: E402
+
+
+def _meter_values() -> dict:
+    sampled = []
+    for phase in ("L1", "L2", "L3"):
+        sampled += [
+            {"value": "61.3", "measurand": "Current.Import", "phase": phase, "unit": "A"},
+            {"value": "230.8", "measurand": "Voltage", "phase": phase, "unit": "V"},
+            {"value": "14.15", "measurand": "Power.Active.Import", "phase": phase, "unit": "kW"},
+        ]
+    sampled.append({"value": "18234.5", "measurand": "Energy.Active.Import.Register", "unit": "Wh"})
+    return {
+        "connectorId": 1,
+        "transactionId": 4821,
+        "meterValue": [{"timestamp": "2024-01-01T00:00:00Z", "sampledValue": sampled}],
+    }
+
+
+def _start_transaction() -> dict:
+    return {"connectorId": 1, "idTag": "VID:FCA47A147858", "meterStart": 0, "timestamp": "2024-01-01T00:00:00Z"}
+
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20_000)
+    parser.add_argument("--sample-every", type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    registry = SchemaRegistry()
+    print(f"compiled {len(registry)} schemas in {(time.perf_counter() - started) * 1000:.1f} ms")
+    policy = ValidationPolicy(registry)
+    policy.set_mode("CP", args.sample_every)
+
+    print(f"{'action':<18} {'jsonschema us':>14} {'compiled us':>12} {f'1-in-{args.sample_every} us':>12}")
+    for action, payload in (("MeterValues", _meter_values()), ("StartTransaction", _start_transaction())):
+        message = Call(unique_id="1", action=action, payload=payload)
+        library = _time(lambda: validate_payload(message, "1.6"), args.repeat)
+        compiled = _time(lambda: registry.validate(action, payload), args.repeat)
+        sampled = _time(lambda: policy.check("CP", action, payload, False), args.repeat)
+        print(f"{action:<18} {library:>14.2f} {compiled:>12.2f} {sampled:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
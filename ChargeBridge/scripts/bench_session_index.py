@@ -0,0 +1,85 @@
+"""Benchmark the session indexes in :mod:`api.store`.
+
+Loads ``--sessions`` historical sessions (archived through
+``store.archive_session``) spread over ``--vehicles`` vehicles and
+``--connectors`` connectors, keeps one active session per connector and
+compares indexed lookups with the linear scans they replaced.
+
+    python scripts/bench_session_index.py --sessions 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import store  # noqa: E402
+
+
+def _populate(total: int, vehicles: int, connectors: int) -> None:
+    for i in range(1, total + 1):
+        store.add_session(
+            {
+                "id": i,
+                "connector_id": i % connectors,
+                "vehicleId": f"VID:{i % vehicles:010X}",
+                "status": "active",
+            }
+        )
+        if i <= total - connectors:
+            store.sessions[i]["status"] = "completed"
+            store.archive_session(i)
+
+
+def _scan_active(connector_id: int):
+    for sid, session in store.sessions.items():
+        if session.get("connector_id") == connector_id and session.get("status") == "active":
+            return sid, session
+    return None
+
+
+def _scan_vehicle(vehicle_id: str):
+    return [
+        s
+        for s in list(store.sessions.values()) + store.sessions_history
+        if s.get("vehicleId") == vehicle_id
+    ]
+
+
+def _time(label: str, fn, repeat: int) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<32} {elapsed * 1e6:12.1f} us/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--connectors", type=int, default=5_000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    _populate(args.sessions, args.vehicles, args.connectors)
+    print(
+        f"loaded {args.sessions} sessions ({len(store.sessions)} active) "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    connector = args.connectors // 2
+    vehicle = f"VID:{(args.sessions // 2) % args.vehicles:010X}"
+    assert store.get_active_session(connector) == _scan_active(connector)
+    _time("active session (index)", lambda: store.get_active_session(connector), 10_000)
+    _time("active session (scan)", lambda: _scan_active(connector), 10)
+    _time("vehicle sessions (index)", lambda: store.sessions_for_vehicle(vehicle), 10_000)
+    _time("vehicle sessions (scan)", lambda: _scan_vehicle(vehicle), 3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Benchmark :class:`services.vid_manager.VIDManager`.
+
+Replays the plug-and-charge flow for ``--vehicles`` vehicles (a MAC and an
+idTag each, the MAC's temporary VID linked to the idTag's), then
+``--merges`` links between the VIDs of random vehicles, so sets of linked
+identifiers keep growing, and finally times lookups of known identifiers.
+``--compare`` runs the same workload against the previous implementation,
+which rewrote every identifier of the temporary VID on each link.
+``--registry DIR`` runs it against a :class:`VIDRegistry` in ``DIR``
+instead of memory, then reopens the registry and times the warm start and
+lookups from the freshly mapped files.  Each phase also reports the 99th
+percentile and the slowest single operation, where index growth shows up.
+
+    python scripts/bench_vid_manager.py --vehicles 1000000 --merges 1000000
+    python scripts/bench_vid_manager.py --vehicles 100000 --merges 100000 --compare
+    python scripts/bench_vid_manager.py --registry /tmp/vids
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vid_manager import VIDManager  # noqa: E402
+from services.vid_registry import VIDRegistry  # noqa: E402
+
+
+class _EagerVIDManager:
+    """The eager-rewrite VIDManager the union-find version replaced."""
+
+    def __init__(self) -> None:
+        self._source_to_vid: Dict[Tuple[str, str], str] = {}
+        self._vid_to_sources: Dict[str, Dict[Tuple[str, str], None]] = {}
+        self._counter = 1
+
+    def get_or_create_vid(self, source_type: str, source_value: str) -> str:
+        key = (source_type, source_value)
+        if key in self._source_to_vid:
+            return self._source_to_vid[key]
+        if source_value.startswith("VID:"):
+            vid = source_value
+        else:
+            vid = f"VID:{self._counter:010X}"
+            self._counter += 1
+        self._source_to_vid[key] = vid
+        self._vid_to_sources.setdefault(vid, {})[key] = None
+        return vid
+
+    def link_temp_vid(self, vid_temp: str, vid_perm: str) -> None:
+        if vid_temp == vid_perm:
+            return
+        sources = self._vid_to_sources.pop(vid_temp, {})
+        target = self._vid_to_sources.setdefault(vid_perm, {})
+        for key in sources:
+            self._source_to_vid[key] = vid_perm
+            target[key] = None
+
+
+def _mac(i: int) -> str:
+    return ":".join(f"{(i >> shift) & 0xFF:02X}" for shift in (40, 32, 24, 16, 8, 0))
+
+
+def _report(label: str, elapsed: float, count: int, unit: str) -> None:
+    print(f"  {label:<40}{elapsed:8.2f}s {elapsed / max(count, 1) * 1e6:8.2f} us/{unit}")
+
+
+def _report_latency(latencies: List[float]) -> None:
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    print(f"  {'':<40}p99 {p99 * 1e6:8.2f} us, max {latencies[-1] * 1e3 if latencies else 0:8.2f} ms")
+
+
+def _run(manager, vehicles: int, merges: int, lookups: int, seed: int) -> None:
+    latencies: List[float] = []
+    clock = time.perf_counter
+    started = clock()
+    for i in range(vehicles):
+        op = clock()
+        mac_vid = manager.get_or_create_vid("mac", _mac(i))
+        tag_vid = manager.get_or_create_vid("id_tag", f"TAG{i:08d}")
+        manager.link_temp_vid(mac_vid, tag_vid)
+        latencies.append(clock() - op)
+    elapsed = clock() - started
+    _report(f"{2 * vehicles} identifiers, {vehicles} links", elapsed, vehicles, "vehicle")
+    _report_latency(latencies)
+
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(vehicles), rng.randrange(vehicles)) for _ in range(merges)]
+    latencies = []
+    started = clock()
+    for a, b in pairs:
+        op = clock()
+        manager.link_temp_vid(
+            manager.get_or_create_vid("id_tag", f"TAG{a:08d}"),
+            manager.get_or_create_vid("id_tag", f"TAG{b:08d}"),
+        )
+        latencies.append(clock() - op)
+    _report(f"{merges} merges of random vehicles", clock() - started, merges, "merge")
+    _report_latency(latencies)
+
+    _lookups(manager, vehicles, lookups, rng)
+
+
+def _lookups(manager, vehicles: int, lookups: int, rng: random.Random) -> None:
+    keys = [_mac(rng.randrange(vehicles)) for _ in range(lookups)]
+    latencies: List[float] = []
+    clock = time.perf_counter
+    started = clock()
+    for mac in keys:
+        op = clock()
+        manager.get_or_create_vid("mac", mac)
+        latencies.append(clock() - op)
+    _report(f"{lookups} lookups by MAC", clock() - started, lookups, "lookup")
+    _report_latency(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vehicles", type=int, default=1_000_000)
+    parser.add_argument("--merges", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--compare", action="store_true", help="also run the eager implementation")
+    parser.add_argument("--registry", help="keep the VIDs in a registry in this (new) directory")
+    args = parser.parse_args()
+
+    manager = VIDManager()
+    if args.registry:
+        print(f"union-find in registry {args.registry}")
+        registry = VIDRegistry(args.registry)
+        manager.use_registry(registry)
+    else:
+        print("union-find")
+    _run(manager, args.vehicles, args.merges, args.lookups, args.seed)
+    if args.registry:
+        registry.close()
+        started = time.perf_counter()
+        registry = VIDRegistry(args.registry)
+        _report(f"reopen ({registry.stats()['records']} records)", time.perf_counter() - started, 1, "open")
+        manager = VIDManager()
+        manager.use_registry(registry)
+        _lookups(manager, args.vehicles, args.lookups, random.Random(args.seed + 1))
+    if args.compare:
+        print("eager rewrite")
+        eager = _EagerVIDManager()
+        _run(eager, args.vehicles, args.merges, args.lookups, args.seed)
+        for i in random.Random(args.seed).sample(range(args.vehicles), min(args.vehicles, 1000)):
+            assert manager.get_or_create_vid("mac", _mac(i)) == eager.get_or_create_vid("mac", _mac(i))
+    if args.registry:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark :class:`services.wallet.WalletService` on its ledger.
+
+Posts ``--postings`` top-ups and charges spread over ``--vids`` wallets, one
+at a time as ``/api/v1/wallet/{topup,charge}`` do and then in chunks of
+``--chunk`` as ``/api/v1/wallet/bulk`` does, then times balance reads.  The
+wallet is reopened afterwards to show that startup and reads do not depend
+on the length of the ledger.  ``--memory`` runs the journaled in-memory
+wallet instead.
+
+    python scripts/bench_wallet.py --dir /tmp/wallet
+    python scripts/bench_wallet.py --postings 100000 --memory
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.vid_registry import VIDRegistry  # noqa: E402
+from services.wallet import WalletService  # noqa: E402
+
+
+def _report(label: str, elapsed: float, count: int, unit: str) -> None:
+    print(f"  {label:<40}{elapsed:8.2f}s {elapsed / max(count, 1) * 1e6:8.2f} us/{unit}")
+
+
+def _postings(first: int, count: int, vids: int, rng: random.Random):
+    # Mostly charges, with top-ups large enough that few are refused.
+    for i in range(first, first + count):
+        vid = f"VID:{rng.randrange(vids):010X}"
+        amount = 10_000 if i % 10 == 0 else -rng.randrange(1, 1_000)
+        yield vid, amount, f"bench-{i}"
+
+
+def _open(directory: str) -> WalletService:
+    wallet = WalletService()
+    wallet.use_registry(VIDRegistry(directory, name="balances"))
+    return wallet
+
+
+def _reads(wallet: WalletService, vids: int, reads: int, rng: random.Random) -> None:
+    keys = [f"VID:{rng.randrange(vids):010X}" for _ in range(reads)]
+    started = time.perf_counter()
+    for vid in keys:
+        wallet.get_balance(vid)
+    _report(f"{reads} balance reads", time.perf_counter() - started, reads, "read")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--postings", type=int, default=1_000_000)
+    parser.add_argument("--vids", type=int, default=100_000)
+    parser.add_argument("--chunk", type=int, default=512)
+    parser.add_argument("--reads", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", help="ledger directory (new); a temporary one by default")
+    parser.add_argument("--memory", action="store_true", help="run the in-memory wallet")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    directory = args.dir or tempfile.mkdtemp(prefix="bench-wallet-")
+    if args.memory:
+        print("in memory")
+        wallet = WalletService()
+    else:
+        print(f"ledger in {directory}")
+        wallet = _open(directory)
+
+    single = args.postings // 10
+    started = time.perf_counter()
+    for vid, amount, reference in _postings(0, single, args.vids, rng):
+        wallet.post_many([(vid, amount, reference)])
+    _report(f"{single} single postings", time.perf_counter() - started, single, "posting")
+
+    bulk = list(_postings(single, args.postings - single, args.vids, rng))
+    started = time.perf_counter()
+    for first in range(0, len(bulk), args.chunk):
+        wallet.post_many(bulk[first : first + args.chunk])
+    elapsed = time.perf_counter() - started
+    _report(f"{len(bulk)} postings in chunks of {args.chunk}", elapsed, len(bulk), "posting")
+
+    _reads(wallet, args.vids, args.reads, rng)
+    if args.memory:
+        return
+
+    started = time.perf_counter()
+    wallet.sync()
+    _report("sync", time.perf_counter() - started, 1, "sync")
+    wallet.close()
+    size = os.path.getsize(os.path.join(directory, "ledger.ndjson"))
+    started = time.perf_counter()
+    wallet = _open(directory)
+    _report(f"reopen ({size >> 20} MB ledger)", time.perf_counter() - started, 1, "open")
+    _reads(wallet, args.vids, args.reads, rng)
+    wallet.close()
+
+
+if __name__ == "__main__":
+    main()
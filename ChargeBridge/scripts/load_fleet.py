@@ -0,0 +1,293 @@
+"""Drive a fleet of simulated charge points against ``central.py``.
+
+Every charge point is an :class:`OCPPClient` running
+:class:`ChargingSession` cycles: boot, heartbeats, StartTransaction,
+MeterValues every ``--meter-interval`` seconds, StopTransaction after
+``--session-length`` seconds and an idle gap before the next session.
+Charge points connect over ``--ramp`` seconds; ``--ramp 0`` boots the whole
+fleet at once (boot storm).  Each charge point authorizes as its own
+``VID:`` id tag, topped up through ``/api/v1/wallet/topup`` beforehand so
+central does not stop sessions for lack of balance.
+
+The run reports p50/p99 round-trip latency per OCPP action, messages per
+second and the resident memory of the server processes given with
+``--server-pid``, and writes the same figures as JSON to ``--output``.
+
+    python central.py &
+    python scripts/load_fleet.py --charge-points 2000 --duration 120 \\
+        --server-pid $! --output load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charging_session import ChargingSession  # noqa: E402
+from ocpp_client import OCPPCallError, OCPPClient  # noqa: E402
+
+
+class FleetStats:
+    """Round-trip latencies and failures per OCPP action."""
+
+    def __init__(self) -> None:
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.connected = 0
+        self.connect_failures = 0
+
+    def record(self, action: str, seconds: float) -> None:
+        self.latencies[action].append(seconds)
+
+    def error(self, action: str) -> None:
+        self.errors[action] += 1
+
+    @property
+    def messages(self) -> int:
+        return sum(len(v) for v in self.latencies.values()) + sum(self.errors.values())
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        actions = {}
+        for action in sorted(set(self.latencies) | set(self.errors)):
+            samples = sorted(self.latencies.get(action, []))
+            actions[action] = {
+                "count": len(samples),
+                "errors": self.errors.get(action, 0),
+                "p50Ms": _percentile(samples, 0.50) * 1000,
+                "p99Ms": _percentile(samples, 0.99) * 1000,
+                "maxMs": (samples[-1] if samples else 0.0) * 1000,
+            }
+        return actions
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class LoadClient(OCPPClient):
+    """``OCPPClient`` that times its calls and stays connected across sessions."""
+
+    def __init__(self, uri: str, charge_point_id: str, stats: FleetStats, args) -> None:
+        super().__init__(
+            uri,
+            charge_point_id,
+            # OCPP 1.6 caps both strings at 20 characters.
+            charger_model="LoadTest",
+            charge_point_vendor="ChargeBridge",
+            heartbeat_interval=args.heartbeat_interval,
+            connection_timeout=args.timeout,
+        )
+        self.stats = stats
+        self.heartbeat_every = args.heartbeat_interval
+        self.reconnect_per_session = args.reconnect
+
+    async def connect(self) -> None:
+        if self._ws is None:
+            await super().connect()
+
+    async def close(self) -> None:
+        if self.reconnect_per_session:
+            await super().close()
+
+    async def shutdown(self) -> None:
+        await super().close()
+
+    async def _call(self, action: str, payload: dict, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await super()._call(action, payload, **kwargs)
+        except Exception:
+            self.stats.error(action)
+            raise
+        self.stats.record(action, time.perf_counter() - started)
+        return result
+
+    async def _heartbeat_loop(self) -> None:
+        # Use the requested rate instead of the interval from BootNotification.
+        self._heartbeat_interval = self.heartbeat_every
+        await super()._heartbeat_loop()
+
+
+async def run_charge_point(index: int, stats: FleetStats, args, deadline: float) -> None:
+    cpid = f"{args.prefix}{index:05d}"
+    client = LoadClient(f"{args.url.rstrip('/')}/{cpid}", cpid, stats, args)
+    await asyncio.sleep(args.ramp * index / max(args.charge_points - 1, 1))
+    try:
+        await client.connect()
+        stats.connected += 1
+    except Exception:
+        stats.connect_failures += 1
+        return
+
+    meter = 0
+    try:
+        while time.monotonic() < deadline:
+            session = ChargingSession(
+                client,
+                connector_id=1,
+                id_tag=_id_tag(index),
+                sample_interval=args.meter_interval,
+            )
+            try:
+                await session.start(meter_start=meter)
+                await asyncio.sleep(min(args.session_length, max(deadline - time.monotonic(), 0)))
+                meter = int(session.energy)
+                if session.transaction_id is not None:
+                    await session.stop(meter_stop=meter)
+            except (asyncio.TimeoutError, websockets.ConnectionClosed, OCPPCallError, RuntimeError):
+                if session._meter_task:
+                    session._meter_task.cancel()
+                await client.shutdown()
+                await client.connect()
+                continue
+            # Random idle gap so sessions do not stay in lockstep after a boot storm.
+            await asyncio.sleep(args.idle * random.uniform(0.5, 1.5))
+    except Exception:
+        stats.connect_failures += 1
+    finally:
+        await client.shutdown()
+
+
+def _id_tag(index: int) -> str:
+    return f"VID:LOAD{index:05d}"
+
+
+async def top_up_wallets(args) -> None:
+    semaphore = asyncio.Semaphore(50)
+    async with httpx.AsyncClient(base_url=args.api, timeout=args.timeout) as client:
+
+        async def top_up(index: int) -> None:
+            async with semaphore:
+                response = await client.post(
+                    "/api/v1/wallet/topup",
+                    json={"identifier": {"vid": _id_tag(index)}, "amount": args.top_up},
+                )
+                response.raise_for_status()
+
+        await asyncio.gather(*(top_up(i) for i in range(args.charge_points)))
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+async def sample_rss(pids: List[int], samples: List[int], period: float = 1.0) -> None:
+    while True:
+        samples.append(sum(_rss_bytes(pid) for pid in pids))
+        await asyncio.sleep(period)
+
+
+def _raise_fd_limit() -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def run(args) -> dict:
+    if args.top_up:
+        await top_up_wallets(args)
+    stats = FleetStats()
+    rss: List[int] = []
+    rss_task = asyncio.create_task(sample_rss(args.server_pid, rss)) if args.server_pid else None
+
+    started = time.monotonic()
+    deadline = started + args.ramp + args.duration
+    await asyncio.gather(
+        *(run_charge_point(i, stats, args, deadline) for i in range(args.charge_points))
+    )
+    elapsed = time.monotonic() - started
+    if rss_task is not None:
+        rss_task.cancel()
+
+    return {
+        "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - elapsed)),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "server_pid")
+        },
+        "elapsedSeconds": elapsed,
+        "chargePoints": {"connected": stats.connected, "failed": stats.connect_failures},
+        "messages": stats.messages,
+        "messagesPerSecond": stats.messages / elapsed if elapsed else 0.0,
+        "actions": stats.summary(),
+        "serverRss": {
+            "pids": args.server_pid,
+            "peakBytes": max(rss, default=0),
+            "finalBytes": rss[-1] if rss else 0,
+        },
+    }
+
+
+def _print_report(report: dict) -> None:
+    print(
+        f"{report['chargePoints']['connected']} charge points "
+        f"({report['chargePoints']['failed']} failed), {report['messages']} messages "
+        f"in {report['elapsedSeconds']:.1f}s ({report['messagesPerSecond']:,.0f} msg/s)"
+    )
+    print(f"{'action':<20} {'count':>8} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for action, row in report["actions"].items():
+        print(
+            f"{action:<20} {row['count']:>8} {row['errors']:>7} "
+            f"{row['p50Ms']:>9.2f} {row['p99Ms']:>9.2f} {row['maxMs']:>9.2f}"
+        )
+    if report["serverRss"]["pids"]:
+        print(
+            f"server RSS peak {report['serverRss']['peakBytes'] / 2**20:,.1f} MiB, "
+            f"final {report['serverRss']['finalBytes'] / 2**20:,.1f} MiB"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="ws://127.0.0.1:9000/ocpp")
+    parser.add_argument("--api", default="http://127.0.0.1:8080")
+    parser.add_argument("--charge-points", type=int, default=1000)
+    parser.add_argument("--prefix", default="LOAD_CP_")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds after the ramp")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds to connect the fleet")
+    parser.add_argument("--heartbeat-interval", type=int, default=30)
+    parser.add_argument("--meter-interval", type=float, default=10.0)
+    parser.add_argument("--session-length", type=float, default=60.0)
+    parser.add_argument("--idle", type=float, default=10.0, help="mean gap between sessions")
+    parser.add_argument("--reconnect", action="store_true", help="reconnect for every session")
+    parser.add_argument(
+        "--top-up", type=float, default=1_000_000.0, help="wallet credit per id tag (0 to skip)"
+    )
+    parser.add_argument("--timeout", type=int, default=30, help="per-call timeout in seconds")
+    parser.add_argument("--server-pid", type=int, action="append", default=[])
+    parser.add_argument("--output", default="load_fleet.json")
+    args = parser.parse_args()
+
+    _raise_fd_limit()
+    report = asyncio.run(run(args))
+    _print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Decoder for OCPP 1.6 ``MeterValues`` payloads.
+
+Each ``sampledValue`` is resolved through a lookup table keyed on
+``(measurand, phase, unit)`` which yields the target sample field together
+with a linear conversion to the canonical unit (A, V, W, Wh, %, Celsius).
+Resolved keys are memoised so steady-state decoding is a dict probe per
+value instead of an if/elif chain.  The memo holds at most ``_RULES_MAX``
+keys; units are free-form strings, so a misbehaving charge point could
+otherwise grow it without limit.  Keys beyond that are compiled each time.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_MEASURAND = "Energy.Active.Import.Register"
+DEFAULT_CONTEXT = "Sample.Periodic"
+
+# measurand -> base sample field
+_MEASURAND_FIELDS: Dict[str, str] = {
+    "Current.Import": "current",
+    "Voltage": "voltage",
+    "Power.Active.Import": "power",
+    "SoC": "soc",
+    "Temperature": "temperature",
+    "Energy.Active.Import.Register": "energy",
+}
+
+# Measurands that may be reported per phase.
+_PHASED = frozenset({"current", "voltage", "power"})
+
+# phase -> field suffix; line-to-neutral values are folded onto their line.
+_PHASE_SUFFIX: Dict[str, str] = {
+    "L1": "_l1",
+    "L2": "_l2",
+    "L3": "_l3",
+    "L1-N": "_l1",
+    "L2-N": "_l2",
+    "L3-N": "_l3",
+}
+
+# unit -> (scale, offset) converting into the canonical unit
+_UNIT_CONVERSIONS: Dict[str, Tuple[float, float]] = {
+    "W": (1.0, 0.0),
+    "kW": (1000.0, 0.0),
+    "Wh": (1.0, 0.0),
+    "kWh": (1000.0, 0.0),
+    "A": (1.0, 0.0),
+    "V": (1.0, 0.0),
+    "Percent": (1.0, 0.0),
+    "Celsius": (1.0, 0.0),
+    "Fahrenheit": (5.0 / 9.0, -32.0 * 5.0 / 9.0),
+    "K": (1.0, -273.15),
+}
+_IDENTITY = (1.0, 0.0)
+
+_Rule = Optional[Tuple[str, float, float]]
+_rules: Dict[Tuple[Any, Any, Any], _Rule] = {}
+_RULES_MAX = 1024
+
+
+def _compile(measurand: Any, phase: Any, unit: Any) -> _Rule:
+    field = _MEASURAND_FIELDS.get(measurand or DEFAULT_MEASURAND)
+    if field is None:
+        return None
+    if phase:
+        suffix = _PHASE_SUFFIX.get(phase)
+        if suffix is None or field not in _PHASED:
+            return None
+        field += suffix
+    scale, offset = _UNIT_CONVERSIONS.get(unit, _IDENTITY) if unit else _IDENTITY
+    return field, scale, offset
+
+
+def decode_meter_values(meter_value: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Normalise a ``meterValue`` list into flat sample dicts.
+
+    Every returned sample carries ``timestamp`` and ``context`` plus one key
+    per recognised measurand, e.g. ``power`` in W or ``current_l2`` in A.
+    Values that cannot be parsed or whose measurand/phase is unknown are
+    skipped.
+    """
+
+    samples: List[Dict[str, Any]] = []
+    rules = _rules
+    for entry in meter_value:
+        sample: Dict[str, Any] = {
+            "timestamp": entry.get("timestamp"),
+            "context": DEFAULT_CONTEXT,
+        }
+        for sv in entry.get("sampledValue") or entry.get("sampled_value") or ():
+            key = (sv.get("measurand"), sv.get("phase"), sv.get("unit"))
+            try:
+                rule = rules[key]
+            except KeyError:
+                rule = _compile(*key)
+                if len(rules) < _RULES_MAX:
+                    rules[key] = rule
+            if rule is None:
+                continue
+            try:
+                val = float(sv.get("value"))
+            except (TypeError, ValueError):
+                continue
+            field, scale, offset = rule
+            sample[field] = val * scale + offset
+            context = sv.get("context")
+            if context:
+                sample["context"] = context
+        samples.append(sample)
+    return samples
@@ -0,0 +1,159 @@
+"""Admission control for post-boot charge point provisioning.
+
+After a site power cut hundreds of charge points boot together and each one
+would immediately run its GetConfiguration/ChangeConfiguration sequence.
+:class:`ProvisioningScheduler` queues that work instead: at most
+``concurrency`` jobs run at once, the highest priority charge point goes
+first, and job starts are spaced by ``stagger`` seconds plus up to
+``jitter`` seconds of random delay.  A charge point that boots again while
+still queued keeps a single queue entry.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class ProvisioningScheduler:
+    """Run per charge point provisioning jobs under a global concurrency cap."""
+
+    def __init__(self, concurrency: int = 16, *, stagger: float = 0.05, jitter: float = 0.25) -> None:
+        self.concurrency = concurrency
+        self.stagger = stagger
+        self.jitter = jitter
+        self.priorities: Dict[str, int] = {}
+        self._heap: List[Tuple[int, int, str]] = []
+        self._queued: Dict[str, Tuple[int, int, Job, float]] = {}
+        self._running: Dict[str, Tuple[Job, asyncio.Task]] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queued)
+
+    def set_priority(self, cpid: str, priority: int) -> None:
+        """Provision ``cpid`` with at least ``priority``; higher values go first."""
+
+        self.priorities[cpid] = priority
+        entry = self._queued.get(cpid)
+        if entry is not None:
+            self.submit(cpid, entry[2])
+
+    def submit(self, cpid: str, job: Job, priority: int = 0) -> None:
+        """Queue ``job()`` for ``cpid``, replacing a job that has not started yet."""
+
+        priority = max(priority, self.priorities.get(cpid, priority))
+        previous = self._queued.get(cpid)
+        enqueued = previous[3] if previous is not None else time.monotonic()
+        seq = next(self._seq)
+        self._queued[cpid] = (seq, priority, job, enqueued)
+        heapq.heappush(self._heap, (-priority, seq, cpid))
+        self._ensure_started()
+        self._wakeup.set()
+
+    def cancel(self, cpid: str, job: Optional[Job] = None) -> None:
+        """Drop queued or running work for ``cpid``.
+
+        With ``job`` given, only that job is dropped, so a connection that
+        closes does not cancel work submitted by its replacement.
+        """
+
+        entry = self._queued.get(cpid)
+        if entry is not None and (job is None or entry[2] == job):
+            del self._queued[cpid]
+            self.cancelled += 1
+        running = self._running.get(cpid)
+        if running is not None and (job is None or running[0] == job):
+            running[1].cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest = min((entry[3] for entry in self._queued.values()), default=now)
+        return {
+            "queued": self.queue_depth,
+            "running": len(self._running),
+            "concurrency": self.concurrency,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "oldestWaitSeconds": round(now - oldest, 3),
+        }
+
+    async def close(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, task in list(self._running.values()):
+            task.cancel()
+
+    # -- dispatch -------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _next(self) -> Tuple[str, Job, float]:
+        while True:
+            while self._heap:
+                _, seq, cpid = heapq.heappop(self._heap)
+                entry = self._queued.get(cpid)
+                # Entries replaced by a later submit or cancelled are stale.
+                if entry is None or entry[0] != seq:
+                    continue
+                del self._queued[cpid]
+                return cpid, entry[2], entry[3]
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._slots.acquire()
+            try:
+                cpid, job, enqueued = await self._next()
+            except asyncio.CancelledError:
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._run(cpid, job))
+            self._running[cpid] = (job, task)
+            logger.debug(
+                "Provisioning %s after %.2fs in queue (%d queued, %d running)",
+                cpid,
+                time.monotonic() - enqueued,
+                self.queue_depth,
+                len(self._running),
+            )
+            delay = self.stagger + random.uniform(0, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def _run(self, cpid: str, job: Job) -> None:
+        try:
+            await job()
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+        except Exception:
+            self.failed += 1
+            logger.exception("Provisioning of %s failed", cpid)
+        finally:
+            if self._running.get(cpid, (None, None))[1] is asyncio.current_task():
+                del self._running[cpid]
+            self._slots.release()
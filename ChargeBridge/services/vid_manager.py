@@ -4,27 +4,91 @@ The :class:`VIDManager` converts various external identifiers (such as
 Mac addresses, idTags or phone numbers) into an internal VID string.  It also
 supports linking a temporary VID created during the early stages of a workflow
 with a permanent VID once more reliable information becomes available.
+
+Linked VIDs form sets in a union-find structure (union by rank, path
+compression): each identifier keeps the VID it was first given and is
+resolved through the set that VID belongs to.  Linking is therefore a
+couple of dictionary operations however many identifiers already share a
+VID, instead of rewriting each of them.
+
+By default the maps live in memory and are persisted through the journal.
+:meth:`VIDManager.use_registry` moves them to a
+:class:`~services.vid_registry.VIDRegistry`, which is memory-mapped from
+disk and shared by every worker process.  The module-level
+:data:`vid_manager` is the instance the central and the OCPP handlers
+share.
 """
 
 from __future__ import annotations
 
-from typing import Dict, Tuple
+import sys
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.vid_registry import VIDRegistry
 
 
 class VIDManager:
     """Map external identifiers to internal VIDs."""
 
     def __init__(self) -> None:
-        # Maps (source_type, source_value) -> VID
+        # Maps (source_type, source_value) -> VID assigned when first seen
         self._source_to_vid: Dict[Tuple[str, str], str] = {}
-        # Reverse mapping VID -> {source_type: source_value}
-        self._vid_to_sources: Dict[str, Dict[str, str]] = {}
+        # Union-find over linked VIDs.  A VID without a parent is the root of
+        # its set; only roots have a rank, and a root resolves to its label
+        # (itself when absent), the permanent VID of the set.
+        self._parent: Dict[str, str] = {}
+        self._rank: Dict[str, int] = {}
+        self._label: Dict[str, str] = {}
         self._counter = 1
+        self._journal_append: Optional[Callable[[str, List[Any]], None]] = None
+        self._registry: Optional[VIDRegistry] = None
+        self._locked: Callable[[], Any] = nullcontext
+
+    def use_registry(self, registry: VIDRegistry) -> None:
+        """Keep the maps in ``registry`` from now on instead of in memory.
+
+        Other processes may write to the registry as well: lookups read it
+        directly and every change is made under :meth:`VIDRegistry.locked`.
+        Finds then leave paths uncompressed outside of a link, which union
+        by rank keeps at a logarithmic length.
+        """
+
+        self._registry = registry
+        self._source_to_vid = registry.table("s", immutable=True)
+        self._parent = registry.table("p")
+        self._rank = registry.table("r", decode=int)
+        self._label = registry.table("l")
+        self._locked = registry.locked
+
+    def _log(self, op: str, *args: Any) -> None:
+        if self._journal_append is not None:
+            self._journal_append(op, list(args))
 
     def _new_vid(self) -> str:
-        vid = f"VID:{self._counter:010X}"
-        self._counter += 1
-        return vid
+        if self._registry is not None:
+            counter = self._registry.next_counter()
+        else:
+            counter = self._counter
+            self._counter += 1
+        return sys.intern(f"VID:{counter:010X}")
+
+    def _find(self, vid: str, compress: bool = True) -> str:
+        parent = self._parent
+        get = parent.get
+        root = vid
+        while (up := get(root)) is not None:
+            root = up
+        if compress:
+            while vid != root:
+                parent[vid], vid = root, parent[vid]
+        return root
+
+    def resolve(self, vid: str) -> str:
+        """Return the permanent VID ``vid`` has been linked to (or ``vid``)."""
+
+        root = self._find(vid, self._registry is None)
+        return self._label.get(root, root)
 
     def get_or_create_vid(self, source_type: str, source_value: str) -> str:
         """Return the VID for ``source_type``/``source_value``.
@@ -35,26 +99,90 @@ class VIDManager:
         """
 
         key = (source_type, source_value)
-        if key in self._source_to_vid:
-            return self._source_to_vid[key]
+        vid = self._source_to_vid.get(key)
+        if vid is not None:
+            return self.resolve(vid)
 
-        vid = source_value if source_value.startswith("VID:") else self._new_vid()
-        self._source_to_vid[key] = vid
-        self._vid_to_sources.setdefault(vid, {})[source_type] = source_value
-        return vid
+        with self._locked():
+            # Another worker may have registered it meanwhile.
+            vid = self._source_to_vid.get(key)
+            if vid is None:
+                # Identifiers arrive as fresh strings from every OCPP
+                # message; keep one copy of each in the map.
+                key = (sys.intern(source_type), sys.intern(source_value))
+                vid = key[1] if source_value.startswith("VID:") else self._new_vid()
+                self._source_to_vid[key] = vid
+                self._log("map", source_type, source_value, vid, self._counter)
+            return self.resolve(vid)
 
     def link_temp_vid(self, vid_temp: str, vid_perm: str) -> None:
         """Link a temporary VID to a permanent VID.
 
-        All identifiers associated with ``vid_temp`` will be moved to
-        ``vid_perm`` so subsequent lookups resolve to the permanent VID.
-        ``vid_temp`` is removed after the merge.
+        All identifiers associated with ``vid_temp`` will resolve to
+        ``vid_perm`` (or to the VID ``vid_perm`` itself resolves to) from
+        now on.
         """
 
         if vid_temp == vid_perm:
             return
 
-        sources = self._vid_to_sources.pop(vid_temp, {})
-        for s_type, s_val in sources.items():
-            self._source_to_vid[(s_type, s_val)] = vid_perm
-            self._vid_to_sources.setdefault(vid_perm, {})[s_type] = s_val
\ No newline at end of file
+        with self._locked():
+            self._merge(vid_temp, vid_perm)
+        self._log("link", vid_temp, vid_perm)
+
+    def _merge(self, vid_temp: str, vid_perm: str) -> None:
+        temp = self._find(vid_temp)
+        perm = self._find(vid_perm)
+        if temp == perm:
+            return
+        label = self._label.pop(perm, perm)
+        self._label.pop(temp, None)
+        rank = self._rank
+        temp_rank = rank.get(temp, 0)
+        perm_rank = rank.get(perm, 0)
+        if temp_rank > perm_rank:
+            temp, perm = perm, temp
+        self._parent[temp] = perm
+        rank.pop(temp, None)
+        if temp_rank == perm_rank:
+            rank[perm] = perm_rank + 1
+        if label != perm:
+            self._label[perm] = label
+
+    # Journal integration (see :mod:`api.journal`) ---------------------------
+
+    def bind_journal(self, append: Callable[[str, List[Any]], None]) -> None:
+        self._journal_append = append
+
+    def dump_state(self) -> Dict[str, Any]:
+        resolve = self.resolve
+        return {
+            "counter": self._counter,
+            "sources": [[t, v, resolve(vid)] for (t, v), vid in self._source_to_vid.items()],
+            # Linked VIDs no identifier maps to directly still resolve after
+            # a restart.
+            "links": [[vid, resolve(vid)] for vid in self._parent],
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self._counter = state.get("counter", 1)
+        self._source_to_vid.clear()
+        self._parent.clear()
+        self._rank.clear()
+        self._label.clear()
+        for s_type, s_val, vid in state.get("sources", []):
+            self._source_to_vid[(sys.intern(s_type), sys.intern(s_val))] = sys.intern(vid)
+        for vid, perm in state.get("links", []):
+            self._merge(vid, perm)
+
+    def apply_journal(self, op: str, args: List[Any]) -> None:
+        if op == "map":
+            s_type, s_val, vid, counter = args
+            self._source_to_vid[(sys.intern(s_type), sys.intern(s_val))] = sys.intern(vid)
+            self._counter = max(self._counter, counter)
+        elif op == "link":
+            self._merge(args[0], args[1])
+
+
+# Shared by ``central.py`` and :mod:`central_server.ocpp_handlers`.
+vid_manager = VIDManager()
@@ -0,0 +1,627 @@
+"""Persistent, memory-mapped storage for :class:`~services.vid_manager.VIDManager`.
+
+The registry is a hash index kept in two files of a directory shared by
+every central worker (named ``vids`` unless another ``name`` is given;
+:class:`~services.wallet.WalletService` keeps its balances in one too):
+
+``vids.log``
+    Append-only records ``crc32, key length, value length, key, value``.
+    A key is rewritten by appending a new record; a value length of
+    ``0xFFFF`` marks a deleted key.
+``vids.idx``
+    A header (record count, end of the log, VID counter, ...) followed by
+    an open-addressing table of ``(hash, log offset)`` slots with linear
+    probing, grown by doubling into a new file once 70% full.
+
+Both files are memory-mapped, so opening the registry costs the same
+however many identifiers it holds and a lookup is a few slot reads.  Maps
+replaced by larger ones stay open until :meth:`VIDRegistry.close`, as
+another thread may still be reading them.  The larger index is built from
+a copy of the table by a background thread, without the lock; the records
+appended meanwhile are added to it before it replaces the old file.
+
+Nothing is replayed at startup except the records appended since the last
+:meth:`VIDRegistry.sync`, which are checked against their CRC (a torn
+record from a crash ends the log there) and indexed again in case the
+index pages did not reach the disk.  Slots that pointed past the end of a
+log cut short are pointed back at the last record of their key before it,
+which takes a scan of the whole log.
+
+Writes are serialised between processes with ``flock`` on ``vids.lock``
+and between threads (:meth:`VIDRegistry.locked`); a record is written
+before the header end and the slot that make it visible, so readers never
+take the lock.  A process opened with ``readonly=True`` maps the files
+read-only.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows runs a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"CBVIDX01"
+# magic, slots, used slots, log end, synced log end, VID counter, replaced,
+# generation of the mutable tables
+_HEADER = struct.Struct("<8sQQQQQQQ")
+_HEADER_SIZE = 64
+_SLOTS, _USED, _LOG_END, _SYNCED_END, _COUNTER, _REPLACED, _GENERATION = range(8, 64, 8)
+_SLOT = struct.Struct("<QQ")
+_U64 = struct.Struct("<Q")
+_RECORD = struct.Struct("<IHH")
+_DELETED = 0xFFFF
+# Offset of a slot whose key has no record left (lost with a torn log).
+_NOWHERE = 2**64 - 1
+# Tenths of the slots in use at which the index grows in the background,
+# and at which the write that fills it waits for the larger index instead.
+_GROW_AT = 7
+_GROW_NOW = 9
+# Bytes of records appended during a background rehash that are left for
+# the final swap under the lock; more are added to the new index first.
+_GROW_CATCH_UP = 1 << 16
+_LOG_CHUNK = 1 << 20
+_MISSING = object()
+
+
+def _crc(key: bytes, value: Optional[bytes]) -> int:
+    vlen = _DELETED if value is None else len(value)
+    crc = zlib.crc32(struct.pack("<HH", len(key), vlen))
+    return zlib.crc32(value or b"", zlib.crc32(key, crc))
+
+
+def _hash(key: bytes) -> int:
+    # Stable across processes (unlike hash()); never 0, which marks a free slot.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+class VIDRegistry:
+    """A persistent ``bytes -> bytes`` hash index shared between processes."""
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        name: str = "vids",
+        readonly: bool = False,
+        slots: int = 1 << 16,
+    ) -> None:
+        self.directory = directory
+        self.readonly = readonly
+        self._idx_path = os.path.join(directory, name + ".idx")
+        self._log_path = os.path.join(directory, name + ".log")
+        self._lock_fd: Optional[int] = None
+        self._lock_depth = 0
+        self._thread_lock = threading.RLock()
+        self._idx: Any = None
+        self._log: Any = None
+        self._log_fd: Optional[int] = None
+        self._retired: List[Any] = []
+        self._grower: Optional[threading.Thread] = None
+        if readonly:
+            self._map()
+            return
+        os.makedirs(directory, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(directory, name + ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        with self.locked(remap=False):
+            if not os.path.exists(self._idx_path):
+                self._create(slots)
+            self._map()
+            self._recover()
+
+    # -- files ----------------------------------------------------------
+
+    def _create(self, slots: int) -> None:
+        with open(self._log_path, "ab") as f:
+            # An existing log (the index was lost) is indexed again by
+            # _recover(), up to its first invalid record.
+            log_end = f.tell()
+            if log_end == 0:
+                f.truncate(_LOG_CHUNK)
+        tmp = self._idx_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(_HEADER_SIZE + slots * _SLOT.size)
+            f.write(_HEADER.pack(_MAGIC, slots, 0, log_end, 0, 1, 0, 0))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._idx_path)
+
+    def _map(self) -> None:
+        access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+        mode = os.O_RDONLY if self.readonly else os.O_RDWR
+        fd = os.open(self._idx_path, mode)
+        try:
+            idx = mmap.mmap(fd, 0, access=access)
+        finally:
+            os.close(fd)
+        if idx[:8] != _MAGIC:
+            idx.close()
+            raise ValueError(f"{self._idx_path} is not a registry index")
+        if self._idx is not None:
+            self._retired.append(self._idx)
+        self._idx = idx
+        self._slots = _U64.unpack_from(idx, _SLOTS)[0]
+        if self._log_fd is None:
+            self._log_fd = os.open(self._log_path, mode)
+            self._map_log(0)
+
+    def _remap(self) -> None:
+        # The index file was replaced; readers get here without the lock.
+        with self._thread_lock:
+            if self._header(_REPLACED):
+                self._map()
+
+    def _map_log(self, end: int) -> Any:
+        """The log map, mapped again if it ends before ``end``."""
+
+        with self._thread_lock:
+            if self._log is None or end > len(self._log):
+                if self._log is not None:
+                    self._retired.append(self._log)
+                self._log = mmap.mmap(
+                    self._log_fd, 0, access=mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+                )
+            return self._log
+
+    def _header(self, field: int) -> int:
+        return _U64.unpack_from(self._idx, field)[0]
+
+    def _set_header(self, field: int, value: int) -> None:
+        _U64.pack_into(self._idx, field, value)
+
+    @contextmanager
+    def locked(self, remap: bool = True) -> Iterator[None]:
+        """Hold the write lock of every process and thread (reentrant)."""
+
+        if self.readonly:
+            raise PermissionError("VID registry opened read-only")
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+                if remap:
+                    self._check_replaced()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _check_replaced(self) -> None:
+        # Another process grew the index into a new file.
+        if self._header(_REPLACED):
+            self._map()
+
+    # -- records --------------------------------------------------------
+
+    def _record(self, offset: int, end: int) -> Optional[Tuple[bytes, Optional[bytes], int]]:
+        """``(key, value, size)`` of the record at ``offset`` or ``None`` if invalid."""
+
+        if offset + _RECORD.size > end:
+            return None
+        log = self._log
+        if end > len(log):
+            log = self._map_log(end)
+        crc, klen, vlen = _RECORD.unpack_from(log, offset)
+        start = offset + _RECORD.size
+        size = _RECORD.size + klen + (0 if vlen == _DELETED else vlen)
+        if offset + size > end:
+            return None
+        key = log[start : start + klen]
+        value = None if vlen == _DELETED else log[start + klen : offset + size]
+        return key, value, size
+
+    def _probe(self, key: bytes, h: int, idx: Any = None) -> Tuple[int, Optional[int]]:
+        """Slot position for ``key`` and the offset of its record, if any."""
+
+        if idx is None:
+            idx = self._idx
+        # The slot count of this very map: another thread may replace it.
+        mask = _U64.unpack_from(idx, _SLOTS)[0] - 1
+        end = _U64.unpack_from(idx, _LOG_END)[0]
+        i = h & mask
+        while True:
+            pos = _HEADER_SIZE + i * _SLOT.size
+            slot_hash, offset = _SLOT.unpack_from(idx, pos)
+            if slot_hash == 0:
+                return pos, None
+            if slot_hash == h:
+                record = self._record(offset, end)
+                if record is not None and record[0] == key:
+                    return pos, offset
+            i = (i + 1) & mask
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        if self._header(_REPLACED):
+            self._remap()
+        idx = self._idx
+        _, offset = self._probe(key, _hash(key), idx)
+        if offset is None:
+            return None
+        return self._record(offset, _U64.unpack_from(idx, _LOG_END)[0])[1]
+
+    def put(self, key: bytes, value: Optional[bytes]) -> None:
+        """Write ``key`` (``value=None`` deletes it); the lock must be held."""
+
+        assert self._lock_depth, "VIDRegistry.put() outside locked()"
+        vlen = _DELETED if value is None else len(value)
+        record = _RECORD.pack(_crc(key, value), len(key), vlen) + key + (value or b"")
+        offset = self._header(_LOG_END)
+        end = offset + len(record)
+        size = os.fstat(self._log_fd).st_size
+        if end > size:
+            os.ftruncate(self._log_fd, max(end, size * 2, _LOG_CHUNK))
+        os.lseek(self._log_fd, offset, os.SEEK_SET)
+        os.write(self._log_fd, record)
+        # Record first, then the log end, then the slot: a reader that finds
+        # the slot always finds the whole record.
+        self._set_header(_LOG_END, end)
+        self._index(key, offset)
+
+    def _index(self, key: bytes, offset: int) -> None:
+        h = _hash(key)
+        pos, previous = self._probe(key, h)
+        if previous is None:
+            _U64.pack_into(self._idx, pos + 8, offset)
+            _U64.pack_into(self._idx, pos, h)
+            used = self._header(_USED) + 1
+            self._set_header(_USED, used)
+            if used * 10 > self._slots * _GROW_NOW:
+                self._grow()
+            elif used * 10 > self._slots * _GROW_AT and self._grower is None:
+                self._grower = threading.Thread(
+                    target=self._grow_in_background, name="vid-registry-grow", daemon=True
+                )
+                self._grower.start()
+        else:
+            _U64.pack_into(self._idx, pos + 8, offset)
+
+    # -- growth ---------------------------------------------------------
+
+    def _grow(self) -> None:
+        """Double the index; the lock must be held."""
+
+        new, tmp = self._rehash(self._idx[_HEADER_SIZE:], self._slots * 2)
+        self._install(new, tmp, self._header(_LOG_END))
+
+    def _grow_in_background(self) -> None:
+        # The slots are rehashed from a copy taken under the lock, so writes
+        # and the event loop only wait for the copy and the final swap.
+        new = None
+        try:
+            with self.locked():
+                slots = self._slots
+                if self._header(_USED) * 10 <= slots * _GROW_AT:
+                    return
+                start = self._header(_LOG_END)
+                table = self._idx[_HEADER_SIZE:]
+            new, tmp = self._rehash(table, slots * 2)
+            del table
+            # Records are never changed once the log end covers them.
+            for _ in range(8):
+                end = self._header(_LOG_END)
+                if end - start < _GROW_CATCH_UP:
+                    break
+                self._add_records(new, start, end)
+                start = end
+            with self.locked():
+                if self._slots == slots:
+                    self._install(new, tmp, start)
+                    new = None
+        except Exception:
+            logger.exception("Growing %s failed", self._idx_path)
+        finally:
+            if new is not None:
+                # Grown meanwhile, by another process or a full table.
+                new.close()
+                os.unlink(tmp)
+            self._grower = None
+
+    def _rehash(self, table: bytes, slots: int) -> Tuple[Any, str]:
+        """A new index file of ``slots`` holding the slots of ``table``."""
+
+        # One file per writer: a full table is grown while a background
+        # rehash may still be filling its own.
+        tmp = f"{self._idx_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w+b") as f:
+            f.truncate(_HEADER_SIZE + slots * _SLOT.size)
+            new = mmap.mmap(f.fileno(), 0)
+        _U64.pack_into(new, _SLOTS, slots)
+        mask = slots - 1
+        for h, offset in _SLOT.iter_unpack(table):
+            if h == 0:
+                continue
+            i = h & mask
+            while _U64.unpack_from(new, _HEADER_SIZE + i * _SLOT.size)[0]:
+                i = (i + 1) & mask
+            _SLOT.pack_into(new, _HEADER_SIZE + i * _SLOT.size, h, offset)
+        # Written out here, so the flush under the lock only has the
+        # slots of the records added by _install() left.
+        new.flush()
+        return new, tmp
+
+    def _install(self, new: Any, tmp: str, start: int) -> None:
+        """Replace the index with ``new``, adding the records from ``start`` on."""
+
+        slots = _U64.unpack_from(new, _SLOTS)[0]
+        try:
+            new[:_HEADER_SIZE] = self._idx[:_HEADER_SIZE]
+            _U64.pack_into(new, _SLOTS, slots)
+            self._add_records(new, start, self._header(_LOG_END))
+            new.flush()
+        finally:
+            new.close()
+        os.replace(tmp, self._idx_path)
+        self._set_header(_REPLACED, 1)
+        self._map()
+        logger.info("%s grown to %d slots", self._idx_path, slots)
+
+    def _add_records(self, new: Any, start: int, end: int) -> None:
+        """Index the records between ``start`` and ``end`` in ``new``."""
+
+        # Counted in _USED already; only their slots are missing.
+        _U64.pack_into(new, _LOG_END, end)
+        offset = start
+        while offset < end:
+            key, _, size = self._record(offset, end)
+            h = _hash(key)
+            pos, _ = self._probe(key, h, new)
+            _SLOT.pack_into(new, pos, h, offset)
+            offset += size
+
+    def _recover(self) -> None:
+        # Records since the last sync may be torn or missing from the index.
+        offset = self._header(_SYNCED_END)
+        end = self._header(_LOG_END)
+        self._map_log(end)
+        indexed = 0
+        while offset < end:
+            record = self._record(offset, end)
+            if record is not None:
+                key, value, size = record
+                if _RECORD.unpack_from(self._log, offset)[0] != _crc(key, value):
+                    record = None
+            if record is None:
+                # Zeros are the preallocated, never written end of the log.
+                tail = self._log[offset : offset + _RECORD.size]
+                if tail.strip(b"\0"):
+                    logger.warning(
+                        "Dropping torn records of %s after offset %d", self._log_path, offset
+                    )
+                self._set_header(_LOG_END, offset)
+                break
+            self._index(key, offset)
+            # The counter lives in the header; never hand out a VID again
+            # whose record outlived it.
+            if value is not None and value.startswith(b"VID:"):
+                try:
+                    number = int(value[4:], 16)
+                except ValueError:
+                    pass
+                else:
+                    if number >= self._header(_COUNTER):
+                        self._set_header(_COUNTER, number + 1)
+            offset += size
+            indexed += 1
+        if indexed:
+            logger.info(
+                "Re-indexed %d records of %s written since the last sync", indexed, self._log_path
+            )
+        if offset < end:
+            self._repoint(offset)
+
+    def _repoint(self, end: int) -> None:
+        """Point the slots of records lost past ``end`` at the record before."""
+
+        # A key rewritten since the last sync keeps its slot, now pointing
+        # at a lost record; its last record before ``end`` is found by
+        # hash in a scan of the log.
+        lost: Dict[int, List[int]] = {}
+        for n, (h, offset) in enumerate(_SLOT.iter_unpack(self._idx[_HEADER_SIZE:])):
+            if h and end <= offset != _NOWHERE:
+                lost.setdefault(h, []).append(_HEADER_SIZE + n * _SLOT.size)
+        if not lost:
+            return
+        latest: Dict[bytes, int] = {}
+        offset = 0
+        while offset < end:
+            key, _, size = self._record(offset, end)
+            if _hash(key) in lost:
+                latest[key] = offset
+            offset += size
+        restored = 0
+        for key, offset in latest.items():
+            h = _hash(key)
+            if lost[h] and self._probe(key, h)[1] is None:
+                _U64.pack_into(self._idx, lost[h].pop() + 8, offset)
+                restored += 1
+        for positions in lost.values():
+            for pos in positions:
+                # First written in the lost records.  The slot stays, as
+                # other keys may probe past it, but points at no record.
+                _U64.pack_into(self._idx, pos + 8, _NOWHERE)
+        logger.warning(
+            "Pointed %d keys of %s back at their records before offset %d",
+            restored,
+            self._log_path,
+            end,
+        )
+
+    # -- durability -----------------------------------------------------
+
+    def sync(self) -> None:
+        """Flush records and index to disk and mark them as recovered."""
+
+        if self.readonly:
+            return
+        with self.locked():
+            end = self._header(_LOG_END)
+        os.fsync(self._log_fd)
+        self._idx.flush()
+        with self.locked():
+            if end > self._header(_SYNCED_END):
+                self._set_header(_SYNCED_END, end)
+                self._idx.flush(0, min(mmap.PAGESIZE, len(self._idx)))
+
+    async def run_sync(self, interval: float = 1.0) -> None:
+        """Periodically :meth:`sync` from a worker thread."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.sync)
+            except Exception:
+                logger.exception("Sync of %s failed", self._log_path)
+
+    def close(self) -> None:
+        if self._idx is None:
+            return
+        grower = self._grower
+        if grower is not None:
+            grower.join()
+        self.sync()
+        self._idx.close()
+        self._log.close()
+        for retired in self._retired:
+            retired.close()
+        os.close(self._log_fd)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+        self._idx = None
+
+    # -- VIDManager storage ---------------------------------------------
+
+    def next_counter(self) -> int:
+        """Take the next VID number; the lock must be held."""
+
+        counter = self._header(_COUNTER)
+        self._set_header(_COUNTER, counter + 1)
+        return counter
+
+    @property
+    def generation(self) -> int:
+        # Read from the current index: writes made after another process
+        # replaced it only bump the generation in the new file.
+        if self._header(_REPLACED):
+            self._remap()
+        return self._header(_GENERATION)
+
+    def _bump_generation(self) -> None:
+        self._set_header(_GENERATION, self._header(_GENERATION) + 1)
+
+    def stats(self) -> dict:
+        return {
+            "records": self._header(_USED),
+            "slots": self._slots,
+            "logBytes": self._header(_LOG_END),
+            "counter": self._header(_COUNTER),
+        }
+
+    def table(
+        self,
+        prefix: str,
+        *,
+        decode: Callable[[str], Any] = str,
+        encode: Callable[[Any], str] = str,
+        immutable: bool = False,
+    ) -> "RegistryTable":
+        return RegistryTable(self, prefix, decode, immutable, encode)
+
+
+class RegistryTable:
+    """Dict-like view of the registry keys starting with ``prefix``.
+
+    Keys are strings or tuples of strings; values are stored as
+    ``encode(value)`` and read back with ``decode``.  Reads are cached in
+    memory.  An
+    ``immutable`` table (a key, once written, keeps its value) caches the
+    keys found.  Any other table also caches misses, and every process
+    drops those caches when the registry generation changes, which each
+    write to such a table does.
+    """
+
+    def __init__(
+        self,
+        registry: VIDRegistry,
+        prefix: str,
+        decode: Callable[[str], Any],
+        immutable: bool,
+        encode: Callable[[Any], str] = str,
+    ) -> None:
+        self._registry = registry
+        self._prefix = prefix
+        self._decode = decode
+        self._encode = encode
+        self._immutable = immutable
+        self._cache: dict = {}
+        self._generation = -1
+
+    def _key(self, key: Any) -> bytes:
+        if isinstance(key, tuple):
+            key = "\0".join(key)
+        return (self._prefix + key).encode()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        cache = self._cache
+        if not self._immutable:
+            generation = self._registry.generation
+            if generation != self._generation:
+                cache.clear()
+                self._generation = generation
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            raw = self._registry.get(self._key(key))
+            value = None if raw is None else self._decode(raw.decode())
+            if self._immutable:
+                if value is not None:
+                    cache[key] = value
+            elif self._registry.generation == generation:
+                # Not overwritten (by another thread) while it was read.
+                cache[key] = value
+        return default if value is None else value
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: Any) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def _write(self, key: Any, value: Any) -> None:
+        registry = self._registry
+        registry.put(self._key(key), None if value is None else self._encode(value).encode())
+        if not self._immutable:
+            generation = registry.generation
+            if generation != self._generation:
+                self._cache.clear()
+            registry._bump_generation()
+            self._generation = generation + 1
+        self._cache[key] = value
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._write(key, value)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        value = self.get(key)
+        if value is None:
+            return default
+        self._write(key, None)
+        return value
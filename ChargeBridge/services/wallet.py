@@ -1,29 +1,357 @@
-"""Simple in-memory wallet service for tracking user balances."""
+"""Wallet balances backed by an append-only ledger.
+
+Amounts are integers in minor units (satang, cents); ``minor_units`` is how
+many of them make one unit of the currency.  Every top-up and charge is a
+:class:`Posting` carrying a sequence number, the signed amount and the
+balance after it.  Postings are appended to a ledger that is never rewritten
+and balances are materialised next to it, so reading a balance is one lookup
+however long the ledger grows.
+
+All postings are serialised by one lock: the balance is checked and written
+under it, so concurrent top-ups and charges can neither lose an update nor
+overdraw.  A posting takes microseconds and :meth:`WalletService.post_many`
+takes the lock once per batch, so a finer lock would only pay off on a
+ledger far busier than any fleet's.  A posting may carry a ``reference`` (a
+payment or settlement line id).  A reference already posted is not posted
+again, so retries and settlement files uploaded twice are harmless; a
+reference reused for another VID or amount is rejected with
+:class:`ReferenceConflict`.
+
+By default balances live in memory and postings are journaled (see
+:mod:`api.journal`).  :meth:`WalletService.use_registry` instead appends them
+to ``ledger.ndjson`` and keeps balances in a
+:class:`~services.vid_registry.VIDRegistry`, both in a directory shared by
+every worker; the registry lock then serialises postings of every worker
+instead.  Appends only reach the page cache; :meth:`WalletService.run_sync`
+fsyncs them in batches from a worker thread.
+"""
 
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from services.vid_registry import VIDRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientFunds(ValueError):
+    """A charge larger than the balance; nothing was posted."""
+
+    def __init__(self, vid: str, balance: int, amount: int) -> None:
+        super().__init__(f"insufficient funds: {vid} has {balance}, charge of {amount}")
+        self.vid = vid
+        self.balance = balance
+        self.amount = amount
+
+
+class ReferenceConflict(ValueError):
+    """A reference posted before with another VID or amount; nothing was posted."""
+
+    def __init__(self, reference: str, seq: int, vid: str, amount: int) -> None:
+        super().__init__(
+            f"reference {reference} was posted as entry {seq}: {amount} to {vid}"
+        )
+        self.reference = reference
+        self.seq = seq
+        self.vid = vid
+        self.amount = amount
+
+
+@dataclass(frozen=True)
+class Posting:
+    """One ledger entry; ``amount`` is negative for a charge."""
+
+    seq: int
+    vid: str
+    amount: int
+    balance: int
+    reference: Optional[str] = None
+    ts: Optional[str] = None
+    # ``reference`` was posted before, as posting ``seq``; ``balance`` is
+    # the current one.
+    duplicate: bool = False
+
+    def record(self) -> List[Any]:
+        return [self.seq, self.vid, self.amount, self.balance, self.reference, self.ts]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _reference(value: Any) -> Tuple[int, str, int]:
+    """``(seq, vid, amount)`` of a posted reference."""
+
+    if isinstance(value, str):
+        value = value.split()
+    seq, vid, amount = value
+    return int(seq), vid, int(amount)
+
+
+def _format_reference(entry: Tuple[int, str, int]) -> str:
+    return "%d %s %d" % entry
+
+
+def _posted(posting: Posting) -> Tuple[int, str, int]:
+    return posting.seq, posting.vid, posting.amount
+
+
+class Ledger:
+    """Append-only file of postings, one JSON array per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        flags = os.O_RDWR | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        self._fd = os.open(path, flags, 0o644)
+
+    @property
+    def size(self) -> int:
+        return os.fstat(self._fd).st_size
+
+    def append(self, postings: Sequence[Posting]) -> int:
+        """Write ``postings`` in one go and return the new end of the file."""
+
+        data = b"".join(
+            json.dumps(p.record(), separators=(",", ":")).encode() + b"\n" for p in postings
+        )
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view) :]
+        return os.lseek(self._fd, 0, os.SEEK_CUR)
+
+    def read(self, offset: int) -> Iterator[Tuple[Posting, int]]:
+        """Postings from ``offset`` on, each with the offset after it.
+
+        A final line without its newline (torn by a crash) is cut off.
+        """
+
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    logger.warning("Dropping torn wallet ledger entry at offset %d", offset)
+                    os.ftruncate(self._fd, offset)
+                    return
+                offset += len(line)
+                yield Posting(*json.loads(line)), offset
+
+    def sync(self) -> None:
+        os.fsync(self._fd)
+
+    def close(self) -> None:
+        os.close(self._fd)
 
 
 class WalletService:
-    """Manage balances keyed by internal VIDs."""
-
-    def __init__(self) -> None:
-        self._balances: Dict[str, float] = {}
-
-    def get_balance(self, vid: str) -> float:
-        """Return the current balance for ``vid``."""
-        return self._balances.get(vid, 0.0)
-
-    def top_up(self, vid: str, amount: float) -> float:
-        """Increase ``vid`` balance by ``amount`` and return the new balance."""
-        self._balances[vid] = self.get_balance(vid) + amount
-        return self._balances[vid]
-
-    def deduct(self, vid: str, amount: float) -> float:
-        """Decrease ``vid`` balance by ``amount`` if sufficient funds exist."""
-        balance = self.get_balance(vid)
-        if balance < amount:
-            raise ValueError("insufficient funds")
-        self._balances[vid] = balance - amount
-        return self._balances[vid]
\ No newline at end of file
+    """Balances and postings keyed by internal VIDs."""
+
+    def __init__(self, minor_units: int = 100) -> None:
+        self.minor_units = minor_units
+        self._balances: Dict[str, int] = {}
+        # reference -> (sequence number, VID, amount) of the posting that
+        # carried it
+        self._references: Dict[str, Tuple[int, str, int]] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._journal_append: Optional[Callable[[str, List[Any]], None]] = None
+        self._registry: Optional[VIDRegistry] = None
+        self._ledger: Optional[Ledger] = None
+        # "<last sequence number> <ledger offset>" applied to the balances
+        self._position: Any = None
+
+    def use_registry(self, registry: VIDRegistry) -> None:
+        """Keep balances in ``registry`` and the ledger in its directory.
+
+        Postings the ledger holds but the balances miss (a crash between the
+        two writes) are applied again first.
+        """
+
+        self._registry = registry
+        self._balances = registry.table("b", decode=int)
+        self._references = registry.table(
+            "r", decode=_reference, encode=_format_reference, immutable=True
+        )
+        self._position = registry.table("n")
+        self._ledger = Ledger(os.path.join(registry.directory, "ledger.ndjson"))
+        with registry.locked():
+            self._catch_up()
+
+    def _applied(self) -> Tuple[int, int]:
+        seq, end = self._position.get("", "0 0").split()
+        return int(seq), int(end)
+
+    def _catch_up(self) -> None:
+        seq, applied = self._applied()
+        end = min(applied, self._ledger.size)
+        if end < applied:
+            logger.warning(
+                "Wallet ledger ends at %d, before the %d bytes applied to balances", end, applied
+            )
+        replayed = 0
+        for posting, end in self._ledger.read(end):
+            self._balances[posting.vid] = posting.balance
+            if posting.reference is not None:
+                self._references[posting.reference] = _posted(posting)
+            seq = posting.seq
+            replayed += 1
+        if end != applied:
+            self._position[""] = f"{seq} {end}"
+        if replayed:
+            logger.info("Wallet applied %d ledger entries missing from balances", replayed)
+
+    def get_balance(self, vid: str) -> int:
+        """Return the balance of ``vid`` in minor units."""
+        return self._balances.get(vid, 0)
+
+    def top_up(self, vid: str, amount: int, reference: Optional[str] = None) -> Posting:
+        """Credit ``amount`` minor units to ``vid``."""
+        if amount <= 0:
+            raise ValueError("top-up amount must be positive")
+        return self.post(vid, amount, reference)
+
+    def deduct(self, vid: str, amount: int, reference: Optional[str] = None) -> Posting:
+        """Charge ``amount`` minor units to ``vid`` if its balance covers them."""
+        if amount <= 0:
+            raise ValueError("charge amount must be positive")
+        return self.post(vid, -amount, reference)
+
+    def post(self, vid: str, amount: int, reference: Optional[str] = None) -> Posting:
+        result = self.post_many([(vid, amount, reference)])[0]
+        if isinstance(result, (InsufficientFunds, ReferenceConflict)):
+            raise result
+        return result
+
+    def post_many(
+        self, postings: Sequence[Tuple[str, int, Optional[str]]]
+    ) -> List[Union[Posting, InsufficientFunds, ReferenceConflict]]:
+        """Post ``(vid, amount, reference)`` entries in order, in one write.
+
+        A charge the balance does not cover, or a reference posted before
+        with another VID or amount, is skipped and its
+        :class:`InsufficientFunds` or :class:`ReferenceConflict` takes its
+        place in the result.
+        """
+
+        with self._lock if self._registry is None else self._registry.locked():
+            return self._post(postings)
+
+    def _post(
+        self, postings: Sequence[Tuple[str, int, Optional[str]]]
+    ) -> List[Union[Posting, InsufficientFunds, ReferenceConflict]]:
+        if self._ledger is None:
+            next_seq = itertools.count(self._seq + 1).__next__
+        else:
+            next_seq = itertools.count(self._applied()[0] + 1).__next__
+        ts = _now()
+        # Written once the whole batch is known, ledger first.
+        balances: Dict[str, int] = {}
+        references: Dict[str, Tuple[int, str, int]] = {}
+        posted: List[Posting] = []
+        results: List[Union[Posting, InsufficientFunds, ReferenceConflict]] = []
+        for vid, amount, reference in postings:
+            balance = balances.get(vid)
+            if balance is None:
+                balance = self._balances.get(vid, 0)
+            if reference is not None:
+                previous = references.get(reference) or self._references.get(reference)
+                if previous is not None:
+                    seq, previous_vid, previous_amount = previous
+                    if (previous_vid, previous_amount) == (vid, amount):
+                        duplicate = Posting(seq, vid, amount, balance, reference, duplicate=True)
+                        results.append(duplicate)
+                    else:
+                        results.append(
+                            ReferenceConflict(reference, seq, previous_vid, previous_amount)
+                        )
+                    continue
+            if amount < 0 and balance + amount < 0:
+                results.append(InsufficientFunds(vid, balance, -amount))
+                continue
+            posting = Posting(next_seq(), vid, amount, balance + amount, reference, ts)
+            balances[vid] = posting.balance
+            if reference is not None:
+                references[reference] = _posted(posting)
+            posted.append(posting)
+            results.append(posting)
+        if not posted:
+            return results
+
+        if self._ledger is not None:
+            end = self._ledger.append(posted)
+        for vid, balance in balances.items():
+            self._balances[vid] = balance
+        for reference, entry in references.items():
+            self._references[reference] = entry
+        if self._ledger is not None:
+            self._position[""] = f"{posted[-1].seq} {end}"
+        else:
+            self._seq = posted[-1].seq
+            for posting in posted:
+                self._log(posting)
+        return results
+
+    def _log(self, posting: Posting) -> None:
+        if self._journal_append is not None:
+            self._journal_append("post", posting.record())
+
+    # Durability in registry mode ---------------------------------------------
+
+    def sync(self) -> None:
+        """Flush the ledger, then the balances, to disk."""
+
+        if self._ledger is not None:
+            self._ledger.sync()
+            self._registry.sync()
+
+    async def run_sync(self, interval: float = 1.0) -> None:
+        """Periodically :meth:`sync` from a worker thread."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.sync)
+            except Exception:
+                logger.exception("Wallet ledger sync failed")
+
+    def close(self) -> None:
+        if self._ledger is not None:
+            self._ledger.sync()
+            self._ledger.close()
+            self._ledger = None
+
+    # Journal integration (see :mod:`api.journal`) ---------------------------
+
+    def bind_journal(self, append: Callable[[str, List[Any]], None]) -> None:
+        self._journal_append = append
+
+    def dump_state(self) -> Dict[str, Any]:
+        return {
+            "seq": self._seq,
+            "balances": dict(self._balances),
+            "references": dict(self._references),
+        }
+
+    def load_state(self, state: Dict[str, Any]) -> None:
+        self._balances = dict(state.get("balances", {}))
+        self._references = {
+            reference: _reference(entry) for reference, entry in state.get("references", {}).items()
+        }
+        self._seq = state.get("seq", 0)
+
+    def apply_journal(self, op: str, args: List[Any]) -> None:
+        if op == "post":
+            posting = Posting(*args)
+            self._balances[posting.vid] = posting.balance
+            if posting.reference is not None:
+                self._references[posting.reference] = _posted(posting)
+            self._seq = max(self._seq, posting.seq)
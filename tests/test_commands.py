@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from central_server.commands import CommandTable, KeyReused
+
+
+class Unanswered(Exception):
+    pass
+
+
+def _command(calls, result="Accepted", delay=0.02, error=None):
+    async def command():
+        calls.append(result)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return command
+
+
+def test_concurrent_requests_share_one_command():
+    async def main():
+        table = CommandTable(ttl=5)
+        calls = []
+        results = await asyncio.gather(
+            *(table.run(("cp-1", "reset"), _command(calls)) for _ in range(5))
+        )
+        return calls, results, len(table), table.cached
+
+    calls, results, inflight, cached = asyncio.run(main())
+    assert calls == ["Accepted"]
+    assert results == ["Accepted"] * 5
+    assert inflight == 0 and cached == 1
+
+
+def test_outcome_is_replayed_until_it_expires():
+    async def main():
+        table = CommandTable(ttl=0.05)
+        calls = []
+        first = await table.run("key", _command(calls, "Accepted"))
+        replayed = await table.run("key", _command(calls, "Rejected"))
+        await asyncio.sleep(0.06)
+        rerun = await table.run("key", _command(calls, "Rejected"))
+        return calls, (first, replayed, rerun)
+
+    calls, results = asyncio.run(main())
+    assert calls == ["Accepted", "Rejected"]
+    assert results == ("Accepted", "Accepted", "Rejected")
+
+
+def test_cancelled_caller_does_not_cancel_the_command():
+    async def main():
+        table = CommandTable(ttl=5)
+        calls = []
+        impatient = asyncio.ensure_future(table.run("key", _command(calls, delay=0.05)))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await table.run("key", _command(calls)), calls
+
+    result, calls = asyncio.run(main())
+    assert result == "Accepted" and calls == ["Accepted"]
+
+
+def test_key_reused_with_another_fingerprint():
+    async def main():
+        table = CommandTable(ttl=5)
+        calls = []
+        first = asyncio.ensure_future(table.run("idem-1", _command(calls), fingerprint="start A"))
+        await asyncio.sleep(0)
+        with pytest.raises(KeyReused):
+            await table.run("idem-1", _command(calls), fingerprint="start B")
+        await first
+        with pytest.raises(KeyReused):
+            await table.run("idem-1", _command(calls), fingerprint="start B")
+        return await table.run("idem-1", _command(calls), fingerprint="start A"), calls
+
+    result, calls = asyncio.run(main())
+    assert result == "Accepted" and calls == ["Accepted"]
+
+
+def test_only_answered_commands_are_replayed():
+    async def main():
+        table = CommandTable(ttl=5, replay_error=lambda exc: not isinstance(exc, Unanswered))
+        calls = []
+        with pytest.raises(Unanswered):
+            await table.run("timeout", _command(calls, "first", error=Unanswered()))
+        retried = await table.run("timeout", _command(calls, "second"))
+
+        with pytest.raises(ValueError):
+            await table.run("rejected", _command(calls, "third", error=ValueError("CALLERROR")))
+        with pytest.raises(ValueError):
+            await table.run("rejected", _command(calls, "fourth"))
+        return retried, calls
+
+    retried, calls = asyncio.run(main())
+    assert retried == "second"
+    assert calls == ["first", "second", "third"]
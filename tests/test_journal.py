@@ -0,0 +1,110 @@
+import os
+import time
+
+from api import journal as journal_module
+from api.journal import Journal
+
+
+class Items:
+    """Minimal journaled component: an append-only list."""
+
+    def __init__(self):
+        self.items = []
+        self._append = None
+
+    def bind_journal(self, append):
+        self._append = append
+
+    def add(self, value):
+        self.items.append(value)
+        self._append("add", [value])
+
+    def dump_state(self):
+        # Deferred, as the store hands over what it no longer changes.
+        items = list(self.items)
+        return {"items": lambda: items}
+
+    def load_state(self, state):
+        self.items = list(state["items"])
+
+    def apply_journal(self, op, args):
+        assert op == "add"
+        self.items.append(args[0])
+
+
+def _open(directory, **kwargs):
+    items = Items()
+    journal = Journal(str(directory), commit_interval=0, fsync=False, **kwargs)
+    journal.attach("items", items)
+    journal.recover()
+    return journal, items
+
+
+def _segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("wal-"))
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    journal, items = _open(tmp_path)
+    journal.start()
+    for n in range(3):
+        items.add(n)
+    journal.close()
+
+    (segment,) = _segment_files(tmp_path)
+    with open(tmp_path / segment, "ab") as f:
+        f.write(b'["items","add",[3')
+
+    journal, items = _open(tmp_path)
+    assert items.items == [0, 1, 2]
+    # New records go to a fresh segment, after the torn one.
+    journal.start()
+    items.add(4)
+    journal.close()
+    _, items = _open(tmp_path)
+    assert items.items == [0, 1, 2, 4]
+
+
+def test_commit_is_retried_after_a_write_failure(tmp_path, monkeypatch):
+    write = os.write
+    failures = []
+
+    def failing_write(fd, data):
+        if not failures:
+            # Half a batch reaches the file before the disk gives up.
+            write(fd, bytes(data[: len(data) // 2]))
+            failures.append(fd)
+            raise OSError(28, "No space left on device")
+        return write(fd, data)
+
+    monkeypatch.setattr(journal_module.os, "write", failing_write)
+    journal, items = _open(tmp_path)
+    journal.start()
+    items.add("a")
+    deadline = time.monotonic() + 5
+    while not journal.failed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert journal.failed
+    items.add("b")
+    journal.close()
+    assert not journal.failed
+    assert journal.records_written == 2
+
+    _, items = _open(tmp_path)
+    assert items.items == ["a", "b"]
+
+
+def test_snapshot_then_segment_replay(tmp_path):
+    journal, items = _open(tmp_path)
+    journal.start()
+    items.add(1)
+    items.add(2)
+    journal.write_snapshot(journal.capture())
+    items.add(3)
+    journal.close()
+
+    # The segment the snapshot covers is gone; the one after it remains.
+    assert len(_segment_files(tmp_path)) == 1
+    journal, items = _open(tmp_path)
+    assert items.items == [1, 2, 3]
+    assert journal.recover() == 1
@@ -0,0 +1,75 @@
+import pytest
+
+from services import meter_values
+from services.meter_values import decode_meter_values
+
+
+def _decode(*sampled_values, timestamp="2024-01-01T00:00:00Z"):
+    (sample,) = decode_meter_values(
+        [{"timestamp": timestamp, "sampledValue": list(sampled_values)}]
+    )
+    return sample
+
+
+def test_unit_conversion():
+    sample = _decode(
+        {"measurand": "Power.Active.Import", "unit": "kW", "value": "7.4"},
+        {"measurand": "Energy.Active.Import.Register", "unit": "kWh", "value": "12.5"},
+        {"measurand": "Temperature", "unit": "Fahrenheit", "value": "212"},
+        {"measurand": "SoC", "unit": "Percent", "value": "80"},
+    )
+    assert sample["power"] == pytest.approx(7400.0)
+    assert sample["energy"] == pytest.approx(12500.0)
+    assert sample["temperature"] == pytest.approx(100.0)
+    assert sample["soc"] == 80.0
+    assert sample["timestamp"] == "2024-01-01T00:00:00Z"
+    assert sample["context"] == "Sample.Periodic"
+
+    kelvin = _decode({"measurand": "Temperature", "unit": "K", "value": "300"})
+    assert kelvin["temperature"] == pytest.approx(26.85)
+
+
+def test_defaults_and_unparseable_values():
+    sample = _decode(
+        {"value": "1500"},
+        {"measurand": "Voltage", "value": "not a number"},
+        {"measurand": "Frequency", "value": "50"},
+        {"measurand": "Current.Import", "value": "16", "context": "Transaction.Begin"},
+    )
+    assert sample == {
+        "timestamp": "2024-01-01T00:00:00Z",
+        "context": "Transaction.Begin",
+        "energy": 1500.0,
+        "current": 16.0,
+    }
+
+
+def test_phase_suffixes():
+    sample = _decode(
+        {"measurand": "Current.Import", "phase": "L1", "unit": "A", "value": "10"},
+        {"measurand": "Current.Import", "phase": "L2", "unit": "A", "value": "11"},
+        {"measurand": "Voltage", "phase": "L3-N", "unit": "V", "value": "230"},
+        {"measurand": "Power.Active.Import", "phase": "L1-N", "unit": "kW", "value": "2"},
+        # Not a phased measurand, and not a phase the decoder knows.
+        {"measurand": "SoC", "phase": "L1", "value": "50"},
+        {"measurand": "Voltage", "phase": "L1-L2", "value": "400"},
+    )
+    assert sample["current_l1"] == 10.0
+    assert sample["current_l2"] == 11.0
+    assert sample["voltage_l3"] == 230.0
+    assert sample["power_l1"] == 2000.0
+    assert "soc" not in sample and "voltage" not in sample and "voltage_l1" not in sample
+
+
+def test_rule_memo_is_capped(monkeypatch):
+    monkeypatch.setattr(meter_values, "_rules", {})
+    monkeypatch.setattr(meter_values, "_RULES_MAX", 4)
+    for n in range(10):
+        sample = _decode({"measurand": "Power.Active.Import", "unit": f"unit-{n}", "value": "5"})
+        # Unknown units are left unconverted, memoised or not.
+        assert sample["power"] == 5.0
+    assert len(meter_values._rules) == 4
+
+    sample = _decode({"measurand": "Power.Active.Import", "unit": "kW", "value": "1"})
+    assert sample["power"] == 1000.0
+    assert len(meter_values._rules) == 4
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from central_server.outbound import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitOpen,
+    OutboundRegistry,
+    QueueFull,
+)
+
+
+def _registry(**kwargs):
+    options = dict(
+        depth=2, default_timeout=0.05, failure_threshold=2, cooldown=0.1, timeouts={"Reset": 0.2}
+    )
+    options.update(kwargs)
+    return OutboundRegistry(**options)
+
+
+async def _answer(value="Accepted", delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def _silent():
+    await asyncio.sleep(10)
+
+
+def test_deadline_per_action_includes_the_queue():
+    async def main():
+        gate = _registry().open("cp-1")
+        with pytest.raises(asyncio.TimeoutError):
+            await gate.call("Heartbeat", lambda: _answer(delay=0.1))
+        # Reset has a longer deadline of its own.
+        answered = await gate.call("Reset", lambda: _answer(delay=0.1))
+        return gate, answered
+
+    gate, answered = asyncio.run(main())
+    assert answered == "Accepted"
+    assert gate.timeouts == 1 and gate.failures == 0 and gate.queued == 0
+
+
+def test_queue_bound():
+    async def main():
+        registry = _registry()
+        gate = registry.open("cp-1")
+        waiting = [asyncio.ensure_future(gate.call("Reset", _silent)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await gate.call("Reset", _silent)
+        queued = registry.queued()
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return gate, queued
+
+    gate, queued = asyncio.run(main())
+    assert queued == 2
+    assert gate.queued == 0 and gate.rejected == 1
+
+
+def test_breaker_opens_and_half_open_probe_closes_it():
+    async def main():
+        registry = _registry()
+        gate = registry.open("cp-1")
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await gate.call("Heartbeat", _silent)
+        states = [gate.state]
+        with pytest.raises(CircuitOpen):
+            await gate.call("Heartbeat", _answer)
+
+        await asyncio.sleep(0.1)
+        states.append(gate.state)
+        probe = asyncio.ensure_future(gate.call("Heartbeat", lambda: _answer(delay=0.02)))
+        await asyncio.sleep(0)
+        # Only one CALL goes through while the probe is out.
+        with pytest.raises(CircuitOpen):
+            await gate.call("Heartbeat", _answer)
+        await probe
+        states.append(gate.state)
+        return gate, states, registry.states()
+
+    gate, states, counts = asyncio.run(main())
+    assert states == [OPEN, HALF_OPEN, CLOSED]
+    assert gate.failures == 0 and gate.rejected == 2
+    assert counts == {CLOSED: 1, OPEN: 0, HALF_OPEN: 0}
+
+
+def test_failed_probe_reopens_the_circuit():
+    async def main():
+        gate = _registry(failure_threshold=1).open("cp-1")
+        with pytest.raises(asyncio.TimeoutError):
+            await gate.call("Heartbeat", _silent)
+        await asyncio.sleep(0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await gate.call("Heartbeat", _silent)
+        state = gate.state
+        with pytest.raises(CircuitOpen) as rejected:
+            await gate.call("Heartbeat", _answer)
+        return gate, state, rejected.value.retry_after
+
+    gate, state, retry_after = asyncio.run(main())
+    assert state == OPEN
+    assert gate.failures == 2 and not gate.probing
+    assert retry_after == 1.0
+
+
+def test_any_answer_resets_the_failure_count():
+    async def main():
+        gate = _registry().open("cp-1")
+        with pytest.raises(asyncio.TimeoutError):
+            await gate.call("Heartbeat", _silent)
+        # A CALLERROR still shows the charger is talking.
+        await gate.call("Heartbeat", lambda: _answer(None))
+        with pytest.raises(asyncio.TimeoutError):
+            await gate.call("Heartbeat", _silent)
+        return gate
+
+    gate = asyncio.run(main())
+    assert gate.state == CLOSED and gate.failures == 1 and gate.timeouts == 2
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from central_server.sharding import ShardRegistry, ShardWorker
+
+
+async def _exchange(run_dir, op, handler, payload):
+    server = ShardWorker(ShardRegistry(run_dir, 1), 2)
+    client = ShardWorker(ShardRegistry(run_dir, 0), 2, timeout=5.0)
+    server.register(op, handler)
+    await server.start()
+    try:
+        return await client.request(1, op, payload)
+    finally:
+        await server.close()
+
+
+def test_reply_larger_than_stream_limit(tmp_path):
+    cpids = [f"CHARGEPOINT-{i:06d}" for i in range(6000)]
+
+    async def connected(payload):
+        return {"cpids": cpids}
+
+    reply = asyncio.run(_exchange(str(tmp_path), "connected", connected, {}))
+    assert len(repr(reply)) > 2**16
+    assert reply == {"cpids": cpids}
+
+
+def test_request_larger_than_stream_limit(tmp_path):
+    series = "A" * 200_000
+
+    async def handoff(payload):
+        return {"size": len(payload["series"])}
+
+    reply = asyncio.run(_exchange(str(tmp_path), "handoff", handoff, {"series": series}))
+    assert reply == {"size": len(series)}
+
+
+def test_handler_error_is_raised(tmp_path):
+    async def broken(payload):
+        raise ValueError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(_exchange(str(tmp_path), "api", broken, {}))
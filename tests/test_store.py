@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from api import store
+
+
+@pytest.fixture(autouse=True)
+def empty_store():
+    store.load_state({})
+    yield
+    store.load_state({})
+
+
+def _session(session_id, connector_id, vehicle, status="active"):
+    return {"id": session_id, "connector_id": connector_id, "vehicleId": vehicle, "status": status}
+
+
+def _ids(records):
+    return [record["id"] for record in records]
+
+
+def test_sessions_by_vehicle_connector_and_status():
+    store.add_session(_session(1, 10, "VID:A"))
+    store.add_session(_session(2, 11, "VID:B"))
+    store.add_session(_session(3, 10, "VID:A", status="completed"))
+
+    current, archived = store.sessions_for_vehicle("VID:A")
+    assert _ids(current) == [1, 3] and archived == []
+    assert _ids(store.sessions_for_connector(10)) == [1, 3]
+    assert _ids(store.sessions_with_status("active")) == [1, 2]
+    assert store.get_active_session(10) == (1, store.sessions[1])
+    assert store.sessions_for_vehicle("VID:C") == ([], [])
+
+
+def test_indexes_follow_updates_and_archiving():
+    store.add_session(_session(1, 10, "VID:A"))
+    # Mutated in place, then re-registered: the old keys are dropped.
+    record = store.sessions[1]
+    record["status"] = "completed"
+    record["vehicleId"] = "VID:B"
+    store.add_session(record)
+    assert store.get_active_session(10) is None
+    assert store.sessions_with_status("active") == []
+    assert store.sessions_for_vehicle("VID:A") == ([], [])
+    assert _ids(store.sessions_for_vehicle("VID:B")[0]) == [1]
+
+    store.archive_session(1)
+    assert store.sessions_for_connector(10) == []
+    assert store.sessions_with_status("completed") == []
+    current, archived = store.sessions_for_vehicle("VID:B")
+    assert current == [] and _ids(archived) == [1]
+
+    assert not store.delete_session(1)
+    store.add_session(_session(2, 10, "VID:B"))
+    assert store.delete_session(2)
+    assert store.get_active_session(10) is None
+
+
+def test_indexes_are_rebuilt_from_a_snapshot():
+    store.add_session(_session(1, 10, "VID:A"))
+    store.add_session(_session(2, 11, "VID:A"))
+    store.archive_session(2)
+    snapshot = json.loads(json.dumps(store.dump_state(), default=lambda deferred: deferred()))
+
+    store.load_state(snapshot)
+    current, archived = store.sessions_for_vehicle("VID:A")
+    assert _ids(current) == [1] and _ids(archived) == [2]
+    assert store.get_active_session(10)[0] == 1
@@ -0,0 +1,98 @@
+import asyncio
+
+from central_server.timer_wheel import TimerWheel, parse_timeouts
+
+TICK = 0.01
+
+
+def _run(scenario, **kwargs):
+    async def main():
+        wheel = TimerWheel(resolution=TICK, **kwargs)
+        try:
+            return await scenario(wheel)
+        finally:
+            wheel.close()
+
+    return asyncio.run(main())
+
+
+def test_timers_fire_in_deadline_order():
+    async def scenario(wheel):
+        fired = []
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for key, delay in (("c", 0.08), ("a", 0.02), ("b", 0.05)):
+            wheel.arm(key, delay, lambda key=key: fired.append((key, loop.time() - started)))
+        await asyncio.sleep(0.15)
+        return fired, len(wheel)
+
+    fired, armed = _run(scenario)
+    assert [key for key, _ in fired] == ["a", "b", "c"]
+    for (_, elapsed), delay in zip(fired, (0.02, 0.05, 0.08)):
+        assert elapsed >= delay - TICK
+    assert armed == 0
+
+
+def test_rearm_replaces_and_cancel_disarms():
+    async def scenario(wheel):
+        fired = []
+        wheel.arm("cp-1", 0.02, lambda: fired.append("first"))
+        wheel.arm("cp-1", 0.06, lambda: fired.append("second"))
+        wheel.arm("cp-2", 0.02, lambda: fired.append("cancelled"))
+        assert wheel.cancel("cp-2")
+        assert not wheel.cancel("cp-2")
+        assert "cp-1" in wheel and "cp-2" not in wheel
+        await asyncio.sleep(0.04)
+        early = list(fired)
+        await asyncio.sleep(0.06)
+        return early, fired, wheel.fired
+
+    early, fired, count = _run(scenario)
+    assert early == []
+    assert fired == ["second"]
+    assert count == 1
+
+
+def test_deadline_beyond_one_turn_waits_for_its_turn():
+    async def scenario(wheel):
+        fired = []
+        # Four slots: a deadline nine ticks out shares a bucket with tick one.
+        wheel.arm("far", 9 * TICK, lambda: fired.append("far"))
+        wheel.arm("near", TICK, lambda: fired.append("near"))
+        await asyncio.sleep(5 * TICK)
+        early = list(fired)
+        await asyncio.sleep(8 * TICK)
+        return early, fired
+
+    early, fired = _run(scenario, slots=4)
+    assert early == ["near"]
+    assert fired == ["near", "far"]
+
+
+def test_failing_callback_does_not_stop_the_wheel():
+    async def scenario(wheel):
+        fired = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        def rearm():
+            fired.append("rearm")
+            if fired.count("rearm") < 3:
+                wheel.arm("rearm", TICK, rearm)
+
+        wheel.arm("fail", TICK, fail)
+        wheel.arm("ok", TICK, lambda: fired.append("ok"))
+        wheel.arm("rearm", TICK, rearm)
+        await asyncio.sleep(0.1)
+        return fired, len(wheel)
+
+    fired, armed = _run(scenario)
+    assert "ok" in fired
+    assert fired.count("rearm") == 3
+    assert armed == 0
+
+
+def test_parse_timeouts():
+    assert parse_timeouts("") == {}
+    assert parse_timeouts("Model A=120, Model=B=45 ,") == {"Model A": 120.0, "Model=B": 45.0}
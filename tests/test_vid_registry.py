@@ -0,0 +1,101 @@
+import os
+import threading
+
+from services.vid_registry import VIDRegistry
+
+
+def _put(registry, key, value):
+    with registry.locked():
+        registry.put(key, value)
+
+
+def _tear(directory, offset):
+    fd = os.open(os.path.join(directory, "vids.log"), os.O_RDWR)
+    try:
+        os.pwrite(fd, b"\xff", offset + 8)
+    finally:
+        os.close(fd)
+
+
+def test_torn_rewrite_reverts_to_synced_value(tmp_path):
+    registry = VIDRegistry(str(tmp_path))
+    _put(registry, b"bK", b"500")
+    registry.sync()
+    offset = registry.stats()["logBytes"]
+    _put(registry, b"bK", b"100")
+    _put(registry, b"new", b"1")
+    _tear(str(tmp_path), offset)
+
+    reopened = VIDRegistry(str(tmp_path))
+    assert reopened.get(b"bK") == b"500"
+    assert reopened.get(b"new") is None
+    _put(reopened, b"new", b"2")
+    _put(reopened, b"bK", b"700")
+    assert reopened.get(b"new") == b"2"
+    assert reopened.get(b"bK") == b"700"
+    reopened.close()
+
+
+def test_growth_keeps_every_key(tmp_path):
+    registry = VIDRegistry(str(tmp_path), slots=64)
+    for i in range(5000):
+        _put(registry, b"k%d" % i, b"v%d" % i)
+    _put(registry, b"k0", b"rewritten")
+    registry.close()
+
+    reopened = VIDRegistry(str(tmp_path))
+    assert reopened.stats()["slots"] > 5000
+    assert reopened.get(b"k0") == b"rewritten"
+    assert all(reopened.get(b"k%d" % i) == b"v%d" % i for i in range(1, 5000))
+    reopened.close()
+
+
+def test_readers_during_growth(tmp_path):
+    registry = VIDRegistry(str(tmp_path), slots=64)
+    _put(registry, b"fixed", b"value")
+    errors = []
+    done = threading.Event()
+
+    def read():
+        try:
+            while not done.is_set():
+                assert registry.get(b"fixed") == b"value"
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(20000):
+            _put(registry, b"k%d" % i, b"v" * (i % 50))
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+    assert not errors
+    assert registry.get(b"k19999") == b"v" * 49
+    registry.close()
+
+
+def test_cached_values_follow_growth_by_another_instance(tmp_path):
+    directory = str(tmp_path)
+    first = VIDRegistry(directory, slots=64)
+    parents = first.table("p")
+    with first.locked():
+        parents["x"] = "1"
+    assert parents["x"] == "1"
+
+    # Another worker grows the index into a new file...
+    grower = VIDRegistry(directory)
+    for i in range(5000):
+        _put(grower, b"k%d" % i, b"v")
+    grower.close()
+    # ...and a third one rewrites the cached key in it.
+    writer = VIDRegistry(directory)
+    with writer.locked():
+        writer.table("p")["x"] = "999"
+    writer.close()
+
+    assert parents["x"] == "999"
+    first.close()
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from services.vid_registry import VIDRegistry
+from services.wallet import ReferenceConflict, WalletService
+
+
+def _registry_wallet(directory):
+    wallet = WalletService()
+    wallet.use_registry(VIDRegistry(directory, name="balances"))
+    return wallet
+
+
+@pytest.fixture(params=["memory", "registry"])
+def wallet(request, tmp_path):
+    if request.param == "memory":
+        return WalletService()
+    return _registry_wallet(str(tmp_path))
+
+
+def test_reused_reference(wallet):
+    first = wallet.top_up("VID:A", 500, "pay-1")
+    again = wallet.top_up("VID:A", 500, "pay-1")
+    assert again.duplicate and again.seq == first.seq
+    assert wallet.get_balance("VID:A") == 500
+
+    with pytest.raises(ReferenceConflict) as conflict:
+        wallet.top_up("VID:A", 100, "pay-1")
+    assert (conflict.value.seq, conflict.value.vid, conflict.value.amount) == (first.seq, "VID:A", 500)
+    with pytest.raises(ReferenceConflict):
+        wallet.top_up("VID:B", 500, "pay-1")
+    assert wallet.get_balance("VID:A") == 500
+    assert wallet.get_balance("VID:B") == 0
+
+    results = wallet.post_many([("VID:A", -200, "stl-1"), ("VID:A", -300, "stl-1")])
+    assert not results[0].duplicate
+    assert isinstance(results[1], ReferenceConflict)
+    assert wallet.get_balance("VID:A") == 300
+
+
+def test_reference_survives_reopen(tmp_path):
+    wallet = _registry_wallet(str(tmp_path))
+    wallet.top_up("VID:A", 500, "pay-1")
+    wallet.close()
+
+    reopened = _registry_wallet(str(tmp_path))
+    assert reopened.top_up("VID:A", 500, "pay-1").duplicate
+    with pytest.raises(ReferenceConflict):
+        reopened.top_up("VID:A", 700, "pay-1")
+
+
+def test_balances_written_by_another_worker(tmp_path):
+    directory = str(tmp_path)
+    first = WalletService()
+    first.use_registry(VIDRegistry(directory, name="balances", slots=64))
+    first.top_up("VID:A", 500)
+    second = _registry_wallet(directory)
+    registry = second._registry
+
+    # Another worker's postings fill the index enough to grow it in the
+    # background; the first worker reads before the grown index is swapped in.
+    with registry.locked():
+        second.post_many([("VID:%d" % i, 100, None) for i in range(50)])
+        assert first.get_balance("VID:A") == 500
+    if registry._grower is not None:
+        registry._grower.join()
+    assert registry.stats()["slots"] > 64
+
+    second.top_up("VID:A", 200)
+    assert first.get_balance("VID:A") == 700
+    first.deduct("VID:A", 300)
+    assert second.get_balance("VID:A") == 400
+    second.close()
+    registry.close()
+    first.close()
+
+
+def test_journaled_references():
+    wallet = WalletService()
+    wallet.top_up("VID:A", 500, "pay-1")
+    restored = WalletService()
+    restored.load_state(wallet.dump_state())
+    with pytest.raises(ReferenceConflict):
+        restored.top_up("VID:A", 700, "pay-1")
+
+
+def test_concurrent_postings(wallet):
+    def post(n):
+        for i in range(500):
+            wallet.top_up(f"VID:{i % 7}", 1, f"t{n}-{i}")
+
+    threads = [threading.Thread(target=post, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(wallet.get_balance(f"VID:{i}") for i in range(7)) == 2000